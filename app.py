@@ -1,25 +1,19 @@
 import streamlit as st
 
-from modules.db import get_gsheet_connection, get_firestore_db
-from modules.utils import generate_tuesday_dates
-from modules.pages.admin import reset_admin_form  # startup-kor kell (session_state init)
-from modules.logger import log_event
-
 st.set_page_config(page_title="Röpi App Pro", layout="wide", page_icon="🏐")
 
-gs_client = get_gsheet_connection()
-fs_db = get_firestore_db()
-
-# QR check-in oldal — publikus, login/sidebar nélkül
+# QR check-in oldal — publikus, login/sidebar nélkül.
+# Könnyített útvonal: csak a Firestore kliens jön létre, és csak a check-in
+# oldal importjai töltődnek be (nincs gspread / pandas / admin oldal).
 if st.query_params.get("checkin") == "1":
+    from modules.clients import get_client
     from modules.pages.checkin import render_checkin_page
-    render_checkin_page(fs_db)
+    render_checkin_page(get_client("firestore"))
     st.stop()
 
-if 'admin_step' not in st.session_state:
-    reset_admin_form()
-if 'admin_date' not in st.session_state:
-    st.session_state.admin_date = generate_tuesday_dates()[0]
+# A kliensek és a nehéz könyvtárak (gspread, Firestore, pandas) igény szerint töltődnek be:
+# minden oldal csak azt a backendet nyitja meg, amelyet ténylegesen használ.
+from modules.clients import get_client, backend_status
 
 # --- Google OAuth alapú admin hozzáférés ---
 _raw = st.secrets.get("app", {}).get("admin_emails", [])
@@ -32,7 +26,8 @@ st.session_state.logged_in = logged_in
 # Csak admin belépést naplózunk (vendég látogatók nem kerülnek a logba)
 if logged_in:
     if "admin_login_logged" not in st.session_state:
-        log_event(fs_db, "INFO", "Sikeres Admin bejelentkezés", {"email": st.user.email})
+        from modules.logger import log_event
+        log_event(get_client("firestore"), "INFO", "Sikeres Admin bejelentkezés", {"email": st.user.email})
         st.session_state.admin_login_logged = True
 
 # --- Sidebar ---
@@ -43,14 +38,14 @@ PUBLIC_PAGES  = ["Admin Regisztráció", "Alkalmak Áttekintése", "Adatbázis",
 PRIVATE_PAGES = ["📊 Játékos Profil", "Havi Elszámolás", "💳 Befizetések Ellenőrzése", "👤 Tagok & Email", "Beállítások (Kivételek)", "🛠️ Rendszer Diagnosztika"]
 
 if logged_in:
-    page = st.sidebar.radio("Menü", PUBLIC_PAGES + PRIVATE_PAGES)
+    page = st.sidebar.radio("Menü", PUBLIC_PAGES + PRIVATE_PAGES, key="menu_page")
     with st.sidebar:
         st.markdown("---")
         st.markdown(f"👤 **{st.user.name}**")
         if st.button("🚪 Kijelentkezés", use_container_width=True):
             st.logout()
 else:
-    page = st.sidebar.radio("Menü", PUBLIC_PAGES)
+    page = st.sidebar.radio("Menü", PUBLIC_PAGES, key="menu_page")
     with st.sidebar:
         st.markdown("---")
         if st.user.is_logged_in:
@@ -62,41 +57,50 @@ else:
                          type="primary", use_container_width=True):
                 st.login("google")
 
+# A kapcsolat-állapot az oldal után töltődik ki, hogy a ténylegesen megnyitott backendeket mutassa
 with st.sidebar:
     st.markdown("---")
-    st.markdown("**Kapcsolatok:**")
-    st.markdown("🟢 Google Sheet" if gs_client else "🔴 Google Sheet")
-    st.markdown("🟢 Firestore" if fs_db else "🔴 Firestore")
-    email_ok = hasattr(st, 'secrets') and "email" in st.secrets
-    st.markdown("🟢 Email" if email_ok else "🟡 Email (nincs beállítva)")
+    connection_box = st.container()
 
 if page == "Admin Regisztráció":
     from modules.pages.admin import render_admin_page
-    render_admin_page(gs_client, fs_db)
+    render_admin_page(get_client("gsheet"), get_client("firestore"))
 elif page == "Alkalmak Áttekintése":
     from modules.pages.overview import render_attendance_overview_page
-    render_attendance_overview_page(fs_db)
+    render_attendance_overview_page(get_client("firestore"))
 elif page == "Adatbázis":
     from modules.pages.database import render_database_page
-    render_database_page(gs_client, fs_db, logged_in=logged_in)
+    # A Sheet fül és a szinkron csak adminnak látszik — vendégnek nem nyitunk GSheet kapcsolatot
+    render_database_page(get_client("gsheet") if logged_in else None, get_client("firestore"), logged_in=logged_in)
 elif page == "📊 Játékos Profil":
     from modules.pages.profile import render_player_profile_page
-    render_player_profile_page(fs_db)
+    render_player_profile_page(get_client("firestore"))
 elif page == "Havi Elszámolás" and logged_in:
     from modules.pages.accounting import render_accounting_page
-    render_accounting_page(fs_db, gs_client)
+    render_accounting_page(get_client("firestore"), None)  # a GSheet klienst nem használja
 elif page == "💳 Befizetések Ellenőrzése" and logged_in:
     from modules.pages.payments import render_payment_check_page
-    render_payment_check_page(fs_db, gs_client)
+    render_payment_check_page(get_client("firestore"), None)  # a GSheet klienst nem használja
 elif page == "👤 Tagok & Email" and logged_in:
     from modules.pages.members import render_members_page
-    render_members_page(fs_db, gs_client)
+    render_members_page(get_client("firestore"), get_client("gsheet"))
 elif page == "Beállítások (Kivételek)" and logged_in:
     from modules.pages.settings import render_settings_page
-    render_settings_page(fs_db)
+    render_settings_page(get_client("firestore"))
 elif page == "🛠️ Rendszer Diagnosztika" and logged_in:
     from modules.pages.diagnostics import render_diagnostics_page
-    render_diagnostics_page(fs_db, gs_client)
+    render_diagnostics_page(get_client("firestore"), get_client("gsheet"))
 elif page == "📲 Check-in QR":
     from modules.pages.qr_page import render_qr_page
     render_qr_page()
+
+with connection_box:
+    st.markdown("**Kapcsolatok:**")
+    status = backend_status()
+    for backend, label in (("gsheet", "Google Sheet"), ("firestore", "Firestore")):
+        if backend not in status:
+            st.markdown(f"⚪ {label} (még nem használt)")
+        else:
+            st.markdown(f"🟢 {label}" if status[backend] else f"🔴 {label}")
+    email_ok = hasattr(st, 'secrets') and "email" in st.secrets
+    st.markdown("🟢 Email" if email_ok else "🟡 Email (nincs beállítva)")
@@ -0,0 +1,294 @@
+# Normalizált jelenléti adatok és az ezekből épített, folyamatszintű indexek.
+# A Firestore nyers DataFrame-jét (get_attendance_rows_fs) egyszer alakítjuk át
+# egységes oszlopokra; az indexek a tartalom verziójához (hash) kötve épülnek újra.
+import threading
+from collections import Counter, defaultdict
+
+import pandas as pd
+import streamlit as st
+
+from modules.utils import parse_date_str
+
+GUEST_SEPARATOR = " - "
+NORMALIZED_COLUMNS = ["id", "name", "status", "date", "event_date", "mode", "timestamp"]
+
+
+def _clean_str(series):
+    return series.where(series.notna(), "").astype(str).str.strip()
+
+
+def normalize_attendance(df_fs):
+    """Nyers Firestore DataFrame → normalizált DataFrame (NORMALIZED_COLUMNS).
+
+    - name / status: levágott szöveg (hiány → "")
+    - mode: kisbetűs, hiány → "valós"
+    - date: az alkalom dátuma, ha értelmezhető, különben a regisztrációé (datetime.date vagy None);
+      minden egyedi dátum-szöveget csak egyszer értelmezünk
+    - event_date: csak az alkalom dátuma (datetime.date vagy None)
+    - timestamp: a regisztráció időpontja szövegként"""
+    if df_fs is None or df_fs.empty:
+        return pd.DataFrame(columns=NORMALIZED_COLUMNS)
+    evt = _clean_str(df_fs["Alkalom Dátuma"])
+    reg = _clean_str(df_fs["Regisztráció Időpontja"])
+    parsed = {s: parse_date_str(s) for s in set(evt) | set(reg)}
+    evt_date = evt.map(parsed)
+    reg_date = reg.map(parsed)
+    mode = _clean_str(df_fs["Mód"]).str.lower().replace("", "valós")
+    return pd.DataFrame({
+        "id": df_fs["ID"].values,
+        "name": _clean_str(df_fs["Név"]).values,
+        "status": _clean_str(df_fs["Jön-e"]).values,
+        "date": evt_date.where(evt_date.notna(), reg_date).values,
+        "event_date": evt_date.values,
+        "mode": mode.values,
+        "timestamp": reg.values,
+    })
+
+
+def attendance_data_version(df_fs):
+    """A jelenléti adatok tartalmi ujjlenyomata (sorrendtől független)."""
+    if df_fs is None or df_fs.empty:
+        return "empty"
+    hashed = pd.util.hash_pandas_object(df_fs.astype(str), index=False)
+    return f"{len(df_fs)}-{int(hashed.sum()) & 0xFFFFFFFFFFFFFFFF:016x}"
+
+
+@st.cache_data(ttl=60)
+def get_normalized_attendance(_db):
+    """(normalizált DataFrame, adatverzió) — a get_attendance_rows_fs cache-elt eredményéből."""
+    from modules.db import get_attendance_rows_fs
+    df_fs = get_attendance_rows_fs(_db)
+    return normalize_attendance(df_fs), attendance_data_version(df_fs)
+
+
+def split_guest_name(name):
+    """'Gazda - Vendég' → ('Gazda', 'Vendég'); nem vendég-rekordnál (None, None)."""
+    host, sep, guest = str(name).partition(GUEST_SEPARATOR)
+    if not sep or not host.strip() or not guest.strip():
+        return None, None
+    return host.strip(), guest.strip()
+
+
+class GuestHistoryIndex:
+    """Gazda → vendégnevek gyakorisággal; a legördülő listák O(1)-ben kapják meg
+    a gyakoriság szerint rendezett listát. Az adatverzió változásakor újraépül,
+    mentéskor (record_guests) azonnal, write-through módon bővül."""
+
+    def __init__(self):
+        self.version = None
+        self._counts = defaultdict(Counter)
+        self._ranked = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, norm_df, version):
+        counts = defaultdict(Counter)
+        for name in norm_df["name"]:
+            host, guest = split_guest_name(name)
+            if host:
+                counts[host][guest] += 1
+        with self._lock:
+            self._counts = counts
+            self._ranked = {}
+            self.version = version
+
+    def add(self, host, guest):
+        with self._lock:
+            self._counts[host][guest] += 1
+            self._ranked.pop(host, None)
+
+    def guests_for(self, host):
+        """A gazda vendégei: előbb a gyakoribbak, azonos gyakoriságnál ábécérendben."""
+        with self._lock:
+            ranked = self._ranked.get(host)
+            if ranked is None:
+                counts = self._counts.get(host, {})
+                ranked = [g for g, _ in sorted(counts.items(), key=lambda x: (-x[1], x[0]))]
+                self._ranked[host] = ranked
+            return list(ranked)
+
+
+@st.cache_resource
+def _guest_history_index():
+    return GuestHistoryIndex()
+
+
+def get_guest_history_index(fs_db):
+    """A folyamatszintű vendég-index, az aktuális adatverzióhoz igazítva."""
+    index = _guest_history_index()
+    norm_df, version = get_normalized_attendance(fs_db)
+    if index.version != version:
+        index.rebuild(norm_df, version)
+    return index
+
+
+def record_guests(rows):
+    """Write-through: a most mentett sorok ([név, ...]) vendégeit azonnal felveszi az indexbe."""
+    index = _guest_history_index()
+    for r in rows:
+        host, guest = split_guest_name(r[0])
+        if host:
+            index.add(host, guest)
+
+
+class PlayerAttendanceIndex:
+    """Játékos × (év, hónap) jelenlét-mátrix és játékosonkénti alkalom-dátumok.
+
+    Egy adatverzióhoz egyszer, vektorizált groupby-jal épül; egy jelenlét a
+    (név, dátum) pár egyszeri "Yes" rekordja (teszt mód nélkül). A profil oldal
+    csak szeletel belőle, így a játékos- vagy évváltás a történet hosszától független."""
+
+    def __init__(self, norm_df):
+        names = norm_df["name"]
+        self.names = sorted(set(names[names != ""]))
+        event_dates = norm_df["event_date"].dropna()
+        self.years = sorted({d.year for d in event_dates}, reverse=True)
+
+        valid = norm_df[(norm_df["status"] == "Yes") & (norm_df["mode"] != "teszt") & norm_df["date"].notna()]
+        valid = valid.drop_duplicates(["name", "date"])
+        stamps = pd.to_datetime(valid["date"])
+        frame = pd.DataFrame({
+            "name": valid["name"].values, "date": valid["date"].values,
+            "year": stamps.dt.year.values, "month": stamps.dt.month.values,
+        })
+        self.matrix = (
+            frame.groupby(["name", "year", "month"]).size()
+            .unstack(["year", "month"], fill_value=0)
+            .sort_index(axis=1)
+        )
+        # név → dátumok csökkenő sorrendben (a legutóbbi elöl)
+        self._dates = {
+            name: group.sort_values(ascending=False).to_numpy()
+            for name, group in frame.groupby("name")["date"]
+        }
+
+    def dates(self, name):
+        """A játékos alkalmainak dátumai, a legutóbbival kezdve."""
+        return self._dates.get(name, [])
+
+    def counts(self, name):
+        """(év, hónap) → alkalmak száma Series a játékosra (üres, ha nincs jelenléte)."""
+        if name not in self.matrix.index:
+            return pd.Series(dtype="int64")
+        row = self.matrix.loc[name]
+        return row[row > 0]
+
+    def yearly(self, name):
+        counts = self.counts(name)
+        return counts.groupby(level="year").sum() if not counts.empty else pd.Series(dtype="int64")
+
+    def monthly(self, name, year):
+        """1..12 hónap → alkalmak száma a megadott évben."""
+        counts = self.counts(name)
+        if counts.empty or year not in counts.index.get_level_values("year"):
+            return pd.Series(0, index=range(1, 13))
+        return counts.xs(year, level="year").reindex(range(1, 13), fill_value=0)
+
+
+@st.cache_resource(max_entries=2)
+def _player_attendance_index(version, _norm_df):
+    return PlayerAttendanceIndex(_norm_df)
+
+
+def get_player_attendance_index(fs_db):
+    """A jelenlegi adatverzióhoz tartozó (folyamatszinten megosztott) játékos-index."""
+    norm_df, version = get_normalized_attendance(fs_db)
+    return _player_attendance_index(version, norm_df)
+
+
+def _ranking_contributions(norm_df):
+    """id → (név, dátum, státusz) a ranglistába számító rekordokra (Yes/No, nem teszt, értelmezhető dátum)."""
+    df = norm_df[(norm_df["name"] != "") & norm_df["status"].isin(["Yes", "No"])
+                 & (norm_df["mode"] != "teszt") & norm_df["date"].notna()]
+    return dict(zip(df["id"], zip(df["name"], df["date"], df["status"])))
+
+
+class Leaderboard:
+    """Materializált ranglista: játékosonként évenkénti és összesített részvétel.
+
+    Egy (név, dátum) alkalom akkor számít, ha van rá "Yes" és nincs "No" rekord
+    (mint a build_total_attendance_fs-ben). Az első felépítés egy menetben történik;
+    új adatverziónál csak a megváltozott rekordok (azonosító szerinti különbség)
+    érintett (név, dátum) párjai számolódnak újra. A legacy_attendance összesítői
+    csak akkor adódnak hozzá, ha a legacy alkalmak még nincsenek rekordként a táblában."""
+
+    def __init__(self):
+        self.version = None
+        self.has_legacy_records = False
+        self._rows = {}                 # id → (név, dátum, státusz)
+        self._status = {}               # (név, dátum) → [yes db, no db]
+        self._totals = Counter()        # (név, év) → alkalmak száma
+        self._by_year = {}              # év (None = összes) → {név: db}, memoizált
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _counts(yes_no):
+        return yes_no[0] > 0 and yes_no[1] == 0
+
+    def _apply(self, row, sign):
+        name, date, status = row
+        key = (name, date)
+        yes_no = self._status.setdefault(key, [0, 0])
+        before = self._counts(yes_no)
+        yes_no[0 if status == "Yes" else 1] += sign
+        after = self._counts(yes_no)
+        if before != after:
+            self._totals[(name, date.year)] += 1 if after else -1
+        if yes_no == [0, 0]:
+            del self._status[key]
+
+    def update(self, norm_df, version):
+        """Igazítás az új adatverzióhoz; visszatér a feldolgozott (változott) rekordok számával."""
+        with self._lock:
+            if version == self.version:
+                return 0
+            rows = _ranking_contributions(norm_df)
+            removed = [r for i, r in self._rows.items() if rows.get(i) != r]
+            added = [r for i, r in rows.items() if self._rows.get(i) != r]
+            for r in removed:
+                self._apply(r, -1)
+            for r in added:
+                self._apply(r, +1)
+            self._rows = rows
+            self._by_year = {}
+            self.has_legacy_records = bool((norm_df["mode"] == "legacy").any())
+            self.version = version
+            return len(removed) + len(added)
+
+    def totals(self, year=None):
+        """{név: alkalmak száma} az adott évre (None = összes év)."""
+        with self._lock:
+            cached = self._by_year.get(year)
+            if cached is None:
+                cached = Counter()
+                for (name, y), count in self._totals.items():
+                    if count and (year is None or y == year):
+                        cached[name] += count
+                self._by_year[year] = cached
+            return dict(cached)
+
+    def ranking(self, year=None, legacy_totals=()):
+        """[{"Helyezés", "Név", "Összes Részvétel"}] csökkenő sorrendben (a ranglista és a Top 5 formátuma)."""
+        totals = Counter(self.totals(year))
+        if legacy_totals and not self.has_legacy_records:
+            field = "total_all_time" if year is None else f"year_{year}"
+            for rec in legacy_totals:
+                if rec.get("name"):
+                    totals[rec["name"]] += int(rec.get(field, 0) or 0)
+        return [
+            {"Helyezés": i, "Név": n, "Összes Részvétel": c}
+            for i, (n, c) in enumerate(sorted(totals.items(), key=lambda x: (-x[1], x[0])), 1)
+            if c > 0
+        ]
+
+
+@st.cache_resource
+def _leaderboard():
+    return Leaderboard()
+
+
+def get_leaderboard(fs_db):
+    """A folyamatszintű ranglista, az aktuális adatverzióhoz (inkrementálisan) igazítva."""
+    board = _leaderboard()
+    norm_df, version = get_normalized_attendance(fs_db)
+    board.update(norm_df, version)
+    return board
@@ -0,0 +1,90 @@
+# Könnyűsúlyú, csak Firestore-t használó jelenlét-műveletek.
+# A QR check-in útvonal kizárólag ezt a modult használja, ezért itt nem lehet
+# pandas, gspread vagy más nehéz függőség modulszinten importálva.
+import streamlit as st
+from google.cloud import firestore
+
+from modules.config import FIRESTORE_COLLECTION, FIRESTORE_DEVICES, FIRESTORE_MEMBERS
+from modules.live_counter import bump_live_counter
+from modules.session_summaries import apply_summary_deltas
+
+
+def write_attendance_rows_fs(fs_db, rows, synced_to_sheet=None):
+    """Jelenléti sorokat ([név, státusz, időpont, alkalom, _, mód]) ír a Firestore-ba.
+
+    A rekordok egy batch-ben íródnak; az alkalom-összesítők és az élő számláló shardja
+    csak utána, külön, olvasás nélküli Increment-ekkel frissülnek, így a mentés nem függ tőlük.
+    Ha a `synced_to_sheet` meg van adva, a flag is bekerül a dokumentumba
+    (False = a Sheet szinkron még hátravan)."""
+    records = []
+    for r in rows:
+        data = {
+            "name": r[0], "status": r[1], "timestamp": r[2],
+            "event_date": r[3], "mode": r[5] if len(r) > 5 else "ismeretlen"
+        }
+        if synced_to_sheet is not None:
+            data["synced_to_sheet"] = synced_to_sheet
+        records.append(data)
+    ops = [("set", fs_db.collection(FIRESTORE_COLLECTION).document(), data) for data in records]
+    apply_summary_deltas(fs_db, added=records, ops=ops)
+    bump_live_counter(fs_db, added=records)
+    return len(rows)
+
+
+def delete_attendance_docs_fs(fs_db, docs):
+    """Jelenléti dokumentumok (snapshotok) törlése, majd az alkalom-összesítők és az élő számláló frissítése."""
+    records = [doc.to_dict() for doc in docs]
+    apply_summary_deltas(fs_db, removed=records, ops=[("delete", doc.reference, None) for doc in docs])
+    bump_live_counter(fs_db, removed=records)
+    return len(docs)
+
+
+def find_checkin_docs(fs_db, name, event_date, limit=1):
+    """Az adott névhez és alkalomhoz tartozó QR check-in dokumentumok."""
+    return list(
+        fs_db.collection(FIRESTORE_COLLECTION)
+        .where("name", "==", name)
+        .where("event_date", "==", event_date)
+        .where("mode", "==", "qr")
+        .limit(limit)
+        .stream()
+    )
+
+
+@st.cache_data(ttl=120)
+def get_member_names_fs(_db):
+    """Csak a tagok neveit tölti le (DataFrame nélkül) a check-in névválasztóhoz."""
+    if _db is None:
+        return []
+    try:
+        return [d.to_dict().get("name", "") for d in _db.collection(FIRESTORE_MEMBERS).stream()]
+    except Exception:
+        return []
+
+
+def get_device_registration(fs_db, device_id):
+    """Visszaadja a device_id-hez tartozó nevet, vagy None-t."""
+    if not fs_db or not device_id:
+        return None
+    try:
+        doc = fs_db.collection(FIRESTORE_DEVICES).document(device_id).get()
+        if doc.exists:
+            return doc.to_dict().get("name")
+        return None
+    except Exception:
+        return None
+
+
+def save_device_registration(fs_db, device_id, name):
+    """Elmenti a device_id → name mappinget Firestore-ba."""
+    if not fs_db or not device_id:
+        return False
+    try:
+        fs_db.collection(FIRESTORE_DEVICES).document(device_id).set({
+            "name": name,
+            "registered_at": firestore.SERVER_TIMESTAMP,
+        })
+        return True
+    except Exception as e:
+        st.warning(f"⚠️ Eszköz regisztráció mentési hiba (legközelebb újra kell azonosítanod magad): {e}")
+        return False
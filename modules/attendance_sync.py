@@ -0,0 +1,230 @@
+# Különbség-alapú jelenlét-szinkron a Google Sheet és a Firestore között.
+# Minden sort egy tartalom-kulcs azonosít (név, státusz, időpont, alkalom, mód);
+# a két oldal kulcs-multihalmazának különbségéből csak a szükséges beszúrások és
+# törlések készülnek el, így a változatlan rekordok (és azonosítóik) megmaradnak.
+import hashlib
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from modules.batch_writes import commit_in_chunks
+from modules.config import FIRESTORE_COLLECTION
+from modules.session_summaries import apply_summary_deltas
+
+SHEET_HEADER = ["Név", "Jön-e", "Regisztráció Időpontja", "Alkalom Dátuma", "Üres", "Mód"]
+DEFAULT_MODE = "valós"
+
+_DATETIME_RE = re.compile(
+    r"^\s*(\d{4})\D+(\d{1,2})\D+(\d{1,2})\D*?(?:[\sT]+(\d{1,2}):(\d{2})(?::(\d{2}))?)?\D*$"
+)
+
+
+def _cell(v):
+    """None/NaN → üres; datetime-szerű → 'ÉÉÉÉ-HH-NN ÓÓ:PP:MM'; minden más → levágott str."""
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    if hasattr(v, "strftime"):
+        return v.strftime("%Y-%m-%d %H:%M:%S")
+    return str(v).strip()
+
+
+def _canon_datetime(v, with_time=True):
+    """A Sheet által átformázott dátumokat (pl. '2025. 01. 07. 10:00:00') egységes alakra hozza."""
+    s = _cell(v)
+    m = _DATETIME_RE.match(s)
+    if not m:
+        return s
+    y, mo, d, h, mi, sec = m.groups()
+    try:
+        dt = datetime(int(y), int(mo), int(d), int(h or 0), int(mi or 0), int(sec or 0))
+    except ValueError:
+        return s
+    return dt.strftime("%Y-%m-%d %H:%M:%S" if with_time else "%Y-%m-%d")
+
+
+def attendance_key(name, status, timestamp, event_date, mode):
+    """Egy jelenléti rekord tartalom-kulcsa (formázási eltérésekre érzéketlen)."""
+    canon = (
+        _cell(name), _cell(status), _canon_datetime(timestamp),
+        _canon_datetime(event_date, with_time=False), _cell(mode) or DEFAULT_MODE,
+    )
+    return hashlib.sha1("\x1f".join(canon).encode("utf-8")).hexdigest()
+
+
+def _sheet_record(r):
+    """Sheet-sor → Firestore-dokumentum (a Sheet saját Mód oszlopával)."""
+    cell = lambda i: r[i] if len(r) > i else ""  # noqa: E731
+    return {
+        "name": cell(0), "status": cell(1) if len(r) > 1 else "Yes", "timestamp": cell(2),
+        "event_date": cell(3), "mode": _cell(cell(5)) or DEFAULT_MODE,
+    }
+
+
+def _record_row(d):
+    return [_cell(d.get("name")), _cell(d.get("status")), _cell(d.get("timestamp")),
+            _cell(d.get("event_date")), "", _cell(d.get("mode")) or DEFAULT_MODE]
+
+
+def record_key(d):
+    """Firestore-rekord (dict) tartalom-kulcsa (lásd attendance_key)."""
+    return attendance_key(d.get("name"), d.get("status"), d.get("timestamp"), d.get("event_date"), d.get("mode"))
+
+
+def _diff(source, target):
+    """source/target: [(kulcs, elem)] → (target-ből törlendő elemek, source-ból beszúrandó elemek, változatlan db).
+
+    Multihalmaz-különbség: ha egy kulcs a forrásban k-szor, a célban m-szer szerepel,
+    akkor max(0, k-m) beszúrás és max(0, m-k) törlés készül."""
+    source_by_key = defaultdict(list)
+    for key, item in source:
+        source_by_key[key].append(item)
+    target_by_key = defaultdict(list)
+    for key, item in target:
+        target_by_key[key].append(item)
+    inserts, deletes, unchanged = [], [], 0
+    for key in source_by_key.keys() | target_by_key.keys():
+        src, tgt = source_by_key.get(key, []), target_by_key.get(key, [])
+        unchanged += min(len(src), len(tgt))
+        inserts.extend(src[len(tgt):])
+        deletes.extend(tgt[len(src):])
+    return deletes, inserts, unchanged
+
+
+def _stream_fs_records(fs_db):
+    return [(doc.reference, doc.to_dict()) for doc in fs_db.collection(FIRESTORE_COLLECTION).stream()]
+
+
+def plan_attendance_sync(fs_db, gs_client, source):
+    """Szinkronterv (írás nélkül). source: "Google Sheets" vagy "Firestore".
+
+    A terv: {"source", "inserts", "deletes", "unchanged", "source_total", "sheet_has_header"}.
+    A Firestore-ban még Sheetbe nem vitt QR check-inek (synced_to_sheet=False) a
+    Sheet → Firestore irányban nem törlődnek; a másik irányban beíródnak, és a
+    flagjük átáll."""
+    from modules.sheets import get_attendance_reader  # lazy: csak a szinkronhoz kell a gspread
+    reader = get_attendance_reader(gs_client)
+    if source != "Google Sheets":
+        # a terv sorindexekkel töröl a Sheetből: a mintavételes checksum helyett teljes olvasás
+        reader.reset()
+    sheet_rows = reader.read()
+    fs_records = _stream_fs_records(fs_db)
+
+    # (sorindex, sor) párok; a névtelen sorokat egyik irányban sem érintjük
+    sheet_items = [(i, r) for i, r in enumerate(sheet_rows) if i > 0 and r and _cell(r[0])]
+    plan = {"source": source, "sheet_has_header": bool(sheet_rows)}
+    if source == "Google Sheets":
+        pending = [(ref, d) for ref, d in fs_records if d.get("synced_to_sheet") is False]
+        settled = [(ref, d) for ref, d in fs_records if d.get("synced_to_sheet") is not False]
+        deletes, inserts, unchanged = _diff(
+            [(record_key(_sheet_record(r)), _sheet_record(r)) for _, r in sheet_items],
+            [(record_key(d), (ref, d)) for ref, d in settled],
+        )
+        # a függő QR rekordok a Sheetben is szerepelhetnek már (pl. kézi másolás):
+        # ezekhez nem szúrunk be másolatot
+        pending_keys = Counter(record_key(d) for _, d in pending)
+        kept = []
+        for rec in inserts:
+            key = record_key(rec)
+            if pending_keys[key]:
+                pending_keys[key] -= 1
+                unchanged += 1
+            else:
+                kept.append(rec)
+        plan.update(inserts=kept, deletes=deletes, unchanged=unchanged, source_total=len(sheet_items))
+    else:
+        deletes, inserts, unchanged = _diff(
+            [(record_key(d), (ref, d)) for ref, d in fs_records],
+            [(record_key(_sheet_record(r)), (i, r)) for i, r in sheet_items],
+        )
+        plan.update(inserts=inserts, deletes=deletes, unchanged=unchanged, source_total=len(fs_records))
+    return plan
+
+
+def plan_preview_rows(plan, limit=200):
+    """A terv emberi olvasásra: [(művelet, sor)] az első `limit` elemre."""
+    out = []
+    if plan["source"] == "Google Sheets":
+        out += [("➕ Firestore beszúrás", _record_row(d)) for d in plan["inserts"][:limit]]
+        out += [("➖ Firestore törlés", _record_row(d)) for _, d in plan["deletes"][:limit]]
+    else:
+        out += [("➕ Sheet hozzáfűzés", _record_row(d)) for _, d in plan["inserts"][:limit]]
+        out += [("➖ Sheet törlés", list(r[:6]) + [""] * (6 - len(r[:6]))) for _, r in plan["deletes"][:limit]]
+    return out
+
+
+def _row_ranges_desc(indexes):
+    """0-alapú sorindexek → összefüggő [start, end) tartományok, hátulról előre (a törlés így nem csúsztat)."""
+    ranges = []
+    for i in sorted(set(indexes)):
+        if ranges and ranges[-1][1] == i:
+            ranges[-1][1] = i + 1
+        else:
+            ranges.append([i, i + 1])
+    return list(reversed(ranges))
+
+
+def sheet_row_key(r):
+    """Sheet-sor tartalom-kulcsa; azonos a megfelelő Firestore-rekord record_key-ével."""
+    return record_key(_sheet_record(r))
+
+
+def _still_pending(ref):
+    """Függő-e még a QR rekord (közben a háttér-worker átvihette a Sheetbe)."""
+    snap = ref.get()
+    return snap.exists and (snap.to_dict() or {}).get("synced_to_sheet") is False
+
+
+class StalePlanError(Exception):
+    """A Sheet a terv elkészülte óta megváltozott: az indexalapú törlés nem biztonságos."""
+
+
+def apply_attendance_sync(fs_db, gs_client, plan):
+    """Végrehajtja a tervet; csak a különbség íródik. Visszatérés: (ok, üzenet).
+
+    Firestore → Sheet irányban az egész írás az attendance_sheet_lock alatt fut (a QR
+    háttér-worker közben nem fűz hozzá), a törlés előtt friss, teljes olvasással
+    ellenőrzi, hogy a törlendő indexeken még a tervben látott sorok állnak-e, és
+    kihagyja azokat a függő QR rekordokat, amelyeket a worker időközben átvitt."""
+    from modules.sheets import attendance_sheet_lock, get_sheet_registry, get_attendance_reader
+    inserts, deletes = plan["inserts"], plan["deletes"]
+    if not inserts and not deletes:
+        return True, f"Nincs változás ({plan['unchanged']} rekord egyezik) — nem történt írás."
+    try:
+        if plan["source"] == "Google Sheets":
+            ops = [("delete", ref, None) for ref, _ in deletes]
+            ops += [("set", fs_db.collection(FIRESTORE_COLLECTION).document(), d) for d in inserts]
+            apply_summary_deltas(fs_db, added=inserts, removed=[d for _, d in deletes], ops=ops)
+            return True, (f"Kész! {len(inserts)} rekord beszúrva, {len(deletes)} törölve a Firestore-ban "
+                          f"({plan['unchanged']} változatlan).")
+
+        registry = get_sheet_registry(gs_client)
+        with attendance_sheet_lock:
+            if deletes:
+                def _delete_rows(ws):
+                    current = ws.get_all_values()
+                    stale = [i for i, r in deletes if i >= len(current) or sheet_row_key(current[i]) != sheet_row_key(r)]
+                    if stale:
+                        raise StalePlanError(f"{len(stale)} törlendő sor tartalma eltér a tervtől")
+                    requests = [{"deleteDimension": {"range": {
+                        "sheetId": ws.id, "dimension": "ROWS", "startIndex": start, "endIndex": end,
+                    }}} for start, end in _row_ranges_desc([i for i, _ in deletes])]
+                    registry.spreadsheet().batch_update({"requests": requests})
+                registry.call(_delete_rows)
+            inserts = [(ref, d) for ref, d in inserts if d.get("synced_to_sheet") is not False or _still_pending(ref)]
+            if inserts:
+                rows = [] if plan["sheet_has_header"] else [SHEET_HEADER]
+                rows += [_record_row(d) for _, d in inserts]
+                registry.call(lambda ws: ws.append_rows(rows, value_input_option='USER_ENTERED'))
+                # a most Sheetbe került függő QR rekordokat a háttér-worker már ne vigye át újra
+                pending = [("update", ref, {"synced_to_sheet": True})
+                           for ref, d in inserts if d.get("synced_to_sheet") is False]
+                if pending:
+                    commit_in_chunks(fs_db, pending)
+        get_attendance_reader(gs_client).reset()
+        return True, (f"Kész! {len(inserts)} sor hozzáfűzve, {len(deletes)} törölve a Sheet-ben "
+                      f"({plan['unchanged']} változatlan).")
+    except StalePlanError as e:
+        get_attendance_reader(gs_client).reset()
+        return False, f"A Sheet a terv elkészülte óta megváltozott ({e}) — nem történt írás, készíts új tervet."
+    except Exception as e:
+        return False, f"Szinkronizálási hiba: {e}"
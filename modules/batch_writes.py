@@ -0,0 +1,63 @@
+# Firestore írások csoportosítása WriteBatch-ekbe (legfeljebb 500 művelet / commit).
+BATCH_LIMIT = 500
+
+
+def add_ops(writer, ops):
+    """A műveleteket egy WriteBatch-hez vagy Transaction-höz fűzi (commit nélkül)."""
+    for kind, ref, data in ops:
+        if kind == "set":
+            writer.set(ref, data)
+        elif kind == "merge":
+            writer.set(ref, data, merge=True)
+        elif kind == "update":
+            writer.update(ref, data)
+        else:
+            writer.delete(ref)
+
+
+def commit_in_chunks(fs_db, ops, on_progress=None):
+    """ops: [("set", ref, data) | ("merge", ref, data) | ("update", ref, data) | ("delete", ref, None)].
+
+    A műveleteket sorrendben, legfeljebb BATCH_LIMIT méretű batch-ekben commitolja;
+    egy batch-en belül minden művelet atomikusan érvényesül vagy egyik sem.
+    on_progress(kész, összes) minden commit után meghívódik.
+    Visszatérés: a commitok száma."""
+    commits = 0
+    for i in range(0, len(ops), BATCH_LIMIT):
+        batch = fs_db.batch()
+        add_ops(batch, ops[i:i + BATCH_LIMIT])
+        batch.commit()
+        commits += 1
+        if on_progress:
+            on_progress(min(i + BATCH_LIMIT, len(ops)), len(ops))
+    return commits
+
+
+def editor_change_ops(coll, df, changes, doc_id=lambda row: row["ID"], to_update=None, to_new=None, new_doc_id=None):
+    """Egy st.data_editor változáslistáját (deleted_rows / edited_rows / added_rows) műveletekké alakítja.
+
+    coll: a Firestore kollekció; df: a szerkesztőnek átadott DataFrame (a sorindexek erre mutatnak).
+    doc_id(sor) → a sor dokumentum-azonosítója; to_update(módosítások) és to_new(új sor) a mezőneveket
+    képezi le (None/üres eredmény → a sor kimarad); new_doc_id(adat) → az új dokumentum azonosítója
+    (alapból automatikus)."""
+    ops = []
+    for idx in changes.get("deleted_rows", []):
+        ops.append(("delete", coll.document(doc_id(df.iloc[int(idx)])), None))
+    for idx, edits in changes.get("edited_rows", {}).items():
+        data = to_update(edits) if to_update else dict(edits)
+        if data:
+            ops.append(("update", coll.document(doc_id(df.iloc[int(idx)])), data))
+    for new_row in changes.get("added_rows", []):
+        data = to_new(new_row) if to_new else dict(new_row)
+        if data:
+            ref = coll.document(new_doc_id(data)) if new_doc_id else coll.document()
+            ops.append(("set", ref, data))
+    return ops
+
+
+def summarize_ops(ops):
+    """{"set": n, "update": n, "delete": n} — a felhasználói összegzéshez."""
+    summary = {"set": 0, "update": 0, "delete": 0}
+    for kind, _, _ in ops:
+        summary[kind] += 1
+    return summary
@@ -1,44 +1,90 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from datetime import datetime
 
-def render_monthly_attendance_chart(df, historical_stats, year, month):
+
+MONTH_NAMES = ["Január", "Február", "Március", "Április", "Május", "Június",
+               "Július", "Augusztus", "Szeptember", "Október", "November", "December"]
+
+
+# --- Diagram-adatréteg ---
+# Az év alkalom-összesítőiből (session_summaries, évente ~50 kis dokumentum) és a
+# historical_session_totals-ból számol; az eredmény (összesítők, historikus
+# összesítők, év, hónap) szerint memoizált. A render_* függvények már csak az
+# Altair-specifikációt építik.
+
+def _historical_key(historical_stats):
+    """A historical_session_totals lista hash-elhető alakban (a memoizálás kulcsához)."""
+    return tuple((str(hs["date"]), hs["total"]) for hs in historical_stats or [])
+
+
+def _summaries_key(summaries):
+    """{dátum: összesítő} → ((dátum, létszám, élő rekordok száma), ...) dátum szerint rendezve."""
+    return tuple(sorted(
+        (date, int(s.get("count") or 0), int(s.get("live_records") or 0))
+        for date, s in (summaries or {}).items()
+    ))
+
+
+def _historical_frame(historical_key):
+    """(dátum, összlétszám) párok → DataFrame: date (ÉÉÉÉ-HH-NN), total; dátumonként az első."""
+    hist = pd.DataFrame(list(historical_key), columns=["date", "total"])
+    stamps = pd.to_datetime(hist["date"], format="%Y-%m-%d", errors="coerce")
+    hist = hist.assign(date=stamps.dt.strftime("%Y-%m-%d"),
+                       total=pd.to_numeric(hist["total"], errors="coerce").fillna(0))
+    return hist[stamps.notna()].drop_duplicates("date")
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _session_values(summaries_key, historical_key):
+    """Alkalmankénti létszám: date, year, month, value, session.
+
+    Ahol van élő (nem legacy) rekord, az összesítő létszáma számít; egyébként a
+    historikus összesítő (a legacy alkalmak vendégekkel együtt), ha van, különben
+    a legacy rekordokból számolt létszám."""
+    live = pd.DataFrame(list(summaries_key), columns=["date", "count", "live"])
+    hist = _historical_frame(historical_key).set_index("date")["total"]
+    frame = live.set_index("date").join(hist, how="outer")
+    has_live = frame["live"].fillna(0) > 0
+    frame["value"] = frame["count"].where(has_live, frame["total"].where(frame["total"].notna(), frame["count"])).fillna(0).round().astype("int64")
+    frame["session"] = has_live | frame["total"].notna() | (frame["value"] > 0)
+    stamps = pd.to_datetime(frame.index.to_series(), format="%Y-%m-%d", errors="coerce")
+    frame = frame.assign(year=stamps.dt.year, month=stamps.dt.month)[stamps.notna()]
+    return frame.reset_index()[["date", "year", "month", "value", "session"]]
+
+
+def monthly_chart_data(summaries, historical_stats, year, month):
+    """Alkalmankénti létszám a hónapban: Dátum, Létszám (fő)."""
+    values = _session_values(_summaries_key(summaries), _historical_key(historical_stats))
+    sel = values[(values["year"] == year) & (values["month"] == month) & (values["value"] > 0)]
+    return pd.DataFrame({"Dátum": sel["date"].values, "Létszám (fő)": sel["value"].values})
+
+
+def yearly_chart_data(summaries, historical_stats, year):
+    """Havi összes és alkalmankénti átlagos részvétel az évben (12 sor)."""
+    values = _session_values(_summaries_key(summaries), _historical_key(historical_stats))
+    sel = values[(values["year"] == year) & values["session"]]
+    months = range(1, 13)
+    totals = sel.groupby("month")["value"].sum().reindex(months, fill_value=0)
+    sessions = sel.groupby("month").size().reindex(months, fill_value=0)
+    avg = (totals / sessions.where(sessions > 0)).fillna(0).round(1)
+    return pd.DataFrame({
+        "Hónap": MONTH_NAMES, "Hónap Sorszám": list(months),
+        "Összes Részvétel": totals.values, "Átlagos Részvétel": avg.values,
+    })
+
+
+def render_monthly_attendance_chart(df_chart, year, month):
     """
     Renders a bar chart showing attendance per session in a given month.
+    df_chart: monthly_chart_data() eredménye.
     """
     st.markdown(f"#### 📅 Alkalmankénti Jelenlét ({year}. {month:02d}.)")
-    
-    records = []
-    active_days = set()
-    for _, row in df.iterrows():
-        date_val = str(row.get("Alkalom Dátuma", "")).strip()
-        from modules.utils import parse_date_str
-        dt = parse_date_str(date_val)
-        
-        is_coming = str(row.get("Jön-e", "")).strip()
-        
-        if dt and dt.year == year and dt.month == month and is_coming == "Yes":
-            date_str = dt.strftime("%Y-%m-%d")
-            records.append({"Dátum": date_str, "Jelenlét": 1})
-            active_days.add(date_str)
-            
-    # Add historical stats if they don't overlap with active data
-    if historical_stats:
-        for hs in historical_stats:
-            h_dt = datetime.strptime(hs["date"], "%Y-%m-%d")
-            if h_dt.year == year and h_dt.month == month:
-                if hs["date"] not in active_days:
-                    records.append({"Dátum": hs["date"], "Jelenlét": hs["total"]})
-                    active_days.add(hs["date"])
-                    
-    if not records:
+
+    if df_chart.empty:
         st.info(f"Nem találtunk aktív 'Yes' jelenlétet vagy statisztikát a {year}/{month} időszakban.")
         return
-        
-    df_chart = pd.DataFrame(records).groupby("Dátum").sum().reset_index()
-    df_chart.columns = ["Dátum", "Létszám (fő)"]
-    
+
     chart = alt.Chart(df_chart).mark_bar(cornerRadiusEnd=5, color="#4a90d9").encode(
         x=alt.X("Dátum:N", title="Edzés Dátuma"),
         y=alt.Y("Létszám (fő):Q", title="Részvevők Száma"),
@@ -57,56 +103,14 @@ def render_monthly_attendance_chart(df, historical_stats, year, month):
     st.altair_chart(chart + text, use_container_width=True)
 
 
-def render_yearly_attendance_chart(df, historical_stats, year):
+def render_yearly_attendance_chart(df_chart, year):
     """
     Renders a bar/line chart showing cumulative attendance per month in a year.
     Plus average attendance per session.
+    df_chart: yearly_chart_data() eredménye.
     """
     st.markdown(f"#### 📈 Éves Kumulált Jelenlét és Átlag ({year})")
 
-    month_names = ["Január", "Február", "Március", "Április", "Május", "Június", 
-                   "Július", "Augusztus", "Szeptember", "Október", "November", "December"]
-                   
-    from modules.utils import parse_date_str
-    
-    monthly_stats = {m: {"total": 0, "sessions": set()} for m in range(1, 13)}
-    
-    for _, row in df.iterrows():
-        date_val = str(row.get("Alkalom Dátuma", "")).strip()
-        dt = parse_date_str(date_val)
-        is_coming = str(row.get("Jön-e", "")).strip()
-        
-        if dt and dt.year == year:
-            date_str = dt.strftime("%Y-%m-%d")
-            monthly_stats[dt.month]["sessions"].add(date_str)
-            if is_coming == "Yes":
-                monthly_stats[dt.month]["total"] += 1
-                
-    # Merge historical stats
-    if historical_stats:
-        for hs in historical_stats:
-            h_dt = datetime.strptime(hs["date"], "%Y-%m-%d")
-            if h_dt.year == year:
-                # Avoid overlap
-                if hs["date"] not in monthly_stats[h_dt.month]["sessions"]:
-                    monthly_stats[h_dt.month]["sessions"].add(hs["date"])
-                    monthly_stats[h_dt.month]["total"] += hs["total"]
-                
-    chart_data = []
-    for m in range(1, 13):
-        total = monthly_stats[m]["total"]
-        session_count = len(monthly_stats[m]["sessions"])
-        avg = total / session_count if session_count > 0 else 0
-        
-        chart_data.append({
-            "Hónap": month_names[m-1],
-            "Hónap Sorszám": m,
-            "Összes Részvétel": total,
-            "Átlagos Részvétel": round(avg, 1)
-        })
-        
-    df_chart = pd.DataFrame(chart_data)
-    
     if df_chart["Összes Részvétel"].sum() == 0:
         st.info(f"Nincsenek adatok a {year}. évre.")
         return
@@ -0,0 +1,76 @@
+import streamlit as st
+import os
+import json
+
+from modules.config import CREDENTIALS_FILE
+
+
+def _parse_private_key(creds_dict):
+    if "private_key" in creds_dict:
+        pk = creds_dict["private_key"].strip().strip('"').strip("'")
+        if "\\n" in pk:
+            pk = pk.replace("\\n", "\n")
+        creds_dict["private_key"] = pk
+    return creds_dict
+
+
+@st.cache_resource(ttl=3600)
+def get_gsheet_connection():
+    import gspread  # lazy: csak az első Sheets-használatkor töltődik be
+    if hasattr(st, 'secrets') and "google_creds" in st.secrets:
+        try:
+            creds_dict = _parse_private_key(dict(st.secrets["google_creds"]))
+            return gspread.service_account_from_dict(creds_dict)
+        except Exception as e:
+            st.warning(f"GSheet kapcsolódási hiba: {e}")
+    if os.path.exists(CREDENTIALS_FILE):
+        try:
+            return gspread.service_account(filename=CREDENTIALS_FILE)
+        except Exception as e:
+            st.warning(f"GSheet kapcsolódási hiba (fájl): {e}")
+    return None
+
+
+@st.cache_resource(ttl=3600)
+def get_firestore_db():
+    from google.cloud import firestore  # lazy: a check-in útvonal is csak ezt az egy klienst húzza be
+    from google.oauth2 import service_account
+    try:
+        if hasattr(st, 'secrets') and "google_creds" in st.secrets:
+            creds_dict = _parse_private_key(dict(st.secrets["google_creds"]))
+            creds = service_account.Credentials.from_service_account_info(creds_dict)
+            return firestore.Client(credentials=creds, project=creds_dict.get("project_id"))
+        elif os.path.exists(CREDENTIALS_FILE):
+            with open(CREDENTIALS_FILE, 'r') as f:
+                creds_dict = json.load(f)
+            return firestore.Client.from_service_account_json(CREDENTIALS_FILE, project=creds_dict.get("project_id"))
+    except Exception as e:
+        st.error(f"Firestore indítási hiba: {e}")
+    return None
+
+
+# --- Igény szerinti kliens-nyilvántartás ---
+# Backend név → kliensgyár. A kliens csak akkor jön létre (és a hozzá tartozó
+# könyvtár csak akkor importálódik), amikor egy oldal először kéri.
+_BACKENDS = {
+    "gsheet": get_gsheet_connection,
+    "firestore": get_firestore_db,
+}
+
+
+@st.cache_resource
+def _backend_status():
+    """Folyamatszintű nyilvántartás: mely backendek nyíltak már meg, és sikeresen-e."""
+    return {}
+
+
+def get_client(backend):
+    """Visszaadja a backend kliensét; az első hívás nyitja meg a kapcsolatot."""
+    client = _BACKENDS[backend]()
+    _backend_status()[backend] = client is not None
+    return client
+
+
+def backend_status():
+    """{backend: True/False} a már megnyitott backendekre (a meg nem nyitottak hiányoznak)."""
+    return dict(_backend_status())
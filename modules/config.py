@@ -16,8 +16,48 @@ LEGACY_SHEET_NAME = "Legacy_Totals"
 FIRESTORE_HISTORICAL = "historical_session_totals"
 HISTORICAL_SHEET_NAME = "Old_Sessions_Totals"
 FIRESTORE_APP_LOGS = "app_logs"
+FIRESTORE_SESSION_SUMMARIES = "session_summaries"
+FIRESTORE_LIVE_COUNTERS = "live_counters"
+FIRESTORE_PAYMENT_LEDGER = "payment_ledger"
+FIRESTORE_PLAYER_BALANCES = "player_balances"
 TOLERANCE = 500  # Ft
 
+# QR → Sheet háttérszinkron
+QR_SYNC_INTERVAL_SEC = 15 * 60      # periodikus futás gyakorisága
+QR_SYNC_BATCH_SIZE = 200            # ennyi rekord megy egy append_rows + WriteBatch körben
+QR_SYNC_MAX_RETRIES = 4             # próbálkozások száma hálózati hibánál (exponenciális várakozással)
+SESSION_END_TIME = (21, 30)         # a keddi edzés vége (óra, perc), magyar idő szerint
+QR_SYNC_AFTER_SESSION_MIN = 10      # ennyivel az edzés vége után fut egy extra szinkron
+
+# Jelenléti Sheet inkrementális olvasása
+SHEET_TAIL_COLUMNS = "F"            # az utolsó olvasott oszlop (Név … Mód)
+SHEET_SAMPLE_ROWS = 8               # ennyi, körönként változó sort ellenőriz a checksum (+ fejléc és utolsó sor)
+
+# Adatbázis oldal: lapozott táblanézetek
+ATTENDANCE_MODES = ["valós", "qr", "legacy", "teszt"]
+DB_PAGE_SIZE_OPTIONS = [50, 100, 250]
+
+# Oldalankénti párhuzamos adatbetöltés
+DATA_LOAD_WORKERS = 8               # egyszerre futó betöltő hívások (folyamatszinten)
+DATA_LOAD_TIMEOUT_SEC = 20          # alapértelmezett hívásonkénti időkorlát
+
+# Élő check-in számláló (live_counters/{dátum}/shards/{i})
+LIVE_COUNTER_SHARDS = 10            # ~1 írás/s/dokumentum korlát → ennyi párhuzamos író fér el ütközés nélkül
+LIVE_COUNTER_TTL_SEC = 10           # az olvasó cache ideje (másodperc)
+
+# Élő alkalom-tábla (Áttekintés oldal)
+LIVE_BOARD_REFRESH_SEC = 3          # a néző fragmentjének frissítési gyakorisága (csak memóriát olvas)
+LIVE_BOARD_IDLE_SEC = 15 * 60       # ennyi idő után áll le a néző nélküli figyelő
+LIVE_BOARD_REAP_SEC = 60            # a tétlen figyelőket kereső háttérszál ébredési gyakorisága
+LIVE_BOARD_EVENTS = 20              # megjelenített legutóbbi változások száma
+
+# Havi elszámoló emailek tömeges küldése (modules/mailer.py)
+MAIL_WORKERS = 3                    # párhuzamos küldő szál = legfeljebb ennyi nyitott SMTP kapcsolat
+MAIL_RATE_PER_SEC = 5               # legfeljebb ennyi levél indul másodpercenként
+MAIL_MAX_ATTEMPTS = 3               # címzettenkénti próbálkozások átmeneti hibánál (4xx, megszakadt kapcsolat)
+MAIL_RETRY_BACKOFF_SEC = 1.0        # az újrapróbálás alapvárakozása (kísérletenként duplázódik)
+MAIL_TIMEOUT_SEC = 30               # SMTP socket időkorlát
+
 MAIN_NAME_LIST = [
     "Anna Sengler", "Annamária Földváry", "Flóra", "Boti",
     "Csanád Laczkó", "Csenge Domokos", "Detti Szabó", "Dóri Békási",
@@ -0,0 +1,26 @@
+import calendar
+from datetime import datetime, timedelta
+
+from modules.config import HUNGARY_TZ
+
+
+def generate_tuesday_dates(past_count=8, future_count=2):
+    tuesday_dates_list = []
+    today = datetime.now(HUNGARY_TZ).date()
+    days_since_tuesday = (today.weekday() - 1) % 7
+    last_tuesday = today - timedelta(days=days_since_tuesday)
+    for i in range(past_count):
+        tuesday_dates_list.insert(0, (last_tuesday - timedelta(weeks=i)).strftime("%Y-%m-%d"))
+    for i in range(1, future_count + 1):
+        tuesday_dates_list.append((last_tuesday + timedelta(weeks=i)).strftime("%Y-%m-%d"))
+    return tuesday_dates_list
+
+
+def get_tuesdays_in_month(year, month):
+    tuesdays = []
+    cal = calendar.monthcalendar(year, month)
+    for week in cal:
+        tuesday_day = week[calendar.TUESDAY]
+        if tuesday_day != 0:
+            tuesdays.append(datetime(year, month, tuesday_day).date())
+    return tuesdays
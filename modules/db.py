@@ -1,58 +1,27 @@
 import streamlit as st
-import gspread
 from google.cloud import firestore
-from google.oauth2 import service_account
 import os
-import json
+import threading
 import pandas as pd
 
+from modules.clients import get_gsheet_connection, get_firestore_db  # noqa: F401 (visszafelé kompatibilitás)
+from modules.attendance_store import write_attendance_rows_fs
+from modules.batch_writes import add_ops, commit_in_chunks
+from modules.session_summaries import apply_summary_deltas
+from modules.player_balances import (
+    balance_ops, charge_deltas, ensure_player_balances, month_key, settlement_charges, stored_settlement_charges,
+)
+from modules.attendance_store import get_device_registration, save_device_registration  # noqa: F401 (visszafelé kompatibilitás)
 from modules.config import (
-    CREDENTIALS_FILE, GSHEET_NAME, FIRESTORE_COLLECTION, FIRESTORE_INVOICES,
+    FIRESTORE_COLLECTION, FIRESTORE_INVOICES,
     FIRESTORE_CANCELLED, FIRESTORE_MEMBERS, MEMBERS_SHEET_NAME, FIRESTORE_NAME_MAPPING,
-    FIRESTORE_SETTLEMENTS, FIRESTORE_DEVICES, FIRESTORE_LEGACY, LEGACY_SHEET_NAME,
+    FIRESTORE_SETTLEMENTS, FIRESTORE_LEGACY, LEGACY_SHEET_NAME,
     FIRESTORE_HISTORICAL, HISTORICAL_SHEET_NAME
 )
+from modules.sheets import get_sheet_registry, get_attendance_reader, write_table
 
-
-def _parse_private_key(creds_dict):
-    if "private_key" in creds_dict:
-        pk = creds_dict["private_key"].strip().strip('"').strip("'")
-        if "\\n" in pk:
-            pk = pk.replace("\\n", "\n")
-        creds_dict["private_key"] = pk
-    return creds_dict
-
-
-@st.cache_resource(ttl=3600)
-def get_gsheet_connection():
-    if hasattr(st, 'secrets') and "google_creds" in st.secrets:
-        try:
-            creds_dict = _parse_private_key(dict(st.secrets["google_creds"]))
-            return gspread.service_account_from_dict(creds_dict)
-        except Exception as e:
-            st.warning(f"GSheet kapcsolódási hiba: {e}")
-    if os.path.exists(CREDENTIALS_FILE):
-        try:
-            return gspread.service_account(filename=CREDENTIALS_FILE)
-        except Exception as e:
-            st.warning(f"GSheet kapcsolódási hiba (fájl): {e}")
-    return None
-
-
-@st.cache_resource(ttl=3600)
-def get_firestore_db():
-    try:
-        if hasattr(st, 'secrets') and "google_creds" in st.secrets:
-            creds_dict = _parse_private_key(dict(st.secrets["google_creds"]))
-            creds = service_account.Credentials.from_service_account_info(creds_dict)
-            return firestore.Client(credentials=creds, project=creds_dict.get("project_id"))
-        elif os.path.exists(CREDENTIALS_FILE):
-            with open(CREDENTIALS_FILE, 'r') as f:
-                creds_dict = json.load(f)
-            return firestore.Client.from_service_account_json(CREDENTIALS_FILE, project=creds_dict.get("project_id"))
-    except Exception as e:
-        st.error(f"Firestore indítási hiba: {e}")
-    return None
+# Hiányzó tag-munkalap létrehozása fejléccel
+_MEMBERS_SHEET_SPEC = {"rows": 100, "cols": 5, "header": ["Név", "Email", "Aktív"]}
 
 
 def save_all_data(gs_client, fs_client, rows):
@@ -64,8 +33,9 @@ def save_all_data(gs_client, fs_client, rows):
     # Google Sheets mentés — hiba esetén folytatódik a Firestore mentés
     if gs_client:
         try:
-            sheet = gs_client.open(GSHEET_NAME).sheet1
-            sheet.append_rows(rows, value_input_option='USER_ENTERED')
+            get_sheet_registry(gs_client).call(
+                lambda ws: ws.append_rows(rows, value_input_option='USER_ENTERED')
+            )
             success_gs = True
         except Exception as e:
             error_msg_gs = str(e)
@@ -74,12 +44,7 @@ def save_all_data(gs_client, fs_client, rows):
     # Firestore mentés — a GS eredményétől független
     if fs_client:
         try:
-            for r in rows:
-                doc_ref = fs_client.collection(FIRESTORE_COLLECTION).document()
-                doc_ref.set({
-                    "name": r[0], "status": r[1], "timestamp": r[2],
-                    "event_date": r[3], "mode": r[5] if len(r) > 5 else "ismeretlen"
-                })
+            write_attendance_rows_fs(fs_client, rows)
             success_fs = True
         except Exception as e:
             error_msg_fs = str(e)
@@ -104,7 +69,7 @@ def get_attendance_rows_gs(_client):
     if _client is None:
         return []
     try:
-        return _client.open(GSHEET_NAME).sheet1.get_all_values()
+        return get_attendance_reader(_client).read()
     except Exception as e:
         st.warning(f"⚠️ Google Sheet betöltési hiba: {e}")
         return []
@@ -147,6 +112,84 @@ def get_cancelled_sessions_fs(_db):
         return set()
 
 
+_MONTH_NAMES = ["Január", "Február", "Március", "Április", "Május", "Június",
+                "Július", "Augusztus", "Szeptember", "Október", "November", "December"]
+
+
+def invoice_row_fs(doc_id, d):
+    d["ID"] = doc_id
+    if "month_name" not in d and "target_month" in d:
+        d["month_name"] = _MONTH_NAMES[int(d["target_month"]) - 1]
+    return d
+
+
+def page_order_fields(order_field, filters=()):
+    """A get_page_fs tényleges rendezési kulcsai. Tartomány-szűrőnél a Firestore azt
+    követeli, hogy az első rendezési mező maga a szűrt mező legyen; a kért mező ilyenkor
+    csak másodlagos kulcs (a felület ezt jelzi)."""
+    order_fields = []
+    for field, op, _ in filters:
+        if op != "==" and field not in order_fields:
+            order_fields.append(field)
+    if order_field not in order_fields:
+        order_fields.append(order_field)
+    return order_fields
+
+
+_order_fields_ready = set()
+_order_fields_lock = threading.Lock()
+
+
+def ensure_order_field(fs_db, collection, field):
+    """Az order_by kihagyja azokat a dokumentumokat, amelyekben a mező hiányzik.
+
+    Folyamatonként és mezőnként egyszer két count() aggregációval (1-1 olvasás / 1000
+    indexbejegyzés) ellenőrzi, hogy minden dokumentumban megvan-e; ha nem, a hiányzó
+    mezőt null-lal pótolja (a null rendezhető érték, így a dokumentum a lapozásban is megjelenik)."""
+    key = (id(fs_db), collection, field)
+    if key in _order_fields_ready:
+        return
+    with _order_fields_lock:
+        if key in _order_fields_ready:
+            return
+        coll = fs_db.collection(collection)
+        total = coll.count().get()[0][0].value
+        ordered = coll.order_by(field).count().get()[0][0].value
+        if ordered < total:
+            ops = [("update", doc.reference, {field: None}) for doc in coll.stream()
+                   if field not in (doc.to_dict() or {})]
+            commit_in_chunks(fs_db, ops)
+            print(f"{collection}: {len(ops)} dokumentum '{field}' mezője null-lal pótolva a lapozáshoz")
+        _order_fields_ready.add(key)
+
+
+@st.cache_data(ttl=60)
+def get_page_fs(_db, collection, page_size, order_field, descending=True, filters=(), cursor_id=None):
+    """Egy oldalnyi dokumentum szerveroldali szűréssel és kurzoros lapozással.
+
+    filters: ((mező, művelet, érték), ...); a rendezési kulcsokat lásd page_order_fields,
+    a rendezési mezők meglétét ensure_order_field biztosítja. cursor_id: az előző oldal
+    utolsó dokumentumának azonosítója (start_after). Csak page_size + 1 dokumentum jön le;
+    a +1 jelzi, van-e következő oldal. Hibánál (pl. hiányzó összetett index) kivételt dob,
+    így a hiba nem kerül a cache-be; a hívó jeleníti meg.
+    Visszatérés: ([(azonosító, adat), ...], van_következő_oldal)."""
+    if _db is None:
+        return [], False
+    direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+    query = _db.collection(collection)
+    for field, op, value in filters:
+        query = query.where(field, op, value)
+    for field in page_order_fields(order_field, filters):
+        ensure_order_field(_db, collection, field)
+        query = query.order_by(field, direction=direction)
+    if cursor_id:
+        cursor = _db.collection(collection).document(cursor_id).get()
+        if cursor.exists:
+            query = query.start_after(cursor)
+    docs = list(query.limit(page_size + 1).stream())
+    return [(doc.id, doc.to_dict()) for doc in docs[:page_size]], len(docs) > page_size
+
+
 @st.cache_data(ttl=60)
 def get_invoices_fs(_db):
     if _db is None:
@@ -154,14 +197,8 @@ def get_invoices_fs(_db):
     try:
         docs = _db.collection(FIRESTORE_INVOICES).stream()
         invoices = []
-        month_names = ["Január", "Február", "Március", "Április", "Május", "Június",
-                       "Július", "Augusztus", "Szeptember", "Október", "November", "December"]
         for doc in docs:
-            d = doc.to_dict()
-            d["ID"] = doc.id
-            if "month_name" not in d and "target_month" in d:
-                d["month_name"] = month_names[int(d["target_month"]) - 1]
-            invoices.append(d)
+            invoices.append(invoice_row_fs(doc.id, doc.to_dict()))
         invoices.sort(key=lambda x: (int(x.get('target_year', 0)), int(x.get('target_month', 0))), reverse=True)
         return invoices
     except Exception as e:
@@ -190,14 +227,9 @@ def get_members_gs(_gs_client):
     if _gs_client is None:
         return pd.DataFrame(columns=["Név", "Email", "Aktív"])
     try:
-        ss = _gs_client.open(GSHEET_NAME)
-        sheet_titles = [w.title for w in ss.worksheets()]
-        if MEMBERS_SHEET_NAME not in sheet_titles:
-            ws = ss.add_worksheet(title=MEMBERS_SHEET_NAME, rows=100, cols=5)
-            ws.append_row(["Név", "Email", "Aktív"])
-            return pd.DataFrame(columns=["Név", "Email", "Aktív"])
-        ws = ss.worksheet(MEMBERS_SHEET_NAME)
-        rows = ws.get_all_values()
+        rows = get_sheet_registry(_gs_client).call(
+            lambda ws: ws.get_all_values(), title=MEMBERS_SHEET_NAME, create=_MEMBERS_SHEET_SPEC
+        )
         if len(rows) < 2:
             return pd.DataFrame(columns=["Név", "Email", "Aktív"])
         return pd.DataFrame(rows[1:], columns=rows[0])
@@ -209,38 +241,87 @@ def get_members_gs(_gs_client):
 def sync_members_fs_to_gs(fs_db, gs_client):
     df = get_members_fs(fs_db)
     try:
-        ss = gs_client.open(GSHEET_NAME)
-        sheet_titles = [w.title for w in ss.worksheets()]
-        if MEMBERS_SHEET_NAME not in sheet_titles:
-            ws = ss.add_worksheet(title=MEMBERS_SHEET_NAME, rows=100, cols=5)
-        else:
-            ws = ss.worksheet(MEMBERS_SHEET_NAME)
-        ws.clear()
         rows = [["Név", "Email", "Aktív"]]
         for _, row in df.iterrows():
             rows.append([row["Név"], row["Email"], str(row["Aktív"])])
-        ws.append_rows(rows, value_input_option="USER_ENTERED")
+        write_table(gs_client, rows, title=MEMBERS_SHEET_NAME, create=_MEMBERS_SHEET_SPEC)
         return True, f"{len(df)} tag szinkronizálva a Sheet-be."
     except Exception as e:
         return False, str(e)
 
 
+def normalize_member_name(name):
+    """Összevetési kulcs: kisbetűs (casefold), levágott, egyszeres szóközökkel."""
+    return " ".join(str(name or "").split()).casefold()
+
+
+def _as_active(value):
+    if isinstance(value, bool):
+        return value
+    return str(value if value is not None else True).strip().lower() not in ("false", "0", "nem")
+
+
+def upsert_members_fs(fs_db, members, delete_missing=False, delete_ids=()):
+    """Kulcsolt (normalizált név szerinti) tag-upsert WriteBatch-ekkel.
+
+    members: [{"name", "email", "active", opcionálisan "id"}]. Ha van "id", a meglévő
+    dokumentumot azonosítja (átnevezésnél is); különben a normalizált név. Csak a
+    ténylegesen eltérő mezők íródnak, a meglévő dokumentumok azonosítója megmarad
+    (a checkin.html ezeket cache-eli). delete_missing=True esetén a listában nem
+    szereplő tagok törlődnek; delete_ids a kifejezetten törlendő azonosítók.
+    Visszatérés: {"created", "updated", "deleted", "unchanged"}."""
+    coll = fs_db.collection(FIRESTORE_MEMBERS)
+    existing = {doc.id: (doc.reference, doc.to_dict()) for doc in coll.stream()}
+    by_key = {}
+    for doc_id, (_, d) in existing.items():
+        by_key.setdefault(normalize_member_name(d.get("name")), doc_id)
+
+    ops = []
+    seen_ids, seen_keys = set(), set()
+    stats = {"created": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    for m in members:
+        name = " ".join(str(m.get("name") or "").split())
+        key = normalize_member_name(name)
+        if not key or key in seen_keys:
+            continue
+        seen_keys.add(key)
+        data = {"name": name, "email": str(m.get("email") or "").strip(), "active": _as_active(m.get("active"))}
+        doc_id = m.get("id") if m.get("id") in existing else by_key.get(key)
+        if doc_id is None or doc_id in seen_ids:
+            ops.append(("set", coll.document(), data))
+            stats["created"] += 1
+            continue
+        seen_ids.add(doc_id)
+        ref, current = existing[doc_id]
+        changed = {k: v for k, v in data.items() if current.get(k) != v}
+        if changed:
+            ops.append(("update", ref, changed))
+            stats["updated"] += 1
+        else:
+            stats["unchanged"] += 1
+
+    to_delete = set(delete_ids) if not delete_missing else set(existing) - seen_ids
+    for doc_id in to_delete - seen_ids:
+        if doc_id in existing:
+            ops.append(("delete", existing[doc_id][0], None))
+            stats["deleted"] += 1
+    commit_in_chunks(fs_db, ops)
+    return stats
+
+
 def sync_members_gs_to_fs(gs_client, fs_db):
     df = get_members_gs(gs_client)
+    if df.empty:
+        return False, "Nincs tag a Sheet-ben — a Firestore érintetlen maradt."
     try:
-        docs = fs_db.collection(FIRESTORE_MEMBERS).stream()
-        for doc in docs:
-            doc.reference.delete()
-        count = 0
-        for _, row in df.iterrows():
-            name = str(row.get("Név", "")).strip()
-            email = str(row.get("Email", "")).strip()
-            if not name:
-                continue
-            active = str(row.get("Aktív", "True")).lower() not in ("false", "0", "nem")
-            fs_db.collection(FIRESTORE_MEMBERS).add({"name": name, "email": email, "active": active})
-            count += 1
-        return True, f"{count} tag szinkronizálva a Firestore-ba."
+        members = [
+            {"name": row.get("Név", ""), "email": row.get("Email", ""), "active": row.get("Aktív", "True")}
+            for _, row in df.iterrows()
+        ]
+        stats = upsert_members_fs(fs_db, members, delete_missing=True)
+        count = stats["created"] + stats["updated"] + stats["unchanged"]
+        return True, (f"{count} tag szinkronizálva a Firestore-ba "
+                      f"({stats['created']} új, {stats['updated']} módosított, {stats['deleted']} törölt).")
     except Exception as e:
         return False, str(e)
 
@@ -251,14 +332,29 @@ def save_settlement_fs(fs_db, year, month_num, month_name, df_elszamolas, df_oss
         return False, "Nincs Firestore kapcsolat."
     try:
         doc_id = f"{year}-{int(month_num):02d}"
-        fs_db.collection(FIRESTORE_SETTLEMENTS).document(doc_id).set({
+        ref = fs_db.collection(FIRESTORE_SETTLEMENTS).document(doc_id)
+        data = {
             "year": year,
             "month_num": int(month_num),
             "month_name": month_name,
             "df_elszamolas": df_elszamolas.to_json(orient="records", force_ascii=False),
             "df_osszesito": df_osszesito.to_json(orient="records", force_ascii=False),
             "saved_at": firestore.SERVER_TIMESTAMP,
-        })
+        }
+        new_charges = settlement_charges(df_osszesito)
+        ensure_player_balances(fs_db)
+
+        # folyószámlák: csak a hónap korábbi és új terhelése közti különbség íródik. A régi
+        # elszámolás olvasása és az írás egy tranzakció: két egyidejű mentés (tömeges
+        # újraszámolás + kézi mentés) így nem terheli kétszer ugyanazt a különbséget.
+        @firestore.transactional
+        def _apply(transaction):
+            old = ref.get(transaction=transaction)
+            old_charges = stored_settlement_charges(old.to_dict()) if old.exists else {}
+            deltas = charge_deltas(month_key(year, month_num), old_charges, new_charges)
+            add_ops(transaction, [("set", ref, data)] + balance_ops(fs_db, deltas))
+
+        _apply(fs_db.transaction())
         return True, doc_id
     except Exception as e:
         return False, str(e)
@@ -361,57 +457,6 @@ def get_avg_session_attendees_for_year(_fs_db, year: int):
 
 
 
-def sync_qr_checkins_to_sheet(fs_db, gs_client):
-    """QR check-in rekordokat (synced_to_sheet=False) szinkronizálja a Google Sheetsbe."""
-    if not fs_db or not gs_client:
-        return 0
-    try:
-        docs = list(fs_db.collection(FIRESTORE_COLLECTION)
-                    .where("synced_to_sheet", "==", False).stream())
-        if not docs:
-            return 0
-        rows = []
-        for doc in docs:
-            d = doc.to_dict()
-            rows.append([d.get("name",""), d.get("status","Yes"),
-                         d.get("timestamp",""), d.get("event_date",""), "", d.get("mode","qr")])
-        sheet = gs_client.open(GSHEET_NAME).sheet1
-        sheet.append_rows(rows, value_input_option='USER_ENTERED')
-        for doc in docs:
-            doc.reference.update({"synced_to_sheet": True})
-        return len(rows)
-    except Exception:
-        return 0
-
-
-def get_device_registration(fs_db, device_id):
-    """Visszaadja a device_id-hez tartozó nevet, vagy None-t."""
-    if not fs_db or not device_id:
-        return None
-    try:
-        doc = fs_db.collection(FIRESTORE_DEVICES).document(device_id).get()
-        if doc.exists:
-            return doc.to_dict().get("name")
-        return None
-    except Exception:
-        return None
-
-
-def save_device_registration(fs_db, device_id, name):
-    """Elmenti a device_id → name mappinget Firestore-ba."""
-    if not fs_db or not device_id:
-        return False
-    try:
-        fs_db.collection(FIRESTORE_DEVICES).document(device_id).set({
-            "name": name,
-            "registered_at": firestore.SERVER_TIMESTAMP,
-        })
-        return True
-    except Exception as e:
-        st.warning(f"⚠️ Eszköz regisztráció mentési hiba (legközelebb újra kell azonosítanod magad): {e}")
-        return False
-
-
 @st.cache_data(ttl=120)
 def get_name_mappings_fs(_db):
     if _db is None:
@@ -454,17 +499,10 @@ def sync_legacy_fs_to_gs(fs_db, gs_client):
     if not data:
         return False, "Nincs adat a Firestore-ban."
     try:
-        ss = gs_client.open(GSHEET_NAME)
-        sheet_titles = [w.title for w in ss.worksheets()]
-        if LEGACY_SHEET_NAME not in sheet_titles:
-            ws = ss.add_worksheet(title=LEGACY_SHEET_NAME, rows=100, cols=4)
-        else:
-            ws = ss.worksheet(LEGACY_SHEET_NAME)
-        ws.clear()
         rows = [["Név", "Összes (All time)", "2024", "2025", "2026"]]
         for rec in data:
             rows.append([rec.get("name", ""), rec.get("total_all_time", 0), rec.get("year_2024", 0), rec.get("year_2025", 0), rec.get("year_2026", 0)])
-        ws.append_rows(rows, value_input_option="USER_ENTERED")
+        write_table(gs_client, rows, title=LEGACY_SHEET_NAME, create={"rows": 100, "cols": 5})
         return True, f"{len(data)} legacy rekord szinkronizálva a Sheet-be."
     except Exception as e:
         return False, str(e)
@@ -472,9 +510,7 @@ def sync_legacy_fs_to_gs(fs_db, gs_client):
 
 def sync_legacy_gs_to_fs(gs_client, fs_db):
     try:
-        ss = gs_client.open(GSHEET_NAME)
-        ws = ss.worksheet(LEGACY_SHEET_NAME)
-        rows = ws.get_all_values()
+        rows = get_sheet_registry(gs_client).call(lambda ws: ws.get_all_values(), title=LEGACY_SHEET_NAME)
         if len(rows) < 2:
             return False, "Nincs adat a Sheet-ben."
             
@@ -596,17 +632,14 @@ def import_historical_stats_to_db(fs_db, gs_client):
             batch.commit()
             
         if gs_client:
-            ss = gs_client.open(GSHEET_NAME)
-            sheet_titles = [w.title for w in ss.worksheets()]
-            if HISTORICAL_SHEET_NAME not in sheet_titles:
-                ws = ss.add_worksheet(title=HISTORICAL_SHEET_NAME, rows=max(100, len(historical_data)+10), cols=2)
-            else:
-                ws = ss.worksheet(HISTORICAL_SHEET_NAME)
-            ws.clear()
             rows = [["Dátum", "Összes Részvétel"]]
             for h in historical_data:
                 rows.append([h["date"], h["total"]])
-            ws.append_rows(rows, value_input_option="USER_ENTERED")
+            write_table(
+                gs_client, rows, title=HISTORICAL_SHEET_NAME,
+                create={"rows": max(100, len(historical_data) + 10), "cols": 2},
+                value_input_option="USER_ENTERED",
+            )
             
         return True, f"Sikeresen beolvasva és szinkronizálva {len(historical_data)} régi nap!"
     except Exception as e:
@@ -691,34 +724,25 @@ def import_legacy_attendance_records(fs_db, gs_client):
     if not records:
         return False, "Nem sikerült 'Jövök' értékeket kiolvasni az Excelből.", 0
 
-    # Firestore batch write (max 500/batch)
+    # Firestore: batch-ekben (max 500/batch), utána az érintett alkalom-összesítők
     if fs_db:
         try:
-            batch = fs_db.batch()
-            count_batch = 0
-            for rec in records:
-                doc_ref = fs_db.collection(FIRESTORE_COLLECTION).document()
-                batch.set(doc_ref, rec)
-                count_batch += 1
-                if count_batch >= 500:
-                    batch.commit()
-                    batch = fs_db.batch()
-                    count_batch = 0
-            if count_batch > 0:
-                batch.commit()
+            coll = fs_db.collection(FIRESTORE_COLLECTION)
+            apply_summary_deltas(fs_db, added=records, ops=[("set", coll.document(), rec) for rec in records])
         except Exception as e:
             return False, f"Firestore írási hiba: {e}", 0
 
     # GSheet write (max 500 sor/hívás)
     if gs_client:
         try:
-            sheet = gs_client.open(GSHEET_NAME).sheet1
+            registry = get_sheet_registry(gs_client)
             rows_to_add = [
                 [rec["name"], rec["status"], rec["timestamp"], rec["event_date"], "", rec["mode"]]
                 for rec in records
             ]
             for i in range(0, len(rows_to_add), 500):
-                sheet.append_rows(rows_to_add[i:i + 500], value_input_option='USER_ENTERED')
+                chunk = rows_to_add[i:i + 500]
+                registry.call(lambda ws: ws.append_rows(chunk, value_input_option='USER_ENTERED'))
         except Exception as e:
             st.cache_data.clear()
             return True, f"Firestore OK, de GSheet hiba: {e}", len(records)
@@ -0,0 +1,200 @@
+# Élő alkalom-tábla: dátumonként egyetlen, folyamatszintű Firestore-figyelő (on_snapshot).
+# A figyelő csak a változásokat (hozzáadott / módosított / törölt rekord) kapja meg,
+# ezekből inkrementálisan tartja karban a résztvevők névsorát. A nézők fragmentje
+# csak ezt a memóriabeli állapotot olvassa, így tíz néző ugyanannyi Firestore-olvasás,
+# mint egy. A néző nélkül maradt figyelőket egy háttérszál LIVE_BOARD_IDLE_SEC után
+# leállítja; a megszakadt (lezárt) figyelőt a következő nézői kérés újraindítja.
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+import streamlit as st
+
+from modules.config import (
+    FIRESTORE_COLLECTION, HUNGARY_TZ, LIVE_BOARD_IDLE_SEC, LIVE_BOARD_EVENTS, LIVE_BOARD_REAP_SEC,
+)
+from modules.session_summaries import record_contribution
+
+
+class SessionBoard:
+    """Egy alkalom (event_date) élő névsora.
+
+    A résztvevő-szabály azonos az összesítőkével: van "Yes" és nincs "No" rekordja.
+    Az első snapshot a kiinduló állapot; a későbbiek érkezési és távozási eseményként
+    is bekerülnek a legutóbbi változások listájába. Ha a figyelő lezárult (pl. a
+    stream helyreállíthatatlan hibája miatt), a restart() új figyelőt indít, amelynek
+    első snapshotja az állapotot nulláról építi újra."""
+
+    def __init__(self, date):
+        self.date = date
+        self.last_seen = time.monotonic()
+        self._records = {}              # dokumentum id → (név, státusz)
+        self._yes = Counter()
+        self._no = Counter()
+        self._attendees = set()
+        self._events = deque(maxlen=LIVE_BOARD_EVENTS)
+        self._version = 0
+        self._ready = False
+        self._updated_at = None
+        self._error = None
+        self._watch = None
+        self._resync = False
+        self._lock = threading.Lock()
+
+    def start(self, fs_db):
+        query = fs_db.collection(FIRESTORE_COLLECTION).where("event_date", "==", self.date)
+        self._watch = query.on_snapshot(self._on_snapshot)
+
+    def is_alive(self):
+        # a Watch hiba esetén saját szálon lezárja magát (_closed), visszahívás nélkül
+        return self._watch is not None and not getattr(self._watch, "_closed", False)
+
+    def restart(self, fs_db):
+        """Lezárt figyelő cseréje; az új figyelő első snapshotjáig a tábla nem "ready"."""
+        self.stop()
+        with self._lock:
+            self._records.clear()
+            self._yes.clear()
+            self._no.clear()
+            self._resync = True
+            self._ready = False
+            self._error = "Az élő adatfolyam megszakadt, újrakapcsolódás..."
+        try:
+            self.start(fs_db)
+        except Exception as e:
+            self._watch = None
+            with self._lock:
+                self._error = f"Újrakapcsolódási hiba: {e}"
+            print(f"Élő tábla újraindítási hiba ({self.date}): {e}")
+
+    def stop(self):
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception as e:
+                print(f"Élő tábla leállítási hiba ({self.date}): {e}")
+            self._watch = None
+
+    def _contribution(self, doc):
+        contribution = record_contribution(doc.to_dict() or {})
+        if contribution and contribution[0] == self.date:
+            return contribution[1], contribution[2]
+        return None
+
+    def _apply(self, record, sign):
+        name, status = record
+        (self._yes if status == "Yes" else self._no)[name] += sign
+        if self._yes[name] > 0 and self._no[name] <= 0:
+            self._attendees.add(name)
+        else:
+            self._attendees.discard(name)
+        return name
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # a figyelő saját szálán fut; csak a változott dokumentumokat dolgozzuk fel
+        try:
+            with self._lock:
+                before = set(self._attendees)
+                if self._resync:
+                    # újraindított figyelő: a teljes halmaz ADDED változásként érkezik újra
+                    self._attendees = set()
+                    self._resync = False
+                for change in changes:
+                    doc = change.document
+                    old = self._records.pop(doc.id, None)
+                    if old:
+                        self._apply(old, -1)
+                    if change.type.name != "REMOVED":
+                        new = self._contribution(doc)
+                        if new:
+                            self._records[doc.id] = new
+                            self._apply(new, +1)
+                now = datetime.now(HUNGARY_TZ)
+                if self._version:
+                    for name in sorted(self._attendees - before):
+                        self._events.appendleft((now, "+", name))
+                    for name in sorted(before - self._attendees):
+                        self._events.appendleft((now, "−", name))
+                self._ready = True
+                self._error = None
+                self._updated_at = now
+                self._version += 1
+        except Exception as e:
+            self._error = str(e)
+            print(f"Élő tábla feldolgozási hiba ({self.date}): {e}")
+
+    def snapshot(self):
+        """{"ready", "attendees", "events", "version", "updated_at", "error"} — Firestore-hívás nélkül."""
+        with self._lock:
+            return {
+                "ready": self._ready,
+                "attendees": sorted(self._attendees),
+                "events": list(self._events),
+                "version": self._version,
+                "updated_at": self._updated_at,
+                "error": self._error,
+            }
+
+
+class LiveBoardRegistry:
+    """Dátum → SessionBoard; dátumonként legfeljebb egy figyelő a folyamatban.
+
+    A tétlen táblákat minden get() és a háttérben futó takarító szál is leállítja
+    (utóbbi akkor is, ha már egyetlen néző sincs); a szál kilép, ha nem maradt tábla."""
+
+    def __init__(self, idle_sec=LIVE_BOARD_IDLE_SEC, reap_sec=LIVE_BOARD_REAP_SEC):
+        self.idle_sec = idle_sec
+        self.reap_sec = reap_sec
+        self._boards = {}
+        self._reaper = None
+        self._lock = threading.Lock()
+
+    def _pop_idle(self, now):
+        idle = [date for date, board in self._boards.items() if now - board.last_seen > self.idle_sec]
+        return [self._boards.pop(date) for date in idle]
+
+    def _reap(self):
+        while True:
+            time.sleep(self.reap_sec)
+            with self._lock:
+                evicted = self._pop_idle(time.monotonic())
+                if not self._boards:
+                    self._reaper = None
+            for board in evicted:
+                board.stop()
+            if self._reaper is not threading.current_thread():
+                return
+
+    def get(self, fs_db, date):
+        now = time.monotonic()
+        with self._lock:
+            evicted = self._pop_idle(now)
+            board = self._boards.get(date)
+            if board is None:
+                board = SessionBoard(date)
+                board.start(fs_db)
+                self._boards[date] = board
+            elif not board.is_alive():
+                board.restart(fs_db)
+            board.last_seen = now
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="live-board-reaper", daemon=True)
+                self._reaper.start()
+        for idle in evicted:
+            idle.stop()
+        return board
+
+    def active_dates(self):
+        with self._lock:
+            return sorted(self._boards)
+
+
+@st.cache_resource
+def _live_board_registry():
+    return LiveBoardRegistry()
+
+
+def get_live_board(fs_db, date):
+    """Az alkalom folyamatszintű élő táblája; első kéréskor elindítja a figyelőt."""
+    return _live_board_registry().get(fs_db, date)
@@ -0,0 +1,54 @@
+# Élő check-in számláló alkalmanként, shardokra osztva.
+# Egy Firestore-dokumentum tartósan kb. 1 írás/s-ot bír; az edzés előtti
+# percekben ~20 telefon ír szinte egyszerre, ezért a számláló LIVE_COUNTER_SHARDS
+# dokumentumra oszlik (live_counters/{dátum}/shards/{i}). Az írás egy véletlen
+# shardot növel (Increment, önálló írásként), az olvasó összegzi a shardokat.
+# A check-in útvonal használja: pandas/gspread itt sem importálható modulszinten.
+import random
+
+import streamlit as st
+from google.cloud import firestore
+
+from modules.config import FIRESTORE_LIVE_COUNTERS, LIVE_COUNTER_SHARDS, LIVE_COUNTER_TTL_SEC
+from modules.session_summaries import record_contribution
+
+
+def _shards(fs_db, date):
+    return fs_db.collection(FIRESTORE_LIVE_COUNTERS).document(date).collection("shards")
+
+
+def live_counter_deltas(added=(), removed=()):
+    """{dátum: változás} — a beírt / törölt rekordok közül a valós (nem teszt, nem legacy) "Yes" rekordok."""
+    deltas = {}
+    for records, sign in ((added, 1), (removed, -1)):
+        for d in records:
+            contribution = record_contribution(d)
+            if contribution and contribution[2] == "Yes" and not contribution[3]:
+                deltas[contribution[0]] = deltas.get(contribution[0], 0) + sign
+    return {date: delta for date, delta in deltas.items() if delta}
+
+
+def bump_live_counter(fs_db, added=(), removed=()):
+    """A rekordírás után, attól függetlenül: dátumonként egy véletlen shard növelése.
+
+    Egyszerű set(merge=True) Increment-tel — se tranzakció, se olvasás, és nem kerül
+    egy írásba az alkalom-összesítővel sem, így a shardolás valóban szétteríti a rohamot.
+    Hiba esetén csak naplóz: a számláló tájékoztató jellegű, a check-in ettől nem bukhat el."""
+    for date, delta in live_counter_deltas(added, removed).items():
+        try:
+            _shards(fs_db, date).document(str(random.randrange(LIVE_COUNTER_SHARDS))).set(
+                {"count": firestore.Increment(delta)}, merge=True)
+        except Exception as e:
+            print(f"Élő számláló írási hiba ({date}): {e}")
+
+
+@st.cache_data(ttl=LIVE_COUNTER_TTL_SEC)
+def get_live_count_fs(_db, date):
+    """Az alkalom élő check-in száma (a shardok összege); hiba esetén None."""
+    if _db is None:
+        return None
+    try:
+        return max(0, sum(int(doc.to_dict().get("count") or 0) for doc in _shards(_db, date).stream()))
+    except Exception as e:
+        print(f"Élő számláló olvasási hiba ({date}): {e}")
+        return None
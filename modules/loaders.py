@@ -0,0 +1,67 @@
+# Független adatbetöltő hívások párhuzamos indítása (fan-out).
+# A Firestore-lekérdezések ideje nagyrészt hálózati várakozás, így egy közös
+# szálkészleten futtatva az oldal betöltési ideje a leglassabb hívásé, nem az összegük.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from modules.config import DATA_LOAD_WORKERS, DATA_LOAD_TIMEOUT_SEC
+from modules.perf import record_timing, record_spans
+
+
+@st.cache_resource
+def _loader_pool():
+    # folyamatszintű készlet: időtúllépéskor nem várunk a lassú hívás végére (nincs shutdown)
+    return ThreadPoolExecutor(max_workers=DATA_LOAD_WORKERS, thread_name_prefix="data-loader")
+
+
+def _run_with_ctx(fn, ctx):
+    """A hívást a munkamenet kontextusával futtatja (cache_data, spinner működjön a szálban is)."""
+    add_script_run_ctx(threading.current_thread(), ctx)
+    t0 = time.perf_counter()
+    value = fn()
+    return value, t0, time.perf_counter()
+
+
+def load_concurrently(loaders, timeout=DATA_LOAD_TIMEOUT_SEC, group="Adatbetöltés"):
+    """Független betöltők párhuzamos futtatása.
+
+    loaders: {név: paraméter nélküli hívható} (pl. lambda: get_invoices_fs(fs_db))
+    timeout: másodperc — közös szám, vagy {név: másodperc} hívásonként
+    Visszatérés: (eredmények, hibák) — {név: érték}, illetve {név: hibaüzenet} az
+    időtúllépett vagy kivételt dobó hívásokra (ezek az eredmények közt nem szerepelnek).
+    Minden hívás ideje bekerül a renderelési időkbe (`group · név`), az idősávok
+    pedig a get_spans()-be, így az átfedés a Diagnosztika oldalon ellenőrizhető."""
+    if not loaders:
+        return {}, {}
+    pool = _loader_pool()
+    ctx = get_script_run_ctx()
+    t_start = time.perf_counter()
+    futures = {name: pool.submit(_run_with_ctx, fn, ctx) for name, fn in loaders.items()}
+
+    results, errors, spans = {}, {}, []
+    for name, future in futures.items():
+        limit = timeout.get(name, DATA_LOAD_TIMEOUT_SEC) if isinstance(timeout, dict) else timeout
+        remaining = max(0.0, t_start + limit - time.perf_counter())
+        try:
+            value, t0, t1 = future.result(timeout=remaining)
+        except FutureTimeout:
+            errors[name] = f"Időtúllépés ({limit:g} s)"
+            spans.append({"label": name, "start_ms": 0.0, "end_ms": None, "status": "timeout"})
+            continue
+        except Exception as e:
+            errors[name] = str(e)
+            print(f"Betöltési hiba ({group} · {name}): {e}")
+            spans.append({"label": name, "start_ms": 0.0, "end_ms": None, "status": "error"})
+            continue
+        results[name] = value
+        record_timing(f"{group} · {name}", (t1 - t0) * 1000)
+        spans.append({"label": name, "start_ms": (t0 - t_start) * 1000,
+                      "end_ms": (t1 - t_start) * 1000, "status": "ok"})
+
+    record_timing(f"{group} (összesen)", (time.perf_counter() - t_start) * 1000)
+    record_spans(group, spans)
+    return results, errors
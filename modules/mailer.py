@@ -0,0 +1,233 @@
+# Tömeges levélküldés (havi elszámoló emailek).
+# A küldési idő nagy részét az SMTP_SSL kapcsolat felépítése (TLS kézfogás + login)
+# viszi el, ezért a MailDispatcher egy kötegen belül újrahasznosítja a bejelentkezett
+# kapcsolatokat: legfeljebb MAIL_WORKERS szál küld, mindegyik a saját (készletből
+# kapott) kapcsolatán, közös sebességkorláttal. Átmeneti hibánál (4xx válasz, illetve
+# a DATA parancs előtt megszakadt kapcsolat) a levél visszalépő várakozással újra megy,
+# a megszakadt kapcsolat helyett új épül. Ha a kapcsolat a DATA után szakad meg, a
+# szerver már elfogadhatta a levelet: ezt nem küldjük újra (duplikált levél lenne),
+# hanem "ismeretlen" kimenetelűként jelentjük. Végleges bejelentkezési hibánál a köteg
+# többi levele új kapcsolódási kísérlet nélkül hibával zárul. A kapcsolat-gyár cserélhető, így helyi SMTP-pótlékkal is tesztelhető.
+import queue
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit as st
+
+from modules.config import (
+    MAIL_WORKERS, MAIL_RATE_PER_SEC, MAIL_MAX_ATTEMPTS, MAIL_RETRY_BACKOFF_SEC, MAIL_TIMEOUT_SEC,
+)
+
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 465
+
+# status: "sent" | "failed" | "unknown" (DATA utáni megszakadás; ok csak "sent" esetén igaz)
+MailResult = namedtuple("MailResult", ["key", "recipient", "ok", "error", "attempts", "status"])
+
+
+class _DataTracking:
+    """A data_started jelzi, hogy az aktuális küldés eljutott-e a DATA parancsig."""
+    data_started = False
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+
+class _SMTP(_DataTracking, smtplib.SMTP):
+    pass
+
+
+class _SMTP_SSL(_DataTracking, smtplib.SMTP_SSL):
+    pass
+
+
+def smtp_connection_factory(sender, password, host=SMTP_HOST, port=SMTP_PORT, use_ssl=True, timeout=MAIL_TIMEOUT_SEC):
+    """Paraméter nélküli függvény, ami egy új, bejelentkezett SMTP kapcsolatot ad.
+
+    A kapcsolat jelzi a DATA parancs megkezdését (data_started), ami alapján a
+    MailDispatcher eldönti, hogy egy megszakadt küldés biztonságosan újrapróbálható-e."""
+    def connect():
+        cls = _SMTP_SSL if use_ssl else _SMTP
+        server = cls(host, port, timeout=timeout)
+        try:
+            server.login(sender, password)
+        except Exception:
+            _close(server)
+            raise
+        return server
+    return connect
+
+
+def secrets_connection_factory():
+    """(kapcsolat-gyár, küldő címe) a Streamlit Secrets 'email' szekciójából.
+
+    Az smtp_host / smtp_port / smtp_ssl kulcsok opcionálisak (alapértelmezés: Gmail, SSL)."""
+    cfg = st.secrets["email"]
+    sender = cfg["sender"]
+    connect = smtp_connection_factory(
+        sender, cfg["password"], host=cfg.get("smtp_host", SMTP_HOST),
+        port=int(cfg.get("smtp_port", SMTP_PORT)), use_ssl=bool(cfg.get("smtp_ssl", True)),
+    )
+    return connect, sender
+
+
+def is_transient(exc):
+    """Érdemes-e újrapróbálni: megszakadt kapcsolat, hálózati hiba vagy 4xx SMTP válasz.
+
+    Csak a DATA előtti hibákra érvényes; a DATA utáni megszakadást a MailDispatcher
+    külön kezeli (lásd _delivery_unknown)."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, (smtplib.SMTPServerDisconnected, OSError))
+
+
+def _connection_usable(exc):
+    """Hiba után visszaadható-e a kapcsolat a készletbe (421 = a szerver bontja a kapcsolatot)."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code != 421
+
+
+def _delivery_unknown(server, exc):
+    """A DATA után, szerverválasz nélkül szakadt meg a küldés: a levél megérkezhetett."""
+    return (getattr(server, "data_started", False)
+            and not isinstance(exc, smtplib.SMTPResponseException))
+
+
+def _close(server):
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+class RateLimiter:
+    """Szálbiztos indítás-ütemező: két indítás között legalább 1/rate másodperc telik el."""
+
+    def __init__(self, rate_per_sec, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self._clock, self._sleep = clock, sleep
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
+class MailDispatcher:
+    """Kötegelt levélküldő újrahasznosított SMTP kapcsolatokkal.
+
+    connect: paraméter nélküli függvény, ami bejelentkezett kapcsolatot ad
+    (lásd smtp_connection_factory). Használat:
+
+        with MailDispatcher(connect) as dispatcher:
+            for result in dispatcher.dispatch([(kulcs, üzenet), ...]):
+                ...  # MailResult, a befejeződés sorrendjében
+
+    A kapcsolatok a köteg végén (close / with blokk vége) záródnak."""
+
+    def __init__(self, connect, workers=MAIL_WORKERS, rate_per_sec=MAIL_RATE_PER_SEC,
+                 max_attempts=MAIL_MAX_ATTEMPTS, backoff_sec=MAIL_RETRY_BACKOFF_SEC, sleep=time.sleep):
+        self._connect = connect
+        self.workers = max(1, int(workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_sec = backoff_sec
+        self._sleep = sleep
+        self._limiter = RateLimiter(rate_per_sec, sleep=sleep)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._fatal = None              # végleges kapcsolódási hiba (pl. rossz jelszó)
+        self.counters = {"connects": 0, "sent": 0, "failed": 0, "unknown": 0, "retries": 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self._fatal is not None:
+            raise self._fatal
+        self._count("connects")
+        try:
+            return self._connect()
+        except Exception as e:
+            if not is_transient(e):
+                self._fatal = e
+            raise
+
+    def _send(self, key, msg):
+        recipient = msg["To"]
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                self._count("retries")
+                self._sleep(self.backoff_sec * 2 ** (attempt - 2))
+            self._limiter.wait()
+            server = None
+            try:
+                server = self._acquire()
+                server.data_started = False
+                server.send_message(msg)
+                self._idle.put(server)
+                self._count("sent")
+                return MailResult(key, recipient, True, None, attempt, "sent")
+            except Exception as e:
+                error = e
+                if server is not None and _delivery_unknown(server, e):
+                    _close(server)
+                    self._count("unknown")
+                    return MailResult(key, recipient, False, str(e), attempt, "unknown")
+                if server is not None:
+                    if _connection_usable(e):
+                        # a szerver válaszolt: a kapcsolat ép (az smtplib RSET-tel visszaállította)
+                        self._idle.put(server)
+                    else:
+                        _close(server)
+                if not is_transient(e):
+                    break
+        self._count("failed")
+        return MailResult(key, recipient, False, str(error), attempt, "failed")
+
+    def dispatch(self, messages):
+        """[(kulcs, MIME üzenet)] küldése; MailResult-okat ad vissza, ahogy elkészülnek."""
+        messages = list(messages)
+        if not messages:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(messages)),
+                                thread_name_prefix="mail") as pool:
+            futures = [pool.submit(self._send, key, msg) for key, msg in messages]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def close(self):
+        while True:
+            try:
+                _close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
-import time
 
 from modules.db import get_invoices_fs, get_members_fs, save_settlement_fs, get_settlement_fs
-from modules.utils import calculate_monthly_accounting_fs, generate_pdf_bytes, send_personal_email, send_admin_summary_email, bulk_calculate_settlements
+from modules.loaders import load_concurrently
+from modules.mailer import MailDispatcher, secrets_connection_factory
+from modules.utils import calculate_monthly_accounting_fs, generate_pdf_bytes, build_personal_email, send_admin_summary_email, bulk_calculate_settlements
 
 
 def _render_bulk_section(fs_db):
@@ -68,17 +69,75 @@ def _render_bulk_section(fs_db):
                     st.dataframe(df_fail, use_container_width=True, hide_index=True)
 
 
+def _send_personal_emails(to_send, month_name, year, details_map):
+    """A kijelölt tagok személyes leveleinek kötegelt küldése; címzettenkénti állapot élőben."""
+    try:
+        connect, sender = secrets_connection_factory()
+    except Exception as e:
+        st.error(f"Email beállítási hiba (Secrets 'email' szekció): {e}")
+        return
+    messages = [
+        (i, build_personal_email(
+            sender, row["Email"], row["Név"], month_name, year,
+            count=row["Összes részvétel"], amount=row["Fizetendő (Ft)"],
+            guest_details=details_map.get(row["Név"]),
+        ))
+        for i, (_, row) in enumerate(to_send.iterrows())
+    ]
+    total = len(messages)
+    names = list(to_send["Név"])
+    status = [{"Név": names[i], "Email": msg["To"], "Állapot": "⏳ Sorban", "Próbálkozás": 0}
+              for i, msg in messages]
+    progress = st.progress(0, text="Emailek küldése...")
+    table = st.empty()
+    table.dataframe(pd.DataFrame(status), use_container_width=True, hide_index=True)
+    done = success_count = unknown_count = 0
+    labels = {"sent": "✅ Elküldve", "unknown": "❓ Ismeretlen (nem küldtük újra)", "failed": "❌"}
+    with MailDispatcher(connect) as dispatcher:
+        for result in dispatcher.dispatch(messages):
+            done += 1
+            success_count += result.ok
+            unknown_count += result.status == "unknown"
+            status[result.key].update({
+                "Állapot": labels[result.status] if result.ok else f"{labels[result.status]}: {result.error}",
+                "Próbálkozás": result.attempts,
+            })
+            progress.progress(done / total, text=f"Küldés: {names[result.key]} ({done}/{total})")
+            table.dataframe(pd.DataFrame(status), use_container_width=True, hide_index=True)
+    progress.empty()
+    if success_count == total:
+        st.success(f"✅ Sikeresen elküldve: {success_count}/{total} email!")
+    else:
+        st.warning(f"⚠️ {success_count}/{total} email elküldve.")
+    if unknown_count:
+        st.info(f"ℹ️ {unknown_count} levélnél a kapcsolat a küldés közben szakadt meg, így nem tudni, "
+                "megérkezett-e. Ezeket nem küldtük újra, hogy ne kapjanak duplikált levelet; "
+                "szükség esetén egyenként ellenőrizd és küldd újra őket.")
+
+
 
 
 def render_accounting_page(fs_db, gs_client):
     st.title("💰 Havi Elszámolás")
     st.markdown("Ezzel a funkcióval kiszámolhatod a teremköltségek személyenkénti elosztását a valós jelenléti adatok alapján.")
-    invoices = get_invoices_fs(fs_db)
+    # Számlák, taglista és (ha a hónap már ki van választva) a mentett elszámolás párhuzamosan töltődik
+    email_configured = hasattr(st, 'secrets') and "email" in st.secrets
+    guess_inv = st.session_state.get("acc_invoice_sel")
+    loaders = {"invoices": lambda: get_invoices_fs(fs_db)}
+    if email_configured:
+        loaders["members"] = lambda: get_members_fs(fs_db)
+    if guess_inv and "acc_df_osszesito" not in st.session_state:
+        loaders["settlement"] = lambda: get_settlement_fs(fs_db, guess_inv["target_year"], guess_inv["target_month"])
+    data, errors = load_concurrently(loaders, group="Elszámolás")
+    if errors:
+        st.warning("⚠️ Néhány adat nem töltődött be: " + ", ".join(f"{k} ({v})" for k, v in errors.items()))
+
+    invoices = data.get("invoices")
     if not invoices:
         st.warning("⚠️ Nem találtam számlát a Firestore-ban! Kérlek, menj az 'Adatbázis' fülre és szinkronizáld a számlákat.")
         return
     selected_inv = st.selectbox(
-        "Válaszd ki az elszámolandó hónapot:", invoices,
+        "Válaszd ki az elszámolandó hónapot:", invoices, key="acc_invoice_sel",
         format_func=lambda x: f"{x['target_year']}. {x['month_name']} (Számla kelte: {x['inv_date']} | Összeg: {x['amount']:,.0f} Ft)".replace(',', ' ')
     )
 
@@ -102,7 +161,10 @@ def render_accounting_page(fs_db, gs_client):
 
     if "acc_df_osszesito" not in st.session_state:
         # Megpróbáljuk betölteni Firestore-ból az utoljára kalkulált hónapot
-        loaded = get_settlement_fs(fs_db, selected_inv["target_year"], selected_inv["target_month"])
+        if "settlement" in data and selected_inv == guess_inv:
+            loaded = data["settlement"]
+        else:
+            loaded = get_settlement_fs(fs_db, selected_inv["target_year"], selected_inv["target_month"])
         if loaded:
             df_elszamolas, df_osszesito, month_name = loaded
             st.session_state["acc_df_elszamolas"] = df_elszamolas
@@ -132,13 +194,12 @@ def render_accounting_page(fs_db, gs_client):
 
     st.markdown("---")
     st.subheader("📧 Email értesítések küldése")
-    email_configured = hasattr(st, 'secrets') and "email" in st.secrets
     if not email_configured:
         st.warning("⚠️ Az email küldéshez add meg az email beállításokat a `.streamlit/secrets.toml` fájlban!")
         with st.expander("Hogyan kell beállítani?"):
             st.code("""[email]\nsender = "ropiplabda.app@gmail.com"\npassword = "xxxx xxxx xxxx xxxx"\nadmin_email = "admin@example.com" """, language="toml")
     else:
-        members_df = get_members_fs(fs_db)
+        members_df = data["members"] if "members" in data else get_members_fs(fs_db)
         active_members = members_df[members_df["Aktív"] == True] if not members_df.empty else pd.DataFrame()
         if active_members.empty:
             st.warning("⚠️ Nincsenek tagok az adatbázisban! Add hozzá őket a '👤 Tagok & Email' menüpontban.")
@@ -200,25 +261,8 @@ def render_accounting_page(fs_db, gs_client):
                         if to_send.empty:
                             st.warning("Nincs kijelölt tag!")
                         else:
-                            progress = st.progress(0, text="Emailek küldése...")
-                            success_count = 0
-                            total = len(to_send)
-                            details_map = st.session_state.get("acc_guest_details_map", {})
-                            for i, (_, row) in enumerate(to_send.iterrows()):
-                                ok = send_personal_email(
-                                    to_address=row["Email"], name=row["Név"], month_name=month_name,
-                                    year=year, count=row["Összes részvétel"], amount=row["Fizetendő (Ft)"],
-                                    guest_details=details_map.get(row["Név"])
-                                )
-                                if ok:
-                                    success_count += 1
-                                progress.progress((i + 1) / total, text=f"Küldés: {row['Név']} ({i+1}/{total})")
-                                time.sleep(0.3)
-                            progress.empty()
-                            if success_count == total:
-                                st.success(f"✅ Sikeresen elküldve: {success_count}/{total} email!")
-                            else:
-                                st.warning(f"⚠️ {success_count}/{total} email elküldve.")
+                            _send_personal_emails(to_send, month_name, year,
+                                                  st.session_state.get("acc_guest_details_map", {}))
 
                 with send_col2:
                     if st.button("📊 Admin összesítő küldése (PDF-fel)", use_container_width=True):
@@ -2,56 +2,105 @@ import streamlit as st
 from datetime import datetime
 
 from modules.config import MAIN_NAME_LIST, PLUS_PEOPLE_COUNT, HUNGARY_TZ
-from modules.db import get_attendance_rows_gs, save_all_data, sync_qr_checkins_to_sheet
-from modules.utils import generate_tuesday_dates, get_historical_guests_list
+from modules.attendance import get_guest_history_index, record_guests
+from modules.db import save_all_data
+from modules.sync_worker import get_qr_sync_worker
+from modules.utils import generate_tuesday_dates
 
 
 def reset_admin_form(set_step=1):
     st.session_state.admin_step = set_step
     st.session_state.admin_attendance = {name: {"present": False, "guests": "0"} for name in MAIN_NAME_LIST}
     st.session_state.admin_guest_data = {}
+    # a lépés-1 űrlap widgetjei az új (üres) állapotból induljanak
+    for name in MAIN_NAME_LIST:
+        st.session_state.pop(f"p_{name}", None)
+        st.session_state.pop(f"g_{name}", None)
 
 
 def admin_save_guest_name(key):
     st.session_state.admin_guest_data[key] = st.session_state.get(key, "")
 
 
-def admin_save_date():
+def admin_set_step(step):
+    st.session_state.admin_step = step
+
+
+def admin_submit_attendance():
+    """Az 1. lépés űrlapjának beküldése: a jelölések csak itt kerülnek az admin_attendance-be."""
     st.session_state.admin_date = st.session_state.admin_date_selector
+    for name in MAIN_NAME_LIST:
+        st.session_state.admin_attendance[name] = {
+            "present": st.session_state.get(f"p_{name}", False),
+            "guests": st.session_state.get(f"g_{name}", "0"),
+        }
+    if any(d["present"] for d in st.session_state.admin_attendance.values()):
+        st.session_state.admin_step = 2
+        st.session_state.admin_step1_error = False
+    else:
+        st.session_state.admin_step1_error = True
+
+
+def admin_final_save(gs_client, fs_client):
+    try:
+        target_date = st.session_state.admin_date
+        ts = datetime.now(HUNGARY_TZ).strftime("%Y-%m-%d %H:%M:%S")
+        rows_to_add = []
+        for name, data in st.session_state.admin_attendance.items():
+            if data["present"]:
+                rows_to_add.append([name, "Yes", ts, target_date, "", "valós"])
+                for i in range(int(data["guests"])):
+                    g_name = st.session_state.admin_guest_data.get(f"admin_guest_{name}_{i}", "").strip()
+                    if g_name:
+                        rows_to_add.append([f"{name} - {g_name}", "Yes", ts, target_date, "", "valós"])
+        success, msg = save_all_data(gs_client, fs_client, rows_to_add)
+        if success:
+            # write-through: a most mentett vendégek azonnal megjelennek a legördülőkben
+            record_guests(rows_to_add)
+        st.toast(msg, icon="✅" if success else "⚠️")
+        reset_admin_form()
+    except Exception as e:
+        st.session_state.admin_save_error = str(e)
 
 
 def render_admin_page(gs_client, fs_client):
+    if 'admin_step' not in st.session_state:
+        reset_admin_form()
+    if 'admin_date' not in st.session_state:
+        st.session_state.admin_date = generate_tuesday_dates()[0]
     st.title("🛠️ Admin Regisztráció")
     st.success("🟢 Aktív: Jelenlét rögzítése üzemmód.")
-    if "qr_sync_done" not in st.session_state:
-        synced = sync_qr_checkins_to_sheet(fs_client, gs_client)
-        st.session_state.qr_sync_done = True
-        if synced > 0:
-            st.toast(f"✅ {synced} QR check-in szinkronizálva a Sheetsbe.", icon="📊")
-    rows = get_attendance_rows_gs(gs_client)
+    # A QR check-inek Sheet-szinkronja háttérszálon fut (lásd Diagnosztika oldal) — itt nem várunk rá
+    get_qr_sync_worker(fs_client, gs_client)
+    _render_admin_wizard(gs_client, fs_client)
 
+
+@st.fragment
+def _render_admin_wizard(gs_client, fs_client):
+    """A rögzítő varázsló. Fragmentként fut: a lépéseken belüli interakciók csak ezt
+    futtatják újra (az app.py, az oldalsáv és a többi oldal-előkészítés nélkül).
+    A lépésváltások on_click visszahívással történnek, így nincs szükség st.rerun-ra."""
     if st.session_state.admin_step == 1:
         dt = generate_tuesday_dates()
         idx = dt.index(st.session_state.admin_date) if st.session_state.admin_date in dt else 0
-        st.selectbox("Dátum kiválasztása:", dt, index=idx, key="admin_date_selector", on_change=admin_save_date)
-        st.markdown("---")
-        for name in MAIN_NAME_LIST:
-            with st.container(border=True):
-                c1, c2, c3 = st.columns([2, 1, 1], vertical_alignment="center")
-                c1.markdown(f"**{name}**")
-                st.session_state.admin_attendance[name]["present"] = c2.checkbox(
-                    "Jelen volt", value=st.session_state.admin_attendance[name]["present"], key=f"p_{name}")
-                st.session_state.admin_attendance[name]["guests"] = c3.selectbox(
-                    "Vendégek száma", PLUS_PEOPLE_COUNT,
-                    index=PLUS_PEOPLE_COUNT.index(st.session_state.admin_attendance[name]["guests"]),
-                    key=f"g_{name}", label_visibility="collapsed")
-        st.markdown("---")
-        present_count = sum(1 for d in st.session_state.admin_attendance.values() if d["present"])
-        if present_count == 0:
-            st.warning("⚠️ Még senki nincs bejelölve!")
-        if st.button("Tovább a vendégnevekhez ➡️", type="primary", disabled=(present_count == 0)):
-            st.session_state.admin_step = 2
-            st.rerun()
+        # Űrlap: a jelölések és vendégszámok kattintásonként nem futtatnak újra semmit,
+        # csak a beküldés — így a válaszidő független a névsor hosszától.
+        with st.form("admin_step1_form", border=False):
+            st.selectbox("Dátum kiválasztása:", dt, index=idx, key="admin_date_selector")
+            st.markdown("---")
+            for name in MAIN_NAME_LIST:
+                with st.container(border=True):
+                    c1, c2, c3 = st.columns([2, 1, 1], vertical_alignment="center")
+                    c1.markdown(f"**{name}**")
+                    c2.checkbox("Jelen volt", value=st.session_state.admin_attendance[name]["present"], key=f"p_{name}")
+                    c3.selectbox(
+                        "Vendégek száma", PLUS_PEOPLE_COUNT,
+                        index=PLUS_PEOPLE_COUNT.index(st.session_state.admin_attendance[name]["guests"]),
+                        key=f"g_{name}", label_visibility="collapsed")
+            st.markdown("---")
+            if st.session_state.get("admin_step1_error"):
+                st.warning("⚠️ Még senki nincs bejelölve!")
+            st.form_submit_button("Tovább a vendégnevekhez ➡️", type="primary", on_click=admin_submit_attendance)
 
     elif st.session_state.admin_step == 2:
         pg = [(n, int(d["guests"])) for n, d in st.session_state.admin_attendance.items()
@@ -59,10 +108,12 @@ def render_admin_page(gs_client, fs_client):
         st.info(f"Kiválasztott dátum: {st.session_state.admin_date}")
         if not pg:
             st.success("Nincsenek rögzítendő vendégek. Készen állsz a mentésre!")
+        # gazda → vendégek index (Firestore-ból, adatverziónként egyszer épül; gyakoribbak elöl)
+        guest_index = get_guest_history_index(fs_client) if pg else None
         for n, c in pg:
             with st.container(border=True):
                 st.subheader(f"**{n}** vendégei:")
-                history = get_historical_guests_list(rows, n)
+                history = guest_index.guests_for(n)
                 options = ["-- Új név írása --"] + history
                 for i in range(c):
                     sel = st.selectbox(f"{i+1}. vendég ({n}):", options, key=f"admin_sel_{n}_{i}")
@@ -73,12 +124,8 @@ def render_admin_page(gs_client, fs_client):
                         st.session_state.admin_guest_data[f"admin_guest_{n}_{i}"] = sel
         st.markdown("---")
         c1, c2 = st.columns(2)
-        if c1.button("⬅️ Vissza"):
-            st.session_state.admin_step = 1
-            st.rerun()
-        if c2.button("Adatok ellenőrzése", type="primary"):
-            st.session_state.admin_step = 3
-            st.rerun()
+        c1.button("⬅️ Vissza", on_click=admin_set_step, args=(1,))
+        c2.button("Adatok ellenőrzése", type="primary", on_click=admin_set_step, args=(3,))
 
     elif st.session_state.admin_step == 3:
         st.info(f"Dátum: {st.session_state.admin_date}")
@@ -91,29 +138,7 @@ def render_admin_page(gs_client, fs_client):
                 if g:
                     st.markdown(f"&nbsp;&nbsp;&nbsp;↳ {g}")
         st.markdown("---")
-        if st.button("💾 Végleges Mentés", type="primary"):
-            try:
-                target_date = st.session_state.admin_date
-                ts = datetime.now(HUNGARY_TZ).strftime("%Y-%m-%d %H:%M:%S")
-                rows_to_add = []
-                for name, data in st.session_state.admin_attendance.items():
-                    if data["present"]:
-                        rows_to_add.append([name, "Yes", ts, target_date, "", "valós"])
-                        for i in range(int(data["guests"])):
-                            g_name = st.session_state.admin_guest_data.get(f"admin_guest_{name}_{i}", "").strip()
-                            if g_name:
-                                rows_to_add.append([f"{name} - {g_name}", "Yes", ts, target_date, "", "valós"])
-                success, msg = save_all_data(gs_client, fs_client, rows_to_add)
-                if success:
-                    st.toast(msg, icon="✅")
-                    reset_admin_form()
-                    st.rerun()
-                else:
-                    st.toast(msg, icon="⚠️")
-                    reset_admin_form()
-                    st.rerun()
-            except Exception as e:
-                st.error(f"Hiba: {e}")
-        if st.button("⬅️ Vissza a szerkesztéshez"):
-            st.session_state.admin_step = 2
-            st.rerun()
+        if st.session_state.get("admin_save_error"):
+            st.error(f"Hiba: {st.session_state.pop('admin_save_error')}")
+        st.button("💾 Végleges Mentés", type="primary", on_click=admin_final_save, args=(gs_client, fs_client))
+        st.button("⬅️ Vissza a szerkesztéshez", on_click=admin_set_step, args=(2,))
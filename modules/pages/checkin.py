@@ -3,10 +3,15 @@ import uuid
 from datetime import datetime
 
 from modules.config import MAIN_NAME_LIST, FIRESTORE_MEMBERS, HUNGARY_TZ
-from modules.db import (
-    get_members_fs, get_device_registration, save_device_registration, save_all_data,
+from modules.attendance_store import (
+    get_member_names_fs, get_device_registration, save_device_registration,
+    write_attendance_rows_fs, find_checkin_docs, delete_attendance_docs_fs,
 )
-from modules.utils import generate_tuesday_dates
+from modules.dates import generate_tuesday_dates
+from modules.live_counter import get_live_count_fs
+
+# Ez az oldal a könnyített ?checkin=1 útvonalon fut: csak Firestore-t használ,
+# ezért nem importálhat modules.db-t / modules.utils-t (gspread, pandas).
 
 
 def _get_event_date():
@@ -16,16 +21,7 @@ def _get_event_date():
 
 def _already_checked_in(fs_db, name, event_date):
     try:
-        from modules.config import FIRESTORE_COLLECTION
-        docs = (
-            fs_db.collection(FIRESTORE_COLLECTION)
-            .where("name", "==", name)
-            .where("event_date", "==", event_date)
-            .where("mode", "==", "qr")
-            .limit(1)
-            .stream()
-        )
-        return any(True for _ in docs)
+        return bool(find_checkin_docs(fs_db, name, event_date, limit=1))
     except Exception:
         return False
 
@@ -33,17 +29,24 @@ def _already_checked_in(fs_db, name, event_date):
 def _register_attendance(fs_db, name, event_date):
     ts = datetime.now(HUNGARY_TZ).strftime("%Y-%m-%d %H:%M:%S")
     row = [name, "Yes", ts, event_date, "", "qr"]
-    return save_all_data(None, fs_db, [row])
+    try:
+        # A Sheet-be a QR szinkron viszi át később (synced_to_sheet=False), mint a checkin.html-nél
+        write_attendance_rows_fs(fs_db, [row], synced_to_sheet=False)
+    except Exception as e:
+        return False, str(e)
+    st.cache_data.clear()
+    return True, "Jelenlét rögzítve."
+
+
+def _show_live_count(fs_db, event_date):
+    live_count = get_live_count_fs(fs_db, event_date)
+    if live_count:
+        st.caption(f"👥 Eddig {live_count} fő jelentkezett be erre az alkalomra.")
 
 
 def _get_all_member_names(fs_db):
     names = set(MAIN_NAME_LIST)
-    try:
-        df = get_members_fs(fs_db)
-        if not df.empty:
-            names.update(df["Név"].tolist())
-    except Exception:
-        pass
+    names.update(n for n in get_member_names_fs(fs_db) if n)
     return sorted(names)
 
 
@@ -67,22 +70,15 @@ def render_checkin_page(fs_db):
             if _already_checked_in(fs_db, name, event_date):
                 st.success(f"Szia **{name}**!")
                 st.info(f"✅ Már be vagy jelentkezve erre az alkalomra ({event_date}).")
+                _show_live_count(fs_db, event_date)
                 if st.button("↩️ Jelenlét visszavonása", type="secondary"):
                     try:
-                        from modules.config import FIRESTORE_COLLECTION
-                        docs = list(
-                            fs_db.collection(FIRESTORE_COLLECTION)
-                            .where("name", "==", name)
-                            .where("event_date", "==", event_date)
-                            .where("mode", "==", "qr")
-                            .limit(5)
-                            .stream()
-                        )
+                        docs = find_checkin_docs(fs_db, name, event_date, limit=5)
                         if not docs:
                             st.info("A jelenlét már vissza lett vonva.")
                         else:
-                            for doc in docs:
-                                doc.reference.delete()
+                            delete_attendance_docs_fs(fs_db, docs)
+                            st.cache_data.clear()
                         st.rerun()
                     except Exception as e:
                         st.error(f"Hiba: {e}")
@@ -93,6 +89,7 @@ def render_checkin_page(fs_db):
                     st.balloons()
                     st.success(f"Szia **{name}**! 🏐")
                     st.success(f"✅ Jelenlét rögzítve: {event_date}")
+                    _show_live_count(fs_db, event_date)
                 else:
                     st.error(f"Hiba a rögzítéskor: {msg}")
             return
@@ -132,7 +129,7 @@ def render_checkin_page(fs_db):
                         fs_db.collection(FIRESTORE_MEMBERS).add({
                             "name": name, "email": email, "active": True
                         })
-                        get_members_fs.clear()
+                        get_member_names_fs.clear()
                     except Exception as e:
                         st.warning(f"⚠️ Az email cím mentése nem sikerült, de a jelenlét rögzítve lesz: {e}")
             else:
@@ -174,5 +171,6 @@ def render_checkin_page(fs_db):
                 st.balloons()
                 st.success(f"Szia **{g_name}**! 🏐")
                 st.success(f"✅ Vendég jelenlét rögzítve: {event_date}")
+                _show_live_count(fs_db, event_date)
             else:
                 st.error(f"Hiba a jelenlét rögzítésekor: {msg}")
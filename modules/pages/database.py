@@ -4,75 +4,174 @@ from datetime import datetime
 from google.cloud import firestore
 
 from modules.config import (
-    FIRESTORE_COLLECTION, FIRESTORE_INVOICES, GSHEET_NAME, FIRESTORE_LEGACY,
+    FIRESTORE_COLLECTION, FIRESTORE_INVOICES, FIRESTORE_LEGACY, ATTENDANCE_MODES, DB_PAGE_SIZE_OPTIONS,
 )
 from modules.db import (
-    get_attendance_rows_gs, get_attendance_rows_fs, get_invoices_fs,
+    get_attendance_rows_gs, get_invoices_fs,
     get_members_fs, sync_members_fs_to_gs, sync_members_gs_to_fs,
     get_legacy_totals_fs,
-    get_historical_stats_fs
+    get_historical_stats_fs, get_page_fs, invoice_row_fs, page_order_fields
 )
-from modules.charts import render_monthly_attendance_chart, render_yearly_attendance_chart, render_top5_chart
-from modules.utils import parse_date_str, build_total_attendance_fs
+from modules.attendance import get_leaderboard
+from modules.charts import (
+    render_monthly_attendance_chart, render_yearly_attendance_chart, render_top5_chart,
+    monthly_chart_data, yearly_chart_data,
+)
+from modules.utils import parse_date_str
+from modules.sheets import get_sheet_registry, write_table
+from modules.batch_writes import commit_in_chunks, editor_change_ops, summarize_ops
+from modules.session_summaries import apply_summary_deltas, get_session_summaries_fs
+from modules.perf import timed_render
+from modules.loaders import load_concurrently
+from modules.attendance_sync import SHEET_HEADER, plan_attendance_sync, plan_preview_rows, apply_attendance_sync
 
 
-def render_database_page(gs_client, fs_db, logged_in=False):
-    st.title("🗂️ Adatbázis")
+def _cursor_page(state_key, signature):
+    """Kurzor-verem a session_state-ben: (oldalindex, az oldal kezdő kurzora).
 
-    if logged_in:
-        tab_sheet, tab_firestore, tab_diagramok, tab_ranglista = st.tabs(["📝 Beküldött Adatok (Sheet)", "☁️ Felhő Adatok (Firestore)", "📊 Statisztikák", "🏆 Ranglista"])
+    A verem i. eleme az i. oldal előtti utolsó dokumentum azonosítója (az elsőnél None).
+    Ha a szűrés/rendezés (signature) megváltozik, az első oldalra ugrik."""
+    state = st.session_state.setdefault(state_key, {"signature": signature, "cursors": [None]})
+    if state["signature"] != signature:
+        state["signature"] = signature
+        state["cursors"] = [None]
+    return len(state["cursors"]) - 1, state["cursors"][-1]
+
+
+def _cursor_pager_controls(state_key, page_docs, has_next):
+    # on_click visszahívás: a kurzor még a (fragment-)újrafutás előtt frissül, külön st.rerun nem kell
+    cursors = st.session_state[state_key]["cursors"]
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        st.button("◀️ Előző", key=f"{state_key}_prev", disabled=len(cursors) == 1, use_container_width=True,
+                  on_click=cursors.pop)
+    with col_info:
+        st.caption(f"{len(cursors)}. oldal · {len(page_docs)} sor")
+    with col_next:
+        st.button("Következő ▶️", key=f"{state_key}_next", disabled=not has_next, use_container_width=True,
+                  on_click=cursors.append, args=(page_docs[-1][0] if page_docs else None,))
+
+
+def _commit_editor_ops(fs_db, ops, label, summary_deltas=None):
+    """Egy szerkesztő változásait batch-ekben menti, folyamatjelzővel és összegzéssel.
+
+    summary_deltas: (beírt, törölt) jelenléti rekordok — megadva az alkalom-összesítők
+    a rekordokkal együtt frissülnek."""
+    progress = st.progress(0.0, text="Mentés...")
+    on_progress = lambda done, total: progress.progress(done / total if total else 1.0,  # noqa: E731
+                                                        text=f"Mentés... {done}/{total}")
+    try:
+        if summary_deltas is not None:
+            added, removed = summary_deltas
+            commits = apply_summary_deltas(fs_db, added=added, removed=removed, ops=ops, on_progress=on_progress)
+        else:
+            commits = commit_in_chunks(fs_db, ops, on_progress=on_progress)
+    except Exception as e:
+        progress.empty()
+        st.error(f"Mentési hiba: {e}")
+        return
+    summary = summarize_ops(ops)
+    st.toast(f"✅ Mentve ({label}): {summary['update']} módosítás, {summary['set']} új, "
+             f"{summary['delete']} törlés — {commits} batch.")
+    st.cache_data.clear()
+    st.rerun()
+
+
+@st.fragment
+@timed_render("Adatbázis · Sheet")
+def _render_sheet_view(gs_client):
+    st.subheader("Google Sheet adatok megtekintése")
+    rows = get_attendance_rows_gs(gs_client)
+    if rows:
+        cols = rows[0][:6]
+        while len(cols) < 6:
+            cols.append(f"Oszlop {len(cols)+1}")
+        df_data = [r[:6] + [""] * (6 - len(r[:6])) for r in rows[1:]]
+        df = pd.DataFrame(df_data, columns=cols)
+        col_sort, col_order = st.columns([2, 1])
+        with col_sort:
+            sort_col = st.selectbox("Rendezés alapja:", df.columns, index=2, key="sheet_sort_col")
+        with col_order:
+            ascending = st.checkbox("Növekvő sorrend", value=False, key="sheet_asc")
+        # csak egy oldalnyi sor kerül a böngészőbe
+        page_size_gs = DB_PAGE_SIZE_OPTIONS[-1]
+        n_pages = max(1, -(-len(df) // page_size_gs))
+        if st.session_state.get("sheet_page", 1) > n_pages:
+            st.session_state["sheet_page"] = n_pages
+        page_gs = st.number_input(f"Oldal (1–{n_pages}, {page_size_gs} sor / oldal):", min_value=1,
+                                  max_value=n_pages, value=1, step=1, key="sheet_page")
+        start = (int(page_gs) - 1) * page_size_gs
+        df_sorted = df.sort_values(by=sort_col, ascending=ascending)
+        st.dataframe(df_sorted.iloc[start:start + page_size_gs], use_container_width=True)
+        st.caption(f"{len(df)} sor összesen.")
     else:
-        tab_firestore, tab_diagramok, tab_ranglista = st.tabs(["☁️ Felhő Adatok (Firestore)", "📊 Statisztikák", "🏆 Ranglista"])
+        st.warning("Nem sikerült betölteni a Google Sheets adatokat.")
 
-    if logged_in:
-        with tab_sheet:
-            st.subheader("Google Sheet adatok megtekintése")
-            rows = get_attendance_rows_gs(gs_client)
-            if rows:
-                cols = rows[0][:6]
-                while len(cols) < 6:
-                    cols.append(f"Oszlop {len(cols)+1}")
-                df_data = [r[:6] + [""] * (6 - len(r[:6])) for r in rows[1:]]
-                df = pd.DataFrame(df_data, columns=cols)
-                col_sort, col_order = st.columns([2, 1])
-                with col_sort:
-                    sort_col = st.selectbox("Rendezés alapja:", df.columns, index=2, key="sheet_sort_col")
-                with col_order:
-                    ascending = st.checkbox("Növekvő sorrend", value=False, key="sheet_asc")
-                st.dataframe(df.sort_values(by=sort_col, ascending=ascending), use_container_width=True)
-            else:
-                st.warning("Nem sikerült betölteni a Google Sheets adatokat.")
 
-    with tab_firestore:
-        st.subheader("Firestore Adatbázis")
+@st.fragment
+@timed_render("Adatbázis · Firestore")
+def _render_firestore_view(gs_client, fs_db, logged_in):
+    st.subheader("Firestore Adatbázis")
 
-        if logged_in:
-            st.markdown("---")
-            with st.expander("🔄 Adatok Szinkronizálása (Sheet ↔ Firestore)"):
-                st.warning("⚠️ A szinkronizálás felülírja a céladatbázist!")
-                sync_source = st.radio("Melyik legyen a FORRÁS?", ["Google Sheets", "Firestore"], horizontal=True, key="db_sync_source")
-                st.info(f"👉 Irány: **{sync_source}** ➡️ **{'Firestore' if sync_source == 'Google Sheets' else 'Google Sheets'}**")
-                col_m1, col_m2, col_m3 = st.columns(3)
-                with col_m1:
-                    if st.button("👥 Jelenlét szinkronizálása", type="primary", use_container_width=True):
-                        with st.spinner("Folyamatban..."):
+    if logged_in:
+        st.markdown("---")
+        with st.expander("🔄 Adatok Szinkronizálása (Sheet ↔ Firestore)"):
+            st.warning("⚠️ A szinkronizálás felülírja a céladatbázist! (A jelenlétnél csak az eltérő rekordok íródnak.)")
+            sync_source = st.radio("Melyik legyen a FORRÁS?", ["Google Sheets", "Firestore"], horizontal=True, key="db_sync_source")
+            st.info(f"👉 Irány: **{sync_source}** ➡️ **{'Firestore' if sync_source == 'Google Sheets' else 'Google Sheets'}**")
+            col_m1, col_m2, col_m3 = st.columns(3)
+            with col_m1:
+                att_dry_run = st.checkbox("🔍 Csak előnézet (nem ír)", key="att_sync_dry_run")
+                if st.button("👥 Jelenlét szinkronizálása", type="primary", use_container_width=True):
+                    with st.spinner("Folyamatban..."):
+                        try:
+                            plan = plan_attendance_sync(fs_db, gs_client, sync_source)
+                        except Exception as e:
+                            plan = None
+                            st.toast(f"❌ Szinkronizálási hiba: {e}")
+                        if plan is None:
+                            pass
+                        elif plan["source_total"] == 0:
                             if sync_source == "Google Sheets":
-                                gs_rows = get_attendance_rows_gs(gs_client)
-                                if len(gs_rows) > 1:
-                                    new_docs = []
-                                    for r in gs_rows[1:]:
-                                        name = r[0] if len(r) > 0 else ""
-                                        if not name: continue
-                                        new_docs.append({
-                                            "name": name, "status": r[1] if len(r) > 1 else "Yes",
-                                            "timestamp": r[2] if len(r) > 2 else "",
-                                            "event_date": r[3] if len(r) > 3 else "", "mode": "valós"
+                                st.info("Nincs másolható adat a Sheet-ben.")
+                            else:
+                                st.warning("Nincs adat a Firestore-ban — a Sheet érintetlen maradt.")
+                        elif att_dry_run:
+                            st.session_state["att_sync_preview"] = plan
+                        else:
+                            ok, msg = apply_attendance_sync(fs_db, gs_client, plan)
+                            st.toast(f"✅ {msg}" if ok else f"❌ {msg}")
+                            st.session_state.pop("att_sync_preview", None)
+                            st.cache_data.clear()
+                            st.rerun()
+            with col_m2:
+                if st.button("🧾 Számlák szinkronizálása", type="primary", use_container_width=True):
+                    with st.spinner("Folyamatban..."):
+                        try:
+                            registry = get_sheet_registry(gs_client)
+                            if sync_source == "Google Sheets":
+                                rows_sz = registry.call(lambda ws: ws.get_all_values(), title="Szamlak", aliases=("szamlak",))
+                                if len(rows_sz) > 1:
+                                    new_invoices = []
+                                    for r in rows_sz[1:]:
+                                        if not r[0]: continue
+                                        inv_date = parse_date_str(r[0])
+                                        if not inv_date: continue
+                                        try:
+                                            amount = float(str(r[1]).replace(' ', '').replace('Ft', '').replace('HUF', '').replace('\xa0', ''))
+                                        except Exception:
+                                            continue
+                                        t_month = 12 if inv_date.month == 1 else inv_date.month - 1
+                                        t_year = inv_date.year - 1 if inv_date.month == 1 else inv_date.year
+                                        new_invoices.append({
+                                            "inv_date": inv_date.strftime("%Y-%m-%d"), "target_year": t_year,
+                                            "target_month": t_month, "amount": amount,
+                                            "filename": r[2] if len(r) > 2 else ""
                                         })
                                     try:
-                                        # 1. törlés batch-csal
                                         del_batch = fs_db.batch()
                                         del_count = 0
-                                        for doc in fs_db.collection(FIRESTORE_COLLECTION).stream():
+                                        for doc in fs_db.collection(FIRESTORE_INVOICES).stream():
                                             del_batch.delete(doc.reference)
                                             del_count += 1
                                             if del_count >= 500:
@@ -81,11 +180,10 @@ def render_database_page(gs_client, fs_db, logged_in=False):
                                                 del_count = 0
                                         if del_count > 0:
                                             del_batch.commit()
-                                        # 2. írás batch-csal
                                         ins_batch = fs_db.batch()
                                         ins_count = 0
-                                        for data in new_docs:
-                                            ins_batch.set(fs_db.collection(FIRESTORE_COLLECTION).document(), data)
+                                        for data in new_invoices:
+                                            ins_batch.set(fs_db.collection(FIRESTORE_INVOICES).document(), data)
                                             ins_count += 1
                                             if ins_count >= 500:
                                                 ins_batch.commit()
@@ -93,314 +191,282 @@ def render_database_page(gs_client, fs_db, logged_in=False):
                                                 ins_count = 0
                                         if ins_count > 0:
                                             ins_batch.commit()
-                                        st.success(f"Kész! {len(new_docs)} adat átmásolva a Firestore-ba.")
+                                        st.success(f"Kész! {len(new_invoices)} számla átmásolva.")
                                     except Exception as e:
                                         st.error(f"Szinkronizálási hiba: {e}")
                                 else:
-                                    st.info("Nincs másolható adat a Sheet-ben.")
+                                    st.info("Nincs számla a Sheet-ben.")
                             else:
-                                df_fs_sync = get_attendance_rows_fs(fs_db)
-                                if df_fs_sync.empty:
-                                    st.warning("Nincs adat a Firestore-ban — a Sheet érintetlen maradt.")
+                                invoices_sync = get_invoices_fs(fs_db)
+                                if invoices_sync:
+                                    new_rows = [["Dátum", "Összeg", "Fájlnév"]]
+                                    for inv in invoices_sync:
+                                        new_rows.append([inv["inv_date"], f"{int(inv['amount'])} Ft", inv.get("filename", "")])
+                                    write_table(gs_client, new_rows, title="Szamlak", aliases=("szamlak",),
+                                                value_input_option="USER_ENTERED")
+                                    st.success(f"Kész! {len(invoices_sync)} számla átmásolva.")
                                 else:
-                                    def _cell(v):
-                                        # None/NaN → üres; datetime-szerű → string; minden más → str
-                                        if v is None:
-                                            return ""
-                                        try:
-                                            if pd.isna(v):
-                                                return ""
-                                        except (TypeError, ValueError):
-                                            pass
-                                        if hasattr(v, "strftime"):
-                                            return v.strftime("%Y-%m-%d %H:%M:%S")
-                                        return str(v)
-
-                                    # 1) ELŐSZÖR felépítjük a sorokat (ha itt hibázik, a Sheet érintetlen marad)
-                                    new_rows = [["Név", "Jön-e", "Regisztráció Időpontja", "Alkalom Dátuma", "Üres", "Mód"]]
-                                    for _, row in df_fs_sync.iterrows():
-                                        new_rows.append([
-                                            _cell(row.get("Név")),
-                                            _cell(row.get("Jön-e")),
-                                            _cell(row.get("Regisztráció Időpontja")),
-                                            _cell(row.get("Alkalom Dátuma")),
-                                            "",
-                                            _cell(row.get("Mód")) or "valós",
-                                        ])
-                                    # 2) Csak ha minden sor felépült, akkor cseréljük a Sheet-et
-                                    try:
-                                        sheet = gs_client.open(GSHEET_NAME).sheet1
-                                        sheet.clear()
-                                        sheet.append_rows(new_rows, value_input_option='USER_ENTERED')
-                                        st.success(f"Kész! {len(new_rows)-1} adat átmásolva a Sheet-be.")
-                                    except Exception as e:
-                                        st.error(f"Hiba a Sheet írásakor: {e}")
-                            st.cache_data.clear()
-                            st.rerun()
-                with col_m2:
-                    if st.button("🧾 Számlák szinkronizálása", type="primary", use_container_width=True):
-                        with st.spinner("Folyamatban..."):
-                            try:
-                                ss = gs_client.open(GSHEET_NAME)
-                                ws_titles = [w.title for w in ss.worksheets()]
-                                szamlak_sheet = ss.worksheet("Szamlak") if "Szamlak" in ws_titles else ss.worksheet("szamlak")
-                                if sync_source == "Google Sheets":
-                                    rows_sz = szamlak_sheet.get_all_values()
-                                    if len(rows_sz) > 1:
-                                        new_invoices = []
-                                        for r in rows_sz[1:]:
-                                            if not r[0]: continue
-                                            inv_date = parse_date_str(r[0])
-                                            if not inv_date: continue
-                                            try:
-                                                amount = float(str(r[1]).replace(' ', '').replace('Ft', '').replace('HUF', '').replace('\xa0', ''))
-                                            except Exception:
-                                                continue
-                                            t_month = 12 if inv_date.month == 1 else inv_date.month - 1
-                                            t_year = inv_date.year - 1 if inv_date.month == 1 else inv_date.year
-                                            new_invoices.append({
-                                                "inv_date": inv_date.strftime("%Y-%m-%d"), "target_year": t_year,
-                                                "target_month": t_month, "amount": amount,
-                                                "filename": r[2] if len(r) > 2 else ""
-                                            })
-                                        try:
-                                            del_batch = fs_db.batch()
-                                            del_count = 0
-                                            for doc in fs_db.collection(FIRESTORE_INVOICES).stream():
-                                                del_batch.delete(doc.reference)
-                                                del_count += 1
-                                                if del_count >= 500:
-                                                    del_batch.commit()
-                                                    del_batch = fs_db.batch()
-                                                    del_count = 0
-                                            if del_count > 0:
-                                                del_batch.commit()
-                                            ins_batch = fs_db.batch()
-                                            ins_count = 0
-                                            for data in new_invoices:
-                                                ins_batch.set(fs_db.collection(FIRESTORE_INVOICES).document(), data)
-                                                ins_count += 1
-                                                if ins_count >= 500:
-                                                    ins_batch.commit()
-                                                    ins_batch = fs_db.batch()
-                                                    ins_count = 0
-                                            if ins_count > 0:
-                                                ins_batch.commit()
-                                            st.success(f"Kész! {len(new_invoices)} számla átmásolva.")
-                                        except Exception as e:
-                                            st.error(f"Szinkronizálási hiba: {e}")
-                                    else:
-                                        st.info("Nincs számla a Sheet-ben.")
-                                else:
-                                    invoices_sync = get_invoices_fs(fs_db)
-                                    if invoices_sync:
-                                        szamlak_sheet.clear()
-                                        new_rows = [["Dátum", "Összeg", "Fájlnév"]]
-                                        for inv in invoices_sync:
-                                            new_rows.append([inv["inv_date"], f"{int(inv['amount'])} Ft", inv.get("filename", "")])
-                                        szamlak_sheet.append_rows(new_rows, value_input_option='USER_ENTERED')
-                                        st.success(f"Kész! {len(invoices_sync)} számla átmásolva.")
-                                    else:
-                                        st.info("Nincs számla a Firestore-ban.")
-                                st.cache_data.clear()
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Szinkronizálási hiba: {e}")
-                with col_m3:
-                    if st.button("👤 Tagok szinkronizálása", type="primary", use_container_width=True):
-                        with st.spinner("Folyamatban..."):
-                            if sync_source == "Google Sheets":
-                                ok, msg = sync_members_gs_to_fs(gs_client, fs_db)
-                                get_members_fs.clear()
-                            else:
-                                ok, msg = sync_members_fs_to_gs(fs_db, gs_client)
-                            st.toast(f"✅ {msg}" if ok else f"❌ {msg}")
+                                    st.info("Nincs számla a Firestore-ban.")
                             st.cache_data.clear()
                             st.rerun()
+                        except Exception as e:
+                            st.error(f"Szinkronizálási hiba: {e}")
+            with col_m3:
+                if st.button("👤 Tagok szinkronizálása", type="primary", use_container_width=True):
+                    with st.spinner("Folyamatban..."):
+                        if sync_source == "Google Sheets":
+                            ok, msg = sync_members_gs_to_fs(gs_client, fs_db)
+                            get_members_fs.clear()
+                        else:
+                            ok, msg = sync_members_fs_to_gs(fs_db, gs_client)
+                        st.toast(f"✅ {msg}" if ok else f"❌ {msg}")
+                        st.cache_data.clear()
+                        st.rerun()
 
+            preview = st.session_state.get("att_sync_preview")
+            if preview and preview["source"] == sync_source:
+                target = "Firestore" if sync_source == "Google Sheets" else "Sheet"
+                st.info(f"🔍 Előnézet ({sync_source} ➡️ {target}): **{len(preview['inserts'])}** beszúrás, "
+                        f"**{len(preview['deletes'])}** törlés, {preview['unchanged']} változatlan rekord.")
+                preview_rows = plan_preview_rows(preview)
+                if preview_rows:
+                    st.dataframe(
+                        pd.DataFrame([[op] + row for op, row in preview_rows],
+                                     columns=["Művelet"] + SHEET_HEADER),
+                        hide_index=True, use_container_width=True
+                    )
 
+        st.markdown("---")
+        view_selection = st.radio("Mit szeretnél megtekinteni/szerkeszteni?",
+                                  ["👥 Jelenléti adatok", "🧾 Számlák", "🏛️ Legacy Adatok"], horizontal=True, key="db_view_sel")
+        st.markdown("---")
+    else:
+        view_selection = "👥 Jelenléti adatok"
 
-            st.markdown("---")
-            view_selection = st.radio("Mit szeretnél megtekinteni/szerkeszteni?",
-                                      ["👥 Jelenléti adatok", "🧾 Számlák", "🏛️ Legacy Adatok"], horizontal=True, key="db_view_sel")
-            st.markdown("---")
-        else:
-            view_selection = "👥 Jelenléti adatok"
+    if view_selection == "👥 Jelenléti adatok":
+        col_name_f, col_date_f, col_mode_f, col_size_f = st.columns([2, 2, 1, 1])
+        with col_name_f:
+            name_filter = st.text_input("Név (pontos egyezés):", key="db_att_name_filter").strip()
+        with col_date_f:
+            date_filter = st.date_input("Alkalom dátuma (tól–ig):", value=(), key="db_att_date_filter")
+        with col_mode_f:
+            mode_filter = st.selectbox("Mód:", ["(mind)"] + ATTENDANCE_MODES, key="db_att_mode_filter")
+        with col_size_f:
+            page_size = st.selectbox("Sor / oldal:", DB_PAGE_SIZE_OPTIONS, key="db_att_page_size")
+        filters = []
+        if name_filter:
+            filters.append(("name", "==", name_filter))
+        if mode_filter != "(mind)":
+            filters.append(("mode", "==", mode_filter))
+        if len(date_filter) > 0:
+            filters.append(("event_date", ">=", date_filter[0].strftime("%Y-%m-%d")))
+        if len(date_filter) > 1:
+            filters.append(("event_date", "<=", date_filter[1].strftime("%Y-%m-%d")))
 
-        if view_selection == "👥 Jelenléti adatok":
-            df_fs = get_attendance_rows_fs(fs_db)
-            if not df_fs.empty:
-                col_sort_fs, col_order_fs = st.columns([2, 1])
-                with col_sort_fs:
-                    sortable_cols = [c for c in df_fs.columns if c != "ID"]
-                    sort_col_fs = st.selectbox("Rendezés alapja:", sortable_cols, index=2, key="db_sort_col")
-                with col_order_fs:
-                    ascending_fs = st.checkbox("Növekvő sorrend", value=False, key="db_asc")
-                try:
-                    df_fs = df_fs.sort_values(by=sort_col_fs, ascending=ascending_fs).reset_index(drop=True)
-                except TypeError:
-                    # Vegyes típusú oszlop (pl. None + datetime a legacy import után) → string-fallback
-                    df_fs = df_fs.sort_values(
-                        by=sort_col_fs,
-                        ascending=ascending_fs,
-                        key=lambda col: col.astype(str),
-                    ).reset_index(drop=True)
-                edit_mode = st.toggle("✏️ Szerkesztés mód bekapcsolása", key="db_edit_toggle")
-                if edit_mode:
-                    st.info("💡 Kattints duplán a cellákra a szerkesztéshez! Törléshez jelöld ki a sort és nyomj **Delete**-t.")
-                    st.data_editor(df_fs, key="db_fs_editor", num_rows="dynamic",
-                                   column_config={"ID": None}, use_container_width=True)
-                    if st.button("💾 Változtatások mentése a felhőbe", type="primary", key="db_save_btn"):
-                        changes = st.session_state["db_fs_editor"]
-                        if changes.get("edited_rows") or changes.get("added_rows") or changes.get("deleted_rows"):
-                            try:
-                                for row_idx in changes.get("deleted_rows", []):
-                                    fs_db.collection(FIRESTORE_COLLECTION).document(df_fs.iloc[row_idx]["ID"]).delete()
-                                col_map = {"Név": "name", "Jön-e": "status", "Regisztráció Időpontja": "timestamp",
-                                           "Alkalom Dátuma": "event_date", "Mód": "mode"}
-                                for row_idx, edits in changes.get("edited_rows", {}).items():
-                                    doc_id = df_fs.iloc[row_idx]["ID"]
-                                    update_data = {col_map[k]: v for k, v in edits.items() if k in col_map}
-                                    if update_data:
-                                        fs_db.collection(FIRESTORE_COLLECTION).document(doc_id).update(update_data)
-                                for new_row in changes.get("added_rows", []):
-                                    fs_db.collection(FIRESTORE_COLLECTION).add({
-                                        "name": new_row.get("Név", ""), "status": new_row.get("Jön-e", "Yes"),
-                                        "timestamp": new_row.get("Regisztráció Időpontja", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
-                                        "event_date": new_row.get("Alkalom Dátuma", ""), "mode": new_row.get("Mód", "valós")
-                                    })
-                                st.toast("✅ Sikeresen frissítetted a felhő adatbázist!")
-                                st.cache_data.clear()
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Mentési hiba: {e}")
-                        else:
-                            st.info("Nem történt változtatás.")
-                else:
-                    st.dataframe(df_fs.drop(columns=["ID"]), use_container_width=True)
+        col_sort_fs, col_order_fs = st.columns([2, 1])
+        sort_fields = {"Regisztráció Időpontja": "timestamp", "Alkalom Dátuma": "event_date", "Név": "name"}
+        with col_sort_fs:
+            sort_col_fs = st.selectbox("Rendezés alapja:", list(sort_fields), key="db_sort_col")
+        with col_order_fs:
+            ascending_fs = st.checkbox("Növekvő sorrend", value=False, key="db_asc")
+
+        signature = (tuple(filters), sort_col_fs, ascending_fs, page_size)
+        order_fields = page_order_fields(sort_fields[sort_col_fs], filters)
+        if order_fields[0] != sort_fields[sort_col_fs]:
+            forced = {v: k for k, v in sort_fields.items()}.get(order_fields[0], order_fields[0])
+            st.caption(f"ℹ️ Tartomány-szűrés mellett a Firestore elsőként a(z) **{forced}** mező szerint "
+                       f"rendez; a választott **{sort_col_fs}** csak ezen belül, másodlagos kulcsként érvényes.")
+        page_idx, cursor_id = _cursor_page("db_att_pager", signature)
+        try:
+            page_docs, has_next = get_page_fs(
+                fs_db, FIRESTORE_COLLECTION, page_size, sort_fields[sort_col_fs],
+                descending=not ascending_fs, filters=tuple(filters), cursor_id=cursor_id
+            )
+        except Exception as e:
+            # összetett szűrésnél a hibaüzenet tartalmazza a szükséges index létrehozó linkjét
+            st.error(f"Hiba a lapozott lekérdezésben: {e}")
+            page_docs, has_next = [], False
+        df_fs = pd.DataFrame(
+            [[doc_id, d.get("name"), d.get("status"), d.get("timestamp"), d.get("event_date"), d.get("mode", "ismeretlen")]
+             for doc_id, d in page_docs],
+            columns=["ID", "Név", "Jön-e", "Regisztráció Időpontja", "Alkalom Dátuma", "Mód"]
+        )
+        if not df_fs.empty or page_idx > 0:
+            _cursor_pager_controls("db_att_pager", page_docs, has_next)
+            edit_mode = st.toggle("✏️ Szerkesztés mód bekapcsolása", key="db_edit_toggle")
+            if edit_mode:
+                st.info("💡 Kattints duplán a cellákra a szerkesztéshez! Törléshez jelöld ki a sort és nyomj **Delete**-t.")
+                # a szerkesztő kulcsa oldalanként más: a módosítások csak a látható oldalra vonatkoznak
+                editor_key = f"db_fs_editor_{abs(hash(signature))}_{page_idx}"
+                st.data_editor(df_fs, key=editor_key, num_rows="dynamic",
+                               column_config={"ID": None}, use_container_width=True)
+                if st.button("💾 Változtatások mentése a felhőbe", type="primary", key="db_save_btn"):
+                    changes = st.session_state[editor_key]
+                    if changes.get("edited_rows") or changes.get("added_rows") or changes.get("deleted_rows"):
+                        col_map = {"Név": "name", "Jön-e": "status", "Regisztráció Időpontja": "timestamp",
+                                   "Alkalom Dátuma": "event_date", "Mód": "mode"}
+                        to_update = lambda edits: {col_map[k]: v for k, v in edits.items() if k in col_map}  # noqa: E731
+                        to_new = lambda new_row: {  # noqa: E731
+                            "name": new_row.get("Név", ""), "status": new_row.get("Jön-e", "Yes"),
+                            "timestamp": new_row.get("Regisztráció Időpontja", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                            "event_date": new_row.get("Alkalom Dátuma", ""), "mode": new_row.get("Mód", "valós")
+                        }
+                        ops = editor_change_ops(fs_db.collection(FIRESTORE_COLLECTION), df_fs, changes,
+                                                to_update=to_update, to_new=to_new)
+                        # az alkalom-összesítőkhöz: módosításnál a régi változat törlődik, az új beíródik
+                        old_record = lambda idx: {col_map[c]: v for c, v in df_fs.iloc[int(idx)].items() if c in col_map}  # noqa: E731
+                        removed = [old_record(i) for i in changes.get("deleted_rows", [])]
+                        removed += [old_record(i) for i, e in changes.get("edited_rows", {}).items() if to_update(e)]
+                        added = [{**old_record(i), **to_update(e)} for i, e in changes.get("edited_rows", {}).items() if to_update(e)]
+                        added += [to_new(r) for r in changes.get("added_rows", [])]
+                        _commit_editor_ops(fs_db, ops, "felhő adatbázis", summary_deltas=(added, removed))
+                    else:
+                        st.info("Nem történt változtatás.")
             else:
-                st.info("Még nincsenek adatok a Firestore adatbázisban.")
+                st.dataframe(df_fs.drop(columns=["ID"]), use_container_width=True)
+        elif filters:
+            st.info("Nincs a szűrésnek megfelelő rekord.")
+        else:
+            st.info("Még nincsenek adatok a Firestore adatbázisban.")
 
-        elif view_selection == "🧾 Számlák" and logged_in:
-            invoices = get_invoices_fs(fs_db)
-            if invoices:
-                df_inv = pd.DataFrame(invoices)
-                edit_mode_inv = st.toggle("✏️ Számlák szerkesztése", key="db_inv_toggle")
-                col_sort_inv, col_order_inv = st.columns([2, 1])
-                with col_sort_inv:
-                    sortable_cols_inv = [c for c in df_inv.columns if c != "ID"]
-                    sort_col_inv = st.selectbox("Rendezés alapja:", sortable_cols_inv, index=0, key="db_inv_sort")
-                with col_order_inv:
-                    ascending_inv = st.checkbox("Növekvő sorrend", value=False, key="db_inv_asc")
-                df_inv = df_inv.sort_values(by=sort_col_inv, ascending=ascending_inv).reset_index(drop=True)
-                if edit_mode_inv:
-                    st.info("💡 Kattints duplán a cellákra a szerkesztéshez!")
-                    st.data_editor(df_inv, key="db_inv_editor", num_rows="dynamic",
-                                   column_config={"ID": None}, use_container_width=True)
-                    if st.button("💾 Számlák mentése a felhőbe", type="primary", key="db_inv_save_btn"):
-                        changes = st.session_state["db_inv_editor"]
-                        if changes.get("edited_rows") or changes.get("added_rows") or changes.get("deleted_rows"):
-                            try:
-                                for row_idx in changes.get("deleted_rows", []):
-                                    fs_db.collection(FIRESTORE_INVOICES).document(df_inv.iloc[row_idx]["ID"]).delete()
-                                for row_idx, edits in changes.get("edited_rows", {}).items():
-                                    doc_id = df_inv.iloc[row_idx]["ID"]
-                                    if edits:
-                                        fs_db.collection(FIRESTORE_INVOICES).document(doc_id).update(edits)
-                                for new_row in changes.get("added_rows", []):
-                                    add_data = {k: v for k, v in new_row.items() if k != "ID"}
-                                    if add_data:
-                                        fs_db.collection(FIRESTORE_INVOICES).add(add_data)
-                                st.toast("✅ Sikeresen frissítetted a számlákat!")
-                                st.cache_data.clear()
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Mentési hiba: {e}")
-                        else:
-                            st.info("Nem történt változtatás.")
-                else:
-                    st.dataframe(df_inv.drop(columns=["ID"]), use_container_width=True)
+    elif view_selection == "🧾 Számlák" and logged_in:
+        col_sort_inv, col_order_inv, col_size_inv = st.columns([2, 1, 1])
+        sort_fields_inv = {"Számla dátuma": "inv_date", "Összeg": "amount", "Cél év": "target_year"}
+        with col_sort_inv:
+            sort_col_inv = st.selectbox("Rendezés alapja:", list(sort_fields_inv), index=0, key="db_inv_sort")
+        with col_order_inv:
+            ascending_inv = st.checkbox("Növekvő sorrend", value=False, key="db_inv_asc")
+        with col_size_inv:
+            page_size_inv = st.selectbox("Sor / oldal:", DB_PAGE_SIZE_OPTIONS, key="db_inv_page_size")
+        signature_inv = (sort_col_inv, ascending_inv, page_size_inv)
+        page_idx_inv, cursor_inv = _cursor_page("db_inv_pager", signature_inv)
+        try:
+            inv_docs, has_next_inv = get_page_fs(
+                fs_db, FIRESTORE_INVOICES, page_size_inv, sort_fields_inv[sort_col_inv],
+                descending=not ascending_inv, cursor_id=cursor_inv
+            )
+        except Exception as e:
+            st.error(f"Hiba a lapozott lekérdezésben: {e}")
+            inv_docs, has_next_inv = [], False
+        if inv_docs:
+            df_inv = pd.DataFrame([invoice_row_fs(doc_id, d) for doc_id, d in inv_docs])
+            _cursor_pager_controls("db_inv_pager", inv_docs, has_next_inv)
+            edit_mode_inv = st.toggle("✏️ Számlák szerkesztése", key="db_inv_toggle")
+            if edit_mode_inv:
+                st.info("💡 Kattints duplán a cellákra a szerkesztéshez!")
+                editor_key_inv = f"db_inv_editor_{abs(hash(signature_inv))}_{page_idx_inv}"
+                st.data_editor(df_inv, key=editor_key_inv, num_rows="dynamic",
+                               column_config={"ID": None}, use_container_width=True)
+                if st.button("💾 Számlák mentése a felhőbe", type="primary", key="db_inv_save_btn"):
+                    changes = st.session_state[editor_key_inv]
+                    if changes.get("edited_rows") or changes.get("added_rows") or changes.get("deleted_rows"):
+                        ops = editor_change_ops(
+                            fs_db.collection(FIRESTORE_INVOICES), df_inv, changes,
+                            to_new=lambda new_row: {k: v for k, v in new_row.items() if k != "ID"},
+                        )
+                        _commit_editor_ops(fs_db, ops, "számlák")
+                    else:
+                        st.info("Nem történt változtatás.")
             else:
-                st.info("Még nincsenek számlák a Firestore adatbázisban.")
-                
-        elif view_selection == "🏛️ Legacy Adatok" and logged_in:
-            legacy_data_fs = get_legacy_totals_fs(fs_db)
-            if legacy_data_fs:
-                df_leg = pd.DataFrame(legacy_data_fs)
-                edit_mode_leg = st.toggle("✏️ Legacy Adatok szerkesztése", key="db_leg_toggle")
-                df_leg = df_leg.sort_values(by="name").reset_index(drop=True)
-                if edit_mode_leg:
-                    st.info("💡 Kattints duplán a cellákra a szerkesztéshez! A tagnév (name) módosítása vagy törlése megengedett.")
-                    st.data_editor(df_leg, key="db_leg_editor", num_rows="dynamic", use_container_width=True)
-                    if st.button("💾 Legacy mentése a felhőbe", type="primary", key="db_leg_save_btn"):
-                        changes = st.session_state["db_leg_editor"]
-                        if changes.get("edited_rows") or changes.get("added_rows") or changes.get("deleted_rows"):
-                            try:
-                                for row_idx in changes.get("deleted_rows", []):
-                                    doc_id = str(df_leg.iloc[row_idx]["name"]).replace(" ", "_")
-                                    fs_db.collection(FIRESTORE_LEGACY).document(doc_id).delete()
-                                for row_idx, edits in changes.get("edited_rows", {}).items():
-                                    orig_name = str(df_leg.iloc[row_idx]["name"])
-                                    doc_id = orig_name.replace(" ", "_")
-                                    if edits:
-                                        fs_db.collection(FIRESTORE_LEGACY).document(doc_id).update(edits)
-                                for new_row in changes.get("added_rows", []):
-                                    if "name" in new_row and new_row["name"]:
-                                        doc_id = str(new_row["name"]).replace(" ", "_")
-                                        fs_db.collection(FIRESTORE_LEGACY).document(doc_id).set(new_row)
-                                st.toast("✅ Sikeresen frissítetted a legacy adatokat!")
-                                st.cache_data.clear()
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Mentési hiba: {e}")
-                        else:
-                            st.info("Nem történt változtatás.")
-                else:
-                    st.dataframe(df_leg, use_container_width=True)
+                st.dataframe(df_inv.drop(columns=["ID"]), use_container_width=True)
+        elif page_idx_inv > 0:
+            _cursor_pager_controls("db_inv_pager", inv_docs, has_next_inv)
+            st.info("Ez az oldal üres.")
+        else:
+            st.info("Még nincsenek számlák a Firestore adatbázisban.")
+
+    elif view_selection == "🏛️ Legacy Adatok" and logged_in:
+        legacy_data_fs = get_legacy_totals_fs(fs_db)
+        if legacy_data_fs:
+            df_leg = pd.DataFrame(legacy_data_fs)
+            edit_mode_leg = st.toggle("✏️ Legacy Adatok szerkesztése", key="db_leg_toggle")
+            df_leg = df_leg.sort_values(by="name").reset_index(drop=True)
+            if edit_mode_leg:
+                st.info("💡 Kattints duplán a cellákra a szerkesztéshez! A tagnév (name) módosítása vagy törlése megengedett.")
+                st.data_editor(df_leg, key="db_leg_editor", num_rows="dynamic", use_container_width=True)
+                if st.button("💾 Legacy mentése a felhőbe", type="primary", key="db_leg_save_btn"):
+                    changes = st.session_state["db_leg_editor"]
+                    if changes.get("edited_rows") or changes.get("added_rows") or changes.get("deleted_rows"):
+                        ops = editor_change_ops(
+                            fs_db.collection(FIRESTORE_LEGACY), df_leg, changes,
+                            doc_id=lambda row: str(row["name"]).replace(" ", "_"),
+                            to_new=lambda new_row: new_row if new_row.get("name") else None,
+                            new_doc_id=lambda data: str(data["name"]).replace(" ", "_"),
+                        )
+                        _commit_editor_ops(fs_db, ops, "legacy adatok")
+                    else:
+                        st.info("Nem történt változtatás.")
             else:
-                st.info("Még nincsenek legacy adatok a Firestore-ban. Használd a betöltés gombot a Szinkronizálás fül alatt!")
+                st.dataframe(df_leg, use_container_width=True)
+        else:
+            st.info("Még nincsenek legacy adatok a Firestore-ban. Használd a betöltés gombot a Szinkronizálás fül alatt!")
 
-    with tab_diagramok:
-        st.subheader("📊 Jelenléti Statisztikák")
-        df_chart_source = get_attendance_rows_fs(fs_db)
-        # A 'legacy' rekordok ki vannak zárva a diagramból: az alkalmankinti létszámot
-        # a historical_session_totals adja (ahol a vendégek száma is benne van).
-        if not df_chart_source.empty and "Mód" in df_chart_source.columns:
-            df_chart_source = df_chart_source[df_chart_source["Mód"] != "legacy"]
-        historical_stats = get_historical_stats_fs(fs_db)
-        
-        col_cd1, col_cd2 = st.columns(2)
-        with col_cd1:
-            # We provide current year as default and some static options
-            cur_year = datetime.now().year
-            chart_year = st.selectbox("Év kiválasztása:", sorted(list(set([cur_year, 2026, 2025, 2024])), reverse=True), key="chart_ev")
-        with col_cd2:
-            chart_month = st.selectbox("Hónap kiválasztása (csak havi diagramhoz):", list(range(1, 13)), index=datetime.now().month-1, key="chart_ho")
 
-        st.markdown("---")
-        render_monthly_attendance_chart(df_chart_source, historical_stats, chart_year, chart_month)
-        st.markdown("---")
-        render_yearly_attendance_chart(df_chart_source, historical_stats, chart_year)
+@st.fragment
+@timed_render("Adatbázis · Statisztikák")
+def _render_charts_view(fs_db):
+    st.subheader("📊 Jelenléti Statisztikák")
+    col_cd1, col_cd2 = st.columns(2)
+    with col_cd1:
+        # We provide current year as default and some static options
+        cur_year = datetime.now().year
+        chart_year = st.selectbox("Év kiválasztása:", sorted(list(set([cur_year, 2026, 2025, 2024])), reverse=True), key="chart_ev")
+    with col_cd2:
+        chart_month = st.selectbox("Hónap kiválasztása (csak havi diagramhoz):", list(range(1, 13)), index=datetime.now().month-1, key="chart_ho")
+
+    # az év alkalom-összesítői és a historikus összesítők párhuzamosan (a teljes történet helyett)
+    data, errors = load_concurrently({
+        "summaries": lambda: get_session_summaries_fs(fs_db, f"{chart_year}-01-01", f"{chart_year}-12-31"),
+        "historical": lambda: get_historical_stats_fs(fs_db),
+    }, group="Adatbázis · Statisztikák")
+    if errors:
+        st.warning("⚠️ Néhány adat nem töltődött be: " + ", ".join(f"{k} ({v})" for k, v in errors.items()))
+    summaries = data.get("summaries", {})
+    historical_stats = data.get("historical", [])
+
+    st.markdown("---")
+    render_monthly_attendance_chart(
+        monthly_chart_data(summaries, historical_stats, chart_year, chart_month), chart_year, chart_month)
+    st.markdown("---")
+    render_yearly_attendance_chart(yearly_chart_data(summaries, historical_stats, chart_year), chart_year)
 
-    with tab_ranglista:
-        st.subheader("Részvételi Ranglista")
-        st.caption("📌 A ranglista a Firestore adatbázisból számít – tartalmazza a legacy (Excel) és az új rekordokat is.")
-        df_fs_rank = get_attendance_rows_fs(fs_db)
-        if not df_fs_rank.empty:
-            v = st.selectbox("Év kiválasztása:", ["All time", "2024", "2025", "2026"], key="ranglista_ev")
-            year_filter = int(v) if v != "All time" else None
-            totals = build_total_attendance_fs(df_fs_rank, year=year_filter)
-            data = [
-                {"Helyezés": i, "Név": n, "Összes Részvétel": c}
-                for i, (n, c) in enumerate(
-                    sorted(totals.items(), key=lambda x: (-x[1], x[0])), 1
-                ) if c > 0
-            ]
-            tab_rl_lista, tab_rl_top5 = st.tabs(["📋 Adattábla", "🏅 Top 5 Hősök"])
-            with tab_rl_lista:
-                st.dataframe(data, use_container_width=True)
-            with tab_rl_top5:
-                render_top5_chart(data)
-        else:
-            st.warning("Nem sikerült betölteni az adatokat a Firestore-ból.")
 
+@st.fragment
+@timed_render("Adatbázis · Ranglista")
+def _render_ranking_view(fs_db):
+    st.subheader("Részvételi Ranglista")
+    st.caption("📌 A ranglista a Firestore adatbázisból számít – tartalmazza a legacy (Excel) és az új rekordokat is.")
+    # materializált ranglista: adatverzió-váltáskor csak a változott rekordok számolódnak újra
+    loaded, _ = load_concurrently({
+        "board": lambda: get_leaderboard(fs_db),
+        "legacy": lambda: get_legacy_totals_fs(fs_db),
+    }, group="Adatbázis · Ranglista")
+    board = loaded.get("board")
+    if board is not None and board.version != "empty":
+        v = st.selectbox("Év kiválasztása:", ["All time", "2024", "2025", "2026"], key="ranglista_ev")
+        year_filter = int(v) if v != "All time" else None
+        data = board.ranking(year_filter, legacy_totals=loaded.get("legacy", []))
+        tab_rl_lista, tab_rl_top5 = st.tabs(["📋 Adattábla", "🏅 Top 5 Hősök"])
+        with tab_rl_lista:
+            st.dataframe(data, use_container_width=True)
+        with tab_rl_top5:
+            render_top5_chart(data)
+    else:
+        st.warning("Nem sikerült betölteni az adatokat a Firestore-ból.")
+
+
+def render_database_page(gs_client, fs_db, logged_in=False):
+    st.title("🗂️ Adatbázis")
+
+    # Csak a kiválasztott nézet számol és renderel; minden nézet saját fragment,
+    # így a benne lévő widgetek csak az adott nézetet futtatják újra.
+    views = {}
+    if logged_in:
+        views["📝 Beküldött Adatok (Sheet)"] = lambda: _render_sheet_view(gs_client)
+    views["☁️ Felhő Adatok (Firestore)"] = lambda: _render_firestore_view(gs_client, fs_db, logged_in)
+    views["📊 Statisztikák"] = lambda: _render_charts_view(fs_db)
+    views["🏆 Ranglista"] = lambda: _render_ranking_view(fs_db)
+    if st.session_state.get("db_view") not in views:
+        st.session_state["db_view"] = next(iter(views))
+    selected = st.radio("Nézet:", list(views), horizontal=True, key="db_view", label_visibility="collapsed")
+    views[selected]()
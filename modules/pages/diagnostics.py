@@ -5,12 +5,17 @@ from google.cloud import firestore
 
 from modules.config import FIRESTORE_APP_LOGS
 from modules.logger import get_logs_fs
+from modules.sync_worker import get_qr_sync_worker
+from modules.sheets import get_sheet_registry
+from modules.perf import get_timings, get_spans
+from modules.session_summaries import get_summaries_stale_fs, rebuild_session_summaries
+from modules.player_balances import rebuild_player_balances
 
 
 def render_diagnostics_page(fs_db, gs_client):
     st.title("🛠️ Rendszer Diagnosztika")
 
-    tab_tests, tab_logs = st.tabs(["🩺 Felhő Tesztek", "📜 Rendszernapló (Logok)"])
+    tab_tests, tab_sync, tab_logs = st.tabs(["🩺 Felhő Tesztek", "🔄 Háttérszinkron", "📜 Rendszernapló (Logok)"])
 
     with tab_tests:
         st.subheader("Kapcsolatok Tesztelése")
@@ -59,6 +64,100 @@ def render_diagnostics_page(fs_db, gs_client):
                 else:
                     st.warning("🟡 Nincs 'email' szekció beállítva a Streamlit Secrets-ben ('sender' és 'password').")
 
+        st.markdown("---")
+        with st.expander("⏱️ Renderelési idők (ez a munkamenet)"):
+            timings = get_timings()
+            if timings:
+                st.dataframe(pd.DataFrame([
+                    {"Nézet": label, "Futások": t["runs"], "Utolsó (ms)": round(t["last_ms"]),
+                     "Átlag (ms)": round(t["total_ms"] / t["runs"])}
+                    for label, t in sorted(timings.items())
+                ]), hide_index=True, use_container_width=True)
+            else:
+                st.info("Még nincs mért nézet ebben a munkamenetben.")
+            spans = get_spans()
+            if spans:
+                # párhuzamos betöltések: az átfedő idősávok igazolják, hogy a hívások egyszerre futottak
+                st.markdown("**Párhuzamos betöltések (utolsó futás)**")
+                st.dataframe(pd.DataFrame([
+                    {"Csoport": group, "Hívás": s["label"], "Állapot": s["status"],
+                     "Kezdet (ms)": round(s["start_ms"]),
+                     "Vége (ms)": round(s["end_ms"]) if s["end_ms"] is not None else None}
+                    for group, group_spans in sorted(spans.items()) for s in group_spans
+                ]), hide_index=True, use_container_width=True)
+
+    with tab_sync:
+        st.subheader("QR check-in → Google Sheet szinkron")
+        st.caption("A háttérszál periodikusan és minden edzés vége után röviddel átviszi a QR check-ineket a Sheetbe.")
+        worker = get_qr_sync_worker(fs_db, gs_client)
+        status = worker.status()
+
+        def _fmt(ts):
+            return ts.strftime("%Y-%m-%d %H:%M:%S") if ts else "—"
+
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Utolsó futás", _fmt(status["last_run"]))
+        c2.metric("Utoljára szinkronizálva", f"{status['last_synced']} rekord")
+        c3.metric("Összesen (folyamat indulása óta)", f"{status['total_synced']} rekord")
+        if status["running"]:
+            st.info("⏳ A szinkron éppen fut...")
+        elif status["last_ok"] is False:
+            st.error(f"❌ Az utolsó futás hibával ért véget: {status['last_error']}")
+        elif status["last_ok"]:
+            st.success("✅ Az utolsó futás sikeres volt.")
+        else:
+            st.info("A worker még nem futott le.")
+        st.markdown(f"**Következő ütemezett futás:** {_fmt(status['next_run'])}")
+        if st.button("▶️ Szinkron indítása most", use_container_width=True):
+            worker.trigger()
+            st.toast("Szinkron elindítva a háttérben.")
+
+        st.subheader("Google Sheets hívásszámlálók")
+        st.caption("A munkalap-nyilvántartás a táblázatot egyszer nyitja meg, a lapokat cache-eli; "
+                   "az 'open' és 'metadata' értékek normál esetben alacsonyak maradnak.")
+        if gs_client:
+            counters = get_sheet_registry(gs_client).counters
+            labels = {
+                "data": "Adatművelet", "open": "Táblázat megnyitás", "metadata": "Lap-lista lekérés",
+                "cache_hit": "Cache találat", "create": "Új lap", "refresh": "Cache ürítés", "error": "Hiba",
+                "tail_read": "Jelenlét: csak új sorok", "full_read": "Jelenlét: teljes olvasás",
+                "checksum_mismatch": "Jelenlét: checksum eltérés",
+            }
+            st.dataframe(
+                pd.DataFrame([{"Számláló": label, "Érték": counters.get(key, 0)} for key, label in labels.items()]),
+                hide_index=True, use_container_width=True
+            )
+        else:
+            st.info("A Google Sheets kliens nem elérhető.")
+
+        st.subheader("Alkalom-összesítők (session_summaries)")
+        st.caption("Dátumonként egy dokumentum névenkénti számlálókkal; minden jelenlét-írás után Increment-tel frissül. "
+                   "Újraépítés csak kézi adatbázis-beavatkozás vagy régi adatok után szükséges.")
+        stale = get_summaries_stale_fs(fs_db)
+        if stale:
+            st.warning(f"⚠️ Az összesítők eltérhetnek a rekordoktól: {stale.get('stale_reason', '')}. "
+                       "Futtasd az újraépítést!")
+        if st.button("🧮 Összesítők újraépítése", use_container_width=True, disabled=fs_db is None):
+            with st.spinner("Újraépítés..."):
+                ok, msg = rebuild_session_summaries(fs_db)
+            if ok:
+                st.cache_data.clear()
+                st.success(msg)
+            else:
+                st.error(msg)
+
+        st.subheader("Folyószámlák (player_balances)")
+        st.caption("Játékosonkénti terhelés és befizetés havi bontásban; elszámolás-mentéskor és kivonat-importkor "
+                   "frissül. Újraépítés csak kézi adatbázis-beavatkozás után szükséges.")
+        if st.button("🧾 Folyószámlák újraépítése", use_container_width=True, disabled=fs_db is None):
+            with st.spinner("Újraépítés..."):
+                ok, msg = rebuild_player_balances(fs_db)
+            if ok:
+                st.cache_data.clear()
+                st.success(msg)
+            else:
+                st.error(msg)
+
     with tab_logs:
         st.subheader("Belső App Események (Logok)")
         st.write("Itt követheted nyomon az app működését, hibákat és rendszerüzeneteket.")
@@ -1,8 +1,9 @@
 import streamlit as st
 import re
 
-from modules.config import MAIN_NAME_LIST, GSHEET_NAME, MEMBERS_SHEET_NAME
-from modules.db import get_members_fs, sync_members_fs_to_gs, sync_members_gs_to_fs
+from modules.config import MAIN_NAME_LIST, MEMBERS_SHEET_NAME
+from modules.db import get_members_fs, sync_members_fs_to_gs, sync_members_gs_to_fs, upsert_members_fs
+from modules.sheets import get_sheet_registry
 
 
 def render_members_page(fs_db, gs_client):
@@ -34,17 +35,21 @@ def render_members_page(fs_db, gs_client):
                     st.warning("Érvényes email cím szükséges! (pl: nev@domain.hu)")
                 else:
                     try:
-                        fs_db.collection("members").add({"name": new_name, "email": new_email, "active": new_active})
-                        ss = gs_client.open(GSHEET_NAME)
-                        ws_titles = [w.title for w in ss.worksheets()]
-                        if MEMBERS_SHEET_NAME not in ws_titles:
-                            ws = ss.add_worksheet(title=MEMBERS_SHEET_NAME, rows=100, cols=5)
-                            ws.append_row(["Név", "Email", "Aktív"])
-                        else:
-                            ws = ss.worksheet(MEMBERS_SHEET_NAME)
-                        ws.append_row([new_name, new_email, str(new_active)])
-                        st.toast(f"✅ {new_name} sikeresen hozzáadva!")
+                        stats = upsert_members_fs(fs_db, [{"name": new_name, "email": new_email, "active": new_active}])
                         get_members_fs.clear()
+                        if stats["created"]:
+                            get_sheet_registry(gs_client).call(
+                                lambda ws: ws.append_row([new_name, new_email, str(new_active)]),
+                                title=MEMBERS_SHEET_NAME, create={"rows": 100, "cols": 5, "header": ["Név", "Email", "Aktív"]}
+                            )
+                            st.toast(f"✅ {new_name} sikeresen hozzáadva!")
+                        elif stats["updated"]:
+                            # meglévő tag: a Sheet sorát a különbség-alapú teljes szinkron frissíti (nincs új sor)
+                            ok, msg = sync_members_fs_to_gs(fs_db, gs_client)
+                            st.toast(f"✅ {new_name} már szerepelt, adatai frissítve." if ok
+                                     else f"⚠️ {new_name} frissítve a Firestore-ban, de Sheet hiba: {msg}")
+                        else:
+                            st.toast(f"ℹ️ {new_name} már szerepelt ezekkel az adatokkal.")
                         st.rerun()
                     except Exception as e:
                         st.error(f"Hiba: {e}")
@@ -61,18 +66,16 @@ def render_members_page(fs_db, gs_client):
                 if st.button("💾 Változtatások mentése (Firestore + Sheet)", type="primary"):
                     try:
                         changes = st.session_state["members_editor"]
-                        for idx in changes.get("deleted_rows", []):
-                            fs_db.collection("members").document(df.iloc[idx]["ID"]).delete()
-                        field_map = {"Név": "name", "Email": "email", "Aktív": "active"}
+                        # a szerkesztett sorok teljes (régi + módosított) tartalommal, azonosítóval mennek az upsertbe
+                        members = []
                         for idx, edits in changes.get("edited_rows", {}).items():
-                            doc_id = df.iloc[idx]["ID"]
-                            update = {field_map[k]: v for k, v in edits.items() if k in field_map}
-                            if update:
-                                fs_db.collection("members").document(doc_id).update(update)
+                            row = {**df.iloc[int(idx)].to_dict(), **edits}
+                            members.append({"id": row["ID"], "name": row["Név"], "email": row["Email"], "active": row["Aktív"]})
                         for new_row in changes.get("added_rows", []):
-                            fs_db.collection("members").add({
-                                "name": new_row.get("Név", ""), "email": new_row.get("Email", ""), "active": new_row.get("Aktív", True)
-                            })
+                            members.append({"name": new_row.get("Név", ""), "email": new_row.get("Email", ""),
+                                            "active": new_row.get("Aktív", True)})
+                        delete_ids = [df.iloc[idx]["ID"] for idx in changes.get("deleted_rows", [])]
+                        upsert_members_fs(fs_db, members, delete_ids=delete_ids)
                         get_members_fs.clear()
                         ok, msg = sync_members_fs_to_gs(fs_db, gs_client)
                         st.toast(f"✅ Mentve! {msg}" if ok else f"⚠️ Firestore OK, de Sheet hiba: {msg}")
@@ -1,10 +1,11 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-from modules.config import HUNGARY_TZ
+from modules.config import HUNGARY_TZ, LIVE_BOARD_REFRESH_SEC
 
-from modules.db import get_attendance_rows_fs
-from modules.utils import generate_tuesday_dates, parse_date_str
+from modules.dates import generate_tuesday_dates
+from modules.live_board import get_live_board
+from modules.live_counter import get_live_count_fs
+from modules.session_summaries import get_session_summary_fs
 
 
 def render_attendance_overview_page(fs_db):
@@ -25,42 +26,70 @@ def render_attendance_overview_page(fs_db):
         index=default_idx,
         format_func=lambda d: f"{'📌 ' if d == upcoming_str else ''}{d}"
     )
-    if selected_date_str:
-        selected_date = parse_date_str(selected_date_str)
+    live_mode = st.toggle(
+        "🔴 Élő mód", key="overview_live_mode",
+        help=f"A névsor {LIVE_BOARD_REFRESH_SEC} mp-enként frissül egy közös, szerveroldali figyelőből "
+             "(a nézők számától független Firestore-terhelés)."
+    )
+    if selected_date_str and live_mode:
+        _render_live_board(fs_db, selected_date_str)
+    elif selected_date_str:
+        # egyetlen kis dokumentum az alkalom végleges névsorával (session_summaries)
         with st.spinner("Adatok betöltése a Firestore-ból..."):
-            df_fs = get_attendance_rows_fs(fs_db)
-        if df_fs.empty:
-            st.warning("Nem sikerült betölteni a Firestore adatokat.")
-            return
-        yes_set = set()
-        no_set = set()
-        for _, row in df_fs.iterrows():
-            name = str(row["Név"]).strip() if pd.notna(row["Név"]) else ""
-            is_coming = str(row["Jön-e"]).strip() if pd.notna(row["Jön-e"]) else ""
-            if not name:
-                continue
-            mode_val = str(row["Mód"]).strip().lower() if pd.notna(row["Mód"]) else "valós"
-            if mode_val == "teszt":
-                continue
-            reg_val = str(row["Regisztráció Időpontja"]) if pd.notna(row["Regisztráció Időpontja"]) else ""
-            evt_val = str(row["Alkalom Dátuma"]) if pd.notna(row["Alkalom Dátuma"]) else ""
-            rel_date = parse_date_str(evt_val) or parse_date_str(reg_val)
-            if rel_date == selected_date:
-                if is_coming == "Yes":
-                    yes_set.add(name)
-                elif is_coming == "No":
-                    no_set.add(name)
-        final_attendees = sorted(list(yes_set - no_set))
+            summary = get_session_summary_fs(fs_db, selected_date_str) or {}
+        if summary.get("cancelled"):
+            st.warning("⚠️ Ez az alkalom elmaradt (kivételként rögzítve).")
+        final_attendees = summary.get("attendees", [])
         count = len(final_attendees)
         st.markdown("---")
         col1, col2 = st.columns([1, 2])
         with col1:
             st.metric(label="Résztvevők száma", value=f"{count} fő")
+            if selected_date_str == upcoming_str:
+                # shardolt számláló: a check-in roham közben is pár dokumentum olvasása
+                live_count = get_live_count_fs(fs_db, selected_date_str)
+                if live_count is not None:
+                    st.metric(label="Élő check-in", value=f"{live_count} fő",
+                              help="QR check-inek és admin mentések (visszavonásokkal csökkentve), ~10 mp-enként frissül.")
         with col2:
             if count > 0:
                 st.subheader("Résztvevők névsora:")
-                name_cols = st.columns(2)
-                for i, name in enumerate(final_attendees):
-                    name_cols[i % 2].markdown(f"✅ **{name}**")
+                _render_attendee_names(final_attendees)
             else:
                 st.info("Erre az alkalomra nincs érvényes regisztráció.")
+
+
+def _render_attendee_names(attendees):
+    name_cols = st.columns(2)
+    for i, name in enumerate(attendees):
+        name_cols[i % 2].markdown(f"✅ **{name}**")
+
+
+@st.fragment(run_every=LIVE_BOARD_REFRESH_SEC)
+def _render_live_board(fs_db, date_str):
+    # csak a folyamatszintű tábla memóriabeli állapotát olvassa; Firestore-hívás nincs
+    if fs_db is None:
+        st.error("Az adatbázis nem elérhető, az élő mód nem indítható.")
+        return
+    board = get_live_board(fs_db, date_str).snapshot()
+    if not board["ready"]:
+        st.info("⏳ Kapcsolódás az élő adatfolyamhoz...")
+        return
+    if board["error"]:
+        st.warning(f"⚠️ Élő frissítési hiba: {board['error']}")
+    attendees = board["attendees"]
+    st.markdown("---")
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.metric(label="Résztvevők száma (élő)", value=f"{len(attendees)} fő")
+        st.caption(f"Frissítve: {board['updated_at'].strftime('%H:%M:%S')}")
+        if board["events"]:
+            st.markdown("**Legutóbbi változások:**")
+            for ts, kind, name in board["events"]:
+                st.markdown(f"{ts.strftime('%H:%M:%S')} {'🟢' if kind == '+' else '🔴'} {name}")
+    with col2:
+        if attendees:
+            st.subheader("Résztvevők névsora:")
+            _render_attendee_names(attendees)
+        else:
+            st.info("Erre az alkalomra még nincs érvényes regisztráció.")
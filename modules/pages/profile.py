@@ -3,54 +3,43 @@ import pandas as pd
 import altair as alt
 from datetime import datetime
 
-from modules.db import get_attendance_rows_fs, get_all_settlements_for_player, get_avg_session_attendees_for_year
-from modules.utils import parse_date_str, estimate_cost_for_player
+from modules.attendance import get_player_attendance_index
+from modules.db import get_all_settlements_for_player, get_avg_session_attendees_for_year
+from modules.loaders import load_concurrently
+from modules.player_balances import balance_history, get_player_balance_fs
+from modules.utils import estimate_cost_for_player
 from modules.config import HUNGARY_TZ
 
 
-def _get_player_attendance(df_fs: pd.DataFrame, name: str) -> pd.DataFrame:
-    """Visszaadja a játékos összes érvényes (Yes, nem teszt) jelenlétét dátummal."""
-    if df_fs.empty:
-        return pd.DataFrame(columns=["date"])
-
-    records = []
-    seen = set()  # (name, date) deduplikálás
-
-    for _, row in df_fs.iterrows():
-        r_name = str(row["Név"]).strip() if pd.notna(row["Név"]) else ""
-        if r_name != name:
-            continue
-        is_coming = str(row["Jön-e"]).strip() if pd.notna(row["Jön-e"]) else ""
-        mode = str(row["Mód"]).strip().lower() if pd.notna(row["Mód"]) else "valós"
-        if mode == "teszt" or is_coming != "Yes":
-            continue
-        evt = str(row["Alkalom Dátuma"]) if pd.notna(row["Alkalom Dátuma"]) else ""
-        reg = str(row["Regisztráció Időpontja"]) if pd.notna(row["Regisztráció Időpontja"]) else ""
-        d = parse_date_str(evt) or parse_date_str(reg)
-        if d and (name, d) not in seen:
-            seen.add((name, d))
-            records.append({"date": d, "year": d.year, "month": d.month})
-
-    return pd.DataFrame(records) if records else pd.DataFrame(columns=["date", "year", "month"])
+def _profile_loaders(fs_db, name, year):
+    """Az oldal független betöltői; a játékos-/évfüggők csak ismert kiválasztásnál."""
+    loaders = {"index": lambda: get_player_attendance_index(fs_db)}
+    if name is not None:
+        loaders["settlements"] = lambda: get_all_settlements_for_player(fs_db, name)
+        loaders["balance"] = lambda: get_player_balance_fs(fs_db, name)
+    if year is not None:
+        loaders["avg_attendees"] = lambda: get_avg_session_attendees_for_year(fs_db, year)
+    return loaders
 
 
 def render_player_profile_page(fs_db):
     st.title("📊 Játékos Profil")
 
     # --- Adatok betöltése ---
+    # A független Firestore-olvasások párhuzamosan indulnak. A kiválasztott játékos és év
+    # (az első futást leszámítva) már a widgetek session_state-jében van, így a tőlük
+    # függő lekérések is azonnal indulhatnak; ami hiányzik vagy eltér, a widgetek után pótoljuk.
+    guess_name = st.session_state.get("profile_name_sel")
+    guess_year = st.session_state.get("profile_year_sel")
     with st.spinner("Adatok betöltése..."):
-        df_all = get_attendance_rows_fs(fs_db)
-
-    if df_all.empty:
-        st.warning("Nem sikerült betölteni az adatokat.")
+        data, errors = load_concurrently(_profile_loaders(fs_db, guess_name, guess_year), group="Profil")
+    # adatverziónként egyszer épülő játékos × (év, hónap) index; az oldal csak szeletel belőle
+    index = data.get("index")
+    if index is None:
+        st.warning(f"Nem sikerült betölteni az adatokat. ({errors.get('index', '')})")
         return
 
-    # --- Játékos nevei (deduplikált, rendezett) ---
-    all_names = sorted(set(
-        str(r).strip() for r in df_all["Név"].dropna()
-        if str(r).strip() and str(r).strip() not in ("nan", "")
-    ))
-
+    all_names = [n for n in index.names if n != "nan"]
     if not all_names:
         st.info("Nincsenek elérhető játékosok.")
         return
@@ -64,12 +53,7 @@ def render_player_profile_page(fs_db):
         )
     with col_year:
         current_year = datetime.now(HUNGARY_TZ).year
-        available_years = sorted(
-            set(df_all["Alkalom Dátuma"].dropna().apply(
-                lambda x: parse_date_str(str(x))
-            ).dropna().apply(lambda d: d.year)),
-            reverse=True
-        )
+        available_years = list(index.years)
         if not available_years:
             available_years = [current_year]
         selected_year = st.selectbox(
@@ -78,22 +62,36 @@ def render_player_profile_page(fs_db):
             key="profile_year_sel"
         )
 
+    for key, guessed, selected in (("settlements", guess_name, selected_name),
+                                   ("balance", guess_name, selected_name),
+                                   ("avg_attendees", guess_year, selected_year)):
+        if guessed != selected:
+            data.pop(key, None)
+            errors.pop(key, None)
+    pending = {k: fn for k, fn in _profile_loaders(fs_db, selected_name, selected_year).items()
+               if k not in data and k not in errors}
+    if pending:
+        more, more_errors = load_concurrently(pending, group="Profil")
+        data.update(more)
+        errors.update(more_errors)
+    if errors:
+        st.warning("⚠️ Néhány adat nem töltődött be: " + ", ".join(f"{k} ({v})" for k, v in errors.items()))
+
     st.markdown("---")
 
     # --- Szűrt adatok ---
-    df_player = _get_player_attendance(df_all, selected_name)
+    player_dates = index.dates(selected_name)
 
-    if df_player.empty:
+    if not len(player_dates):
         st.info(f"**{selected_name}** nincs bejegyezve egyetlen alkalomra sem.")
         return
 
-    total = len(df_player)
-    this_year_count = len(df_player[df_player["year"] == current_year])
+    player_yearly = index.yearly(selected_name)
+    total = len(player_dates)
+    this_year_count = int(player_yearly.get(current_year, 0))
     this_month = datetime.now(HUNGARY_TZ).month
-    this_month_count = len(df_player[
-        (df_player["year"] == current_year) & (df_player["month"] == this_month)
-    ])
-    year_count = len(df_player[df_player["year"] == selected_year])
+    this_month_count = int(index.counts(selected_name).get((current_year, this_month), 0))
+    year_count = int(player_yearly.get(selected_year, 0))
 
     # --- Metrikák ---
     c1, c2, c3, c4 = st.columns(4)
@@ -108,13 +106,13 @@ def render_player_profile_page(fs_db):
     st.markdown(f"#### 💰 Pénzügyi összesítő — {selected_year}")
 
     # Átlagos létszám lekérése az elszámolásokból (pontosabb becsléshez)
-    avg_attendees = get_avg_session_attendees_for_year(fs_db, selected_year)
+    avg_attendees = data.get("avg_attendees")
 
     # Becsült összeg kiszámítása
     cost_est = estimate_cost_for_player(year_count, selected_year, avg_attendees)
 
     # Elszámolások lekérése erre a játékosra
-    all_settlements = get_all_settlements_for_player(fs_db, selected_name)
+    all_settlements = data.get("settlements", [])
     # int() casting mindkét oldalon: Firestore néha más numerikus típust ad vissza
     year_settlements = [s for s in all_settlements if int(s["year"]) == int(selected_year)]
 
@@ -254,14 +252,25 @@ def render_player_profile_page(fs_db):
                 )
 
 
+    # --- Folyószámla (player_balances: egyetlen dokumentum, íráskor karbantartva) ---
+    balance = data.get("balance")
+    if balance:
+        st.markdown("#### 🧾 Folyószámla (összes elszámolt hónap)")
+        b1, b2, b3 = st.columns(3)
+        b1.metric("Terhelés", f"{balance.get('charged', 0):,.0f} Ft".replace(",", " "))
+        b2.metric("Befizetés", f"{balance.get('paid', 0):,.0f} Ft".replace(",", " "))
+        b3.metric("Egyenleg", f"{balance.get('balance', 0):+,.0f} Ft".replace(",", " "),
+                  help="Negatív érték: tartozás. A befizetések a Befizetési naplóból származnak.")
+        with st.expander("📆 Havi pillanatképek"):
+            st.dataframe(balance_history(balance), use_container_width=True, hide_index=True)
+
     st.markdown("---")
 
     # --- Éves összesítő diagram ---
 
     st.markdown("#### 📈 Éves összesítő")
     yearly = (
-        df_player.groupby("year")
-        .size()
+        player_yearly
         .reset_index(name="Alkalmak száma")
         .rename(columns={"year": "Év"})
     )
@@ -291,13 +300,7 @@ def render_player_profile_page(fs_db):
     ]
     st.markdown(f"#### 🗂️ Havi bontás — {selected_year}")
 
-    df_year = df_player[df_player["year"] == selected_year]
-    monthly = (
-        df_year.groupby("month")
-        .size()
-        .reindex(range(1, 13), fill_value=0)
-        .reset_index()
-    )
+    monthly = index.monthly(selected_name, selected_year).reset_index()
     monthly.columns = ["Hónap száma", "Alkalmak száma"]
     monthly["Hónap"] = monthly["Hónap száma"].apply(lambda m: month_names[m - 1])
 
@@ -337,11 +340,5 @@ def render_player_profile_page(fs_db):
 
     # --- Utolsó 10 alkalom ---
     st.markdown("#### 🕐 Utolsó 10 alkalom")
-    recent = (
-        df_player.sort_values("date", ascending=False)
-        .head(10)
-        .copy()
-    )
-    recent["date"] = recent["date"].apply(lambda d: d.strftime("%Y-%m-%d"))
-    recent = recent.rename(columns={"date": "Dátum", "year": "Év", "month": "Hónap"})
-    st.dataframe(recent[["Dátum"]].reset_index(drop=True), use_container_width=True, hide_index=True)
+    recent = pd.DataFrame({"Dátum": [d.strftime("%Y-%m-%d") for d in player_dates[:10]]})
+    st.dataframe(recent, use_container_width=True, hide_index=True)
@@ -5,6 +5,7 @@ from google.cloud import firestore
 
 from modules.config import FIRESTORE_CANCELLED
 from modules.db import get_cancelled_sessions_fs
+from modules.session_summaries import set_session_cancelled
 
 
 def _generate_qr_bytes(url):
@@ -56,6 +57,7 @@ def render_settings_page(fs_db):
                 else:
                     try:
                         fs_db.collection(FIRESTORE_CANCELLED).add({"date": date_str})
+                        set_session_cancelled(fs_db, date_str, True)
                         st.toast("✅ Sikeresen rögzítve!")
                         st.cache_data.clear()
                         st.rerun()
@@ -73,6 +75,7 @@ def render_settings_page(fs_db):
                     c1.markdown(f"🗓️ **{item['Dátum']}**")
                     if c2.button("❌ Törlés", key=f"del_{item['ID']}", use_container_width=True):
                         fs_db.collection(FIRESTORE_CANCELLED).document(item['ID']).delete()
+                        set_session_cancelled(fs_db, item['Dátum'], False)
                         st.cache_data.clear()
                         st.rerun()
         else:
@@ -0,0 +1,164 @@
+# Befizetési napló: a feltöltött Revolut kivonatok bejövő tételei tartósan,
+# tranzakció-ujjlenyomat szerint deduplikálva (payment_ledger/{ujjlenyomat}).
+# Az átfedő kivonatok így nem számolnak duplán, és a napló munkamenetek között
+# is megmarad; a párosított tételek a játékosok folyószámláján (player_balances) jóváíródnak.
+# A naplóírás és a jóváírás tranzakciónként együtt, atomikusan történik: egyidejű
+# importok vagy félbeszakadt import után sem marad ki és nem duplázódik jóváírás.
+import io
+
+import pandas as pd
+import streamlit as st
+from google.cloud import firestore
+
+from modules.batch_writes import BATCH_LIMIT, add_ops
+from modules.config import FIRESTORE_PAYMENT_LEDGER, FIRESTORE_SETTLEMENTS
+from modules.payment_matcher import FUZZY_MIN_SCORE, PaymentMatcher, name_key
+from modules.player_balances import balance_ops, ensure_player_balances, payment_deltas
+
+LEDGER_COLUMNS = ["fingerprint", "date", "revolut_name", "amount", "system_name", "statement"]
+# tételenként legfeljebb egy napló- és egy folyószámla-írás, így egy tranzakció belefér a korlátba
+LEDGER_TX_ENTRIES = BATCH_LIMIT // 2
+
+
+@st.cache_data(ttl=300)
+def get_settlement_dues_fs(_db):
+    """Az összes elmentett elszámolás tételei: DataFrame[Név, year, month_num, Fizetendő (Ft)] (vendégek nélkül)."""
+    columns = ["Név", "year", "month_num", "Fizetendő (Ft)"]
+    if _db is None:
+        return pd.DataFrame(columns=columns)
+    frames = []
+    try:
+        for doc in _db.collection(FIRESTORE_SETTLEMENTS).stream():
+            d = doc.to_dict()
+            try:
+                df = pd.read_json(io.StringIO(d["df_osszesito"]), orient="records")
+            except Exception:
+                continue
+            if df.empty or "Név" not in df.columns or "Fizetendő (Ft)" not in df.columns:
+                continue
+            df = df[~df["Név"].str.contains(" - ", na=False)][["Név", "Fizetendő (Ft)"]]
+            frames.append(df.assign(year=int(d.get("year", 0)), month_num=int(d.get("month_num", 0))))
+    except Exception as e:
+        print(f"get_settlement_dues_fs hiba: {e}")
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+@st.cache_data(ttl=300)
+def get_payment_ledger_fs(_db):
+    """A befizetési napló tételei: DataFrame[LEDGER_COLUMNS]."""
+    if _db is None:
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+    try:
+        rows = [doc.to_dict() for doc in _db.collection(FIRESTORE_PAYMENT_LEDGER).stream()]
+    except Exception as e:
+        st.error(f"Hiba a befizetési napló betöltésekor: {e}")
+        rows = []
+    return pd.DataFrame(rows, columns=LEDGER_COLUMNS)
+
+
+def match_statement(df_statement, rev_to_sys, sys_names):
+    """A kivonat soraihoz (rendszer név, pontszám) párt rendel, soronként egy listaelem.
+
+    A napló tartós és jóváír, ezért csak mentett párosítás (pontszám None) vagy a
+    FUZZY_MIN_SCORE-t elérő hasonlóság kerülhet bele; minden más (None, None), azaz
+    párosítatlan marad, és a napló fülön kézi párosításra vár."""
+    assigned = {
+        key: (sys_name, score)
+        for key, (sys_name, score) in PaymentMatcher(df_statement, rev_to_sys).assignments(sys_names).items()
+        if score is None or score >= FUZZY_MIN_SCORE
+    }
+    return [assigned.get(name_key(rev_name), (None, None)) for rev_name in df_statement["_name"]]
+
+
+def _commit_ledger_chunk(fs_db, coll, entries):
+    """Egy tranzakció: [(ujjlenyomat, "new", dokumentum) | (ujjlenyomat, "rematch", rendszer név)].
+
+    Újrapárosításnál a payload (rendszer név, pontszám). A tranzakción belül újraolvassa a tételeket; csak a még nem létező tétel íródik be,
+    és csak a még párosítatlan tétel párosítódik újra — a jóváírás pontosan ezekre, ugyanabban
+    a commitban megy. Ütközéskor (egyidejű import) a Firestore újrafuttatja. (új, újrapárosított)"""
+    refs = [coll.document(fingerprint) for fingerprint, _, _ in entries]
+
+    @firestore.transactional
+    def _apply(transaction):
+        snaps = {snap.id: snap for snap in fs_db.get_all(refs, transaction=transaction)}
+        ops, credited, created, rematched = [], [], 0, 0
+        for (fingerprint, kind, payload), ref in zip(entries, refs):
+            snap = snaps.get(fingerprint)
+            current = snap.to_dict() if snap is not None and snap.exists else None
+            if kind == "new":
+                if current is not None:
+                    continue
+                ops.append(("set", ref, payload))
+                created += 1
+                if payload["system_name"]:
+                    credited.append((payload["system_name"], payload["date"], payload["amount"]))
+            else:
+                if current is None or current.get("system_name"):
+                    continue
+                system_name, score = payload
+                ops.append(("update", ref, {"system_name": system_name, "match_score": score}))
+                rematched += 1
+                credited.append((system_name, current.get("date"), float(current.get("amount") or 0)))
+        add_ops(transaction, ops + balance_ops(fs_db, payment_deltas(credited)))
+        return created, rematched
+
+    return _apply(fs_db.transaction())
+
+
+def ingest_statements(fs_db, statements, rev_to_sys, sys_names):
+    """Kivonatok ({fájlnév: DataFrame[_name, _amount, _date, _fingerprint]}) tételeinek mentése a naplóba.
+
+    A már naplózott ujjlenyomatok (korábbi vagy átfedő kivonatokból) kimaradnak; a korábban
+    párosítatlan naplótételek a mostani párosításokkal újra párosítódnak (üres statements
+    esetén csak ez történik). A tételek LEDGER_TX_ENTRIES-es tranzakciókban íródnak, a
+    párosított tételek jóváírásával együtt (_commit_ledger_chunk). Visszatérés: (ok, üzenet)."""
+    if fs_db is None:
+        return False, "Nincs Firestore kapcsolat."
+    try:
+        ensure_player_balances(fs_db)
+        coll = fs_db.collection(FIRESTORE_PAYMENT_LEDGER)
+        # előszűrés: a tranzakció úgyis újraellenőriz, ez csak a felesleges olvasásokat spórolja meg
+        existing, unassigned = set(), []
+        for doc in coll.stream():
+            existing.add(doc.id)
+            d = doc.to_dict()
+            if not d.get("system_name"):
+                unassigned.append((doc.id, d.get("revolut_name", ""), float(d.get("amount") or 0), d.get("date")))
+        entries = []
+        if unassigned:
+            df_old = pd.DataFrame(unassigned, columns=["_fingerprint", "_name", "_amount", "_date"])
+            matched = match_statement(df_old, rev_to_sys, sys_names)
+            entries += [(fingerprint, "rematch", hit)
+                        for fingerprint, hit in zip(df_old["_fingerprint"], matched)
+                        if hit[0] is not None]
+        total = 0
+        for statement, df in statements.items():
+            total += len(df)
+            matched = match_statement(df, rev_to_sys, sys_names)
+            for fingerprint, date, rev_name, amount, (system_name, score) in zip(
+                    df["_fingerprint"], df["_date"], df["_name"], df["_amount"], matched):
+                if fingerprint in existing:
+                    continue
+                existing.add(fingerprint)
+                entries.append((fingerprint, "new", {
+                    "fingerprint": fingerprint,
+                    "date": date if isinstance(date, str) else None,
+                    "revolut_name": rev_name,
+                    "amount": float(amount),
+                    "system_name": system_name,
+                    # None: mentett párosítás vagy párosítatlan; szám: hasonlóság alapján párosítva
+                    "match_score": score,
+                    "statement": statement,
+                    "imported_at": firestore.SERVER_TIMESTAMP,
+                }))
+        added = rematched = 0
+        for i in range(0, len(entries), LEDGER_TX_ENTRIES):
+            created, rematched_chunk = _commit_ledger_chunk(fs_db, coll, entries[i:i + LEDGER_TX_ENTRIES])
+            added += created
+            rematched += rematched_chunk
+        return True, (f"{added} új tétel mentve a naplóba ({total - added} már szerepelt), "
+                      f"{rematched} korábbi tétel újrapárosítva.")
+    except Exception as e:
+        return False, f"Naplózási hiba: {e}"
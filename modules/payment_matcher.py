@@ -0,0 +1,150 @@
+# Revolut befizetések párosítása a rendszerbeli nevekkel.
+# A neveket egyszer normalizáljuk (ékezet nélkül, kisbetűvel, rendezett tokenekkel),
+# a kivonatból hash-indexet (normalizált név → tételek) és token → nevek fordított
+# indexet építünk; a tagonkénti keresés így nem járja be újra a teljes kivonatot.
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from modules.config import TOLERANCE
+
+FUZZY_MIN_SCORE = 0.6       # ennél gyengébb hasonlóság nem számít találatnak
+FUZZY_MIN_MARGIN = 0.1      # több jelöltnél ennyivel kell jobbnak lennie a legjobbnak
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def fold_name(name):
+    """Ékezetek és írásjelek nélküli, kisbetűs tokenlista ('Szabó-Áron' → ['szabo', 'aron'])."""
+    decomposed = unicodedata.normalize("NFKD", str(name or ""))
+    ascii_only = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+    return [t for t in _NON_ALNUM.split(ascii_only) if t]
+
+
+def name_key(name):
+    """Sorrendfüggetlen összehasonlító kulcs: 'Áron Szabó' és 'SZABO ARON' kulcsa azonos."""
+    return " ".join(sorted(fold_name(name)))
+
+
+class PaymentMatcher:
+    """Egy kivonat (DataFrame: _name, _amount) és a mentett párosítások ({revolut név: rendszer név}) indexe.
+
+    Egyezés sorrendje tagonként:
+      1. mentett párosítás: a párosított Revolut név normalizált kulcsa a kivonatban;
+      2. hasonlóság: a tag nevével közös tokent tartalmazó kivonat-nevek közül a
+         legjobb SequenceMatcher-pontszámú, ha eléri a FUZZY_MIN_SCORE-t (egyetlen jelöltnél
+         is), és több jelöltnél FUZZY_MIN_MARGIN-nel jobb a másodiknál.
+    A más taghoz párosított Revolut nevek a 2. lépésben nem jelöltek, és egy kivonat-név
+    legfeljebb egy taghoz kerülhet (lásd assignments)."""
+
+    def __init__(self, df_revolut, rev_to_sys):
+        self._names = defaultdict(list)         # kulcs → eredeti Revolut nevek (első előfordulás sorrendjében)
+        self._amounts = defaultdict(float)      # kulcs → befizetések összege
+        self._tokens = defaultdict(set)         # token → kulcsok
+        for rev_name, amount in zip(df_revolut["_name"], df_revolut["_amount"]):
+            key = name_key(rev_name)
+            if not key:
+                continue
+            if rev_name not in self._names[key]:
+                self._names[key].append(rev_name)
+            self._amounts[key] += float(amount)
+            for token in key.split():
+                self._tokens[token].add(key)
+
+        self._mapped = {}                       # rendszer név → párosított kulcs (az első párosítás számít)
+        self._mapped_keys = set()
+        for rev_name, sys_name in rev_to_sys.items():
+            key = name_key(rev_name)
+            self._mapped.setdefault(sys_name, key)
+            self._mapped_keys.add(key)
+
+    def _fuzzy(self, sys_name):
+        """(kulcs, pontszám) a legjobb elfogadható jelöltre, különben None."""
+        sys_key = name_key(sys_name)
+        candidates = set()
+        for token in sys_key.split():
+            candidates |= self._tokens.get(token, set())
+        candidates -= self._mapped_keys
+        if not candidates:
+            return None
+        scored = sorted(((SequenceMatcher(None, sys_key, key).ratio(), key) for key in candidates), reverse=True)
+        best, best_key = scored[0]
+        if best < FUZZY_MIN_SCORE:
+            return None
+        if len(scored) > 1 and best - scored[1][0] < FUZZY_MIN_MARGIN:
+            return None
+        return best_key, best
+
+    def assignments(self, sys_names):
+        """Kivonat-kulcs → (rendszer név, pontszám); mentett párosításnál a pontszám None.
+
+        Előbb minden mentett párosítás, utána a megadott nevek hasonlóság szerinti egyezései.
+        Ha több név ugyanazt a kulcsot választaná, a legjobb pontszámú kapja, de csak
+        FUZZY_MIN_MARGIN előnnyel; különben a kulcs párosítatlan marad (kézi párosításra)."""
+        assigned = {key: (sys_name, None) for sys_name, key in self._mapped.items() if key in self._amounts}
+        taken = {sys_name for sys_name, _ in assigned.values()}
+        claims = defaultdict(list)              # kulcs → [(pontszám, rendszer név)]
+        for sys_name in sys_names:
+            if sys_name in taken:
+                continue
+            hit = self._fuzzy(sys_name)
+            if hit is not None and hit[0] not in assigned:
+                claims[hit[0]].append((hit[1], sys_name))
+                taken.add(sys_name)
+        for key, scored in claims.items():
+            scored.sort(reverse=True)
+            if len(scored) == 1 or scored[0][0] - scored[1][0] >= FUZZY_MIN_MARGIN:
+                assigned[key] = (scored[0][1], scored[0][0])
+        return assigned
+
+    def assign(self, sys_names):
+        """Kivonat-kulcs → rendszer név (lásd assignments)."""
+        return {key: sys_name for key, (sys_name, _) in self.assignments(sys_names).items()}
+
+    def match_for(self, key):
+        """(első Revolut írásmód, befizetett összeg) egy kivonat-kulcsra."""
+        return self._names[key][0], self._amounts[key]
+
+    def spellings(self, rev_name):
+        """A Revolut név összes, a kivonatban előforduló írásmódja (azonos normalizált kulccsal)."""
+        return self._names.get(name_key(rev_name), [])
+
+
+def reconcile_payments(df_osszesito, df_revolut, rev_to_sys):
+    """Az elszámolás tagjainak (vendégek nélkül) egyeztetése a kivonattal.
+
+    Visszatérés: (eredménysorok a befizetés-ellenőrző táblához, párosított Revolut nevek halmaza)."""
+    matcher = PaymentMatcher(df_revolut, rev_to_sys)
+    main_members = df_osszesito[~df_osszesito["Név"].str.contains(" - ", na=False)]
+    # kizárólagos hozzárendelés: egy átutalást legfeljebb egy tag "fizethet ki"
+    key_of = {sys_name: key for key, sys_name in matcher.assign(main_members["Név"]).items()}
+
+    results = []
+    matched_revolut_names = set()
+    for sys_name, expected in zip(main_members["Név"], main_members["Fizetendő (Ft)"].astype(float)):
+        matched_rev_name, paid_amount = None, None
+        if sys_name in key_of:
+            matched_rev_name, paid_amount = matcher.match_for(key_of[sys_name])
+        if matched_rev_name is not None:
+            matched_revolut_names.update(matcher.spellings(matched_rev_name))
+            diff = paid_amount - expected
+            if abs(diff) <= TOLERANCE:
+                status = "✅ Fizetett"
+            elif diff > TOLERANCE:
+                status = "✅ Fizetett (többet)"
+            else:
+                status = "⚠️ Kevesebbet fizetett"
+        else:
+            status = "❌ Nem fizetett"
+            diff = -expected
+
+        results.append({
+            "Név": sys_name,
+            "Fizetendő (Ft)": f"{expected:.0f} Ft",
+            "Revolut név": matched_rev_name or "— ismeretlen",
+            "Befizetett (Ft)": f"{paid_amount:.0f} Ft" if paid_amount else "—",
+            "Különbség": f"{diff:+.0f} Ft" if paid_amount else "—",
+            "Státusz": status,
+        })
+    return results, matched_revolut_names
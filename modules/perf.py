@@ -0,0 +1,54 @@
+# Renderelési idő mérése (munkamenetenként, a session_state-ben gyűjtve).
+import functools
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+
+@contextmanager
+def timed(label, show=True):
+    """A blokk falióra-idejét rögzíti `label` alatt, és (show=True) kis feliratként ki is írja.
+
+    Kivételnél (pl. st.rerun) nem rögzít és nem ír ki semmit."""
+    t0 = time.perf_counter()
+    yield
+    ms = (time.perf_counter() - t0) * 1000
+    record_timing(label, ms)
+    if show:
+        st.caption(f"⏱️ {label}: {ms:.0f} ms")
+
+
+def record_timing(label, ms):
+    """Egy mért időtartam hozzáadása a munkamenet statisztikájához."""
+    stats = st.session_state.setdefault("perf_timings", {})
+    entry = stats.setdefault(label, {"runs": 0, "last_ms": 0.0, "total_ms": 0.0})
+    entry["runs"] += 1
+    entry["last_ms"] = ms
+    entry["total_ms"] += ms
+
+
+def timed_render(label):
+    """Dekorátor: a függvény (pl. egy fragment) minden futását méri a timed() segítségével."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_timings():
+    """{címke: {"runs", "last_ms", "total_ms"}} az aktuális munkamenetre."""
+    return dict(st.session_state.get("perf_timings", {}))
+
+
+def record_spans(group, spans):
+    """Egy párhuzamos betöltés hívásainak idősávjai: [{"label", "start_ms", "end_ms", "status"}]."""
+    st.session_state.setdefault("perf_spans", {})[group] = spans
+
+
+def get_spans():
+    """{csoport: [idősáv]} — az utolsó párhuzamos betöltések csoportonként."""
+    return dict(st.session_state.get("perf_spans", {}))
@@ -0,0 +1,180 @@
+# Játékosonkénti folyószámla (player_balances/{név}): terhelések az elmentett
+# elszámolásokból, jóváírások a befizetési napló párosított tételeiből.
+# Íráskor karbantartott (elszámolás mentése, kivonat-import), havi bontással
+# (months.{ÉÉÉÉ-HH}: charged / paid), így az egyenleg egy dokumentum olvasása,
+# a tartozás-tábla pedig egyetlen kollekció-lekérdezés.
+import io
+import threading
+
+import pandas as pd
+import streamlit as st
+from google.cloud import firestore
+
+from modules.batch_writes import commit_in_chunks
+from modules.config import FIRESTORE_PAYMENT_LEDGER, FIRESTORE_PLAYER_BALANCES, FIRESTORE_SETTLEMENTS
+
+META_DOC = "_meta"
+
+
+def balance_doc_id(name):
+    # a "/" útvonal-elválasztó a Firestore dokumentum-azonosítóban
+    return str(name).replace("/", "_")
+
+
+def month_key(year, month_num):
+    return f"{int(year)}-{int(month_num):02d}"
+
+
+def settlement_charges(df_osszesito):
+    """{név: fizetendő} egy elszámolás összesítőjéből (vendégsorok nélkül; a vendég díja a gazdáé)."""
+    if df_osszesito is None or df_osszesito.empty or "Név" not in df_osszesito.columns:
+        return {}
+    df = df_osszesito[~df_osszesito["Név"].str.contains(" - ", na=False)]
+    return df.groupby("Név")["Fizetendő (Ft)"].sum().astype(float).to_dict()
+
+
+def stored_settlement_charges(d):
+    """settlement_charges egy elmentett settlements dokumentum (dict) alapján; hibás/üres dokumentumnál {}."""
+    try:
+        return settlement_charges(pd.read_json(io.StringIO(d["df_osszesito"]), orient="records"))
+    except Exception:
+        return {}
+
+
+def charge_deltas(month, old_charges, new_charges):
+    """{(név, hónap): (terhelés változás, 0)} egy hónap elszámolásának felülírásakor."""
+    deltas = {}
+    for name in set(old_charges) | set(new_charges):
+        delta = new_charges.get(name, 0.0) - old_charges.get(name, 0.0)
+        if delta:
+            deltas[(name, month)] = (delta, 0.0)
+    return deltas
+
+
+def payment_deltas(payments):
+    """{(név, hónap): (0, befizetés)} a [(rendszer név, 'ÉÉÉÉ-HH-NN' vagy None, összeg)] tételekből."""
+    deltas = {}
+    for name, date, amount in payments:
+        if not name:
+            continue
+        key = (name, str(date)[:7] if date else "ismeretlen")
+        charged, paid = deltas.get(key, (0.0, 0.0))
+        deltas[key] = (charged, paid + float(amount))
+    return deltas
+
+
+def balance_ops(fs_db, deltas):
+    """Növelő műveletek (commit_in_chunks "merge" formátumban) a {(név, hónap): (terhelés, befizetés)} változásokra."""
+    coll = fs_db.collection(FIRESTORE_PLAYER_BALANCES)
+    per_player = {}
+    for (name, month), (charged, paid) in deltas.items():
+        per_player.setdefault(name, {})[month] = (charged, paid)
+    ops = []
+    for name, months in per_player.items():
+        charged = sum(c for c, _ in months.values())
+        paid = sum(p for _, p in months.values())
+        ops.append(("merge", coll.document(balance_doc_id(name)), {
+            "name": name,
+            "charged": firestore.Increment(charged),
+            "paid": firestore.Increment(paid),
+            "balance": firestore.Increment(paid - charged),
+            "months": {m: {"charged": firestore.Increment(c), "paid": firestore.Increment(p)}
+                       for m, (c, p) in months.items()},
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }))
+    return ops
+
+
+def rebuild_player_balances(fs_db):
+    """Újraépítő feladat: minden folyószámla újraszámolása az elszámolásokból és a naplóból. (ok, üzenet)"""
+    try:
+        deltas = {}
+        for doc in fs_db.collection(FIRESTORE_SETTLEMENTS).stream():
+            d = doc.to_dict()
+            month = month_key(d.get("year", 0), d.get("month_num", 0))
+            deltas.update(charge_deltas(month, {}, stored_settlement_charges(d)))
+        ledger = [doc.to_dict() for doc in fs_db.collection(FIRESTORE_PAYMENT_LEDGER).stream()]
+        for key, (_, paid) in payment_deltas(
+                (d.get("system_name"), d.get("date"), d.get("amount") or 0) for d in ledger).items():
+            charged, _ = deltas.get(key, (0.0, 0.0))
+            deltas[key] = (charged, paid)
+
+        docs = {}
+        for (name, month), (charged, paid) in deltas.items():
+            data = docs.setdefault(name, {"name": name, "charged": 0.0, "paid": 0.0, "months": {}})
+            data["charged"] += charged
+            data["paid"] += paid
+            data["months"][month] = {"charged": charged, "paid": paid}
+        coll = fs_db.collection(FIRESTORE_PLAYER_BALANCES)
+        ops = [("set", coll.document(balance_doc_id(name)), dict(data, balance=data["paid"] - data["charged"],
+                                                  updated_at=firestore.SERVER_TIMESTAMP))
+               for name, data in docs.items()]
+        ops += [("delete", doc.reference, None) for doc in coll.stream()
+                if doc.id != META_DOC and doc.id not in {balance_doc_id(n) for n in docs}]
+        ops.append(("set", coll.document(META_DOC), {"rebuilt_at": firestore.SERVER_TIMESTAMP}))
+        commit_in_chunks(fs_db, ops)
+        _ready.add(id(fs_db))
+        return True, f"{len(docs)} játékos folyószámlája újraépítve."
+    except Exception as e:
+        return False, f"Folyószámla-újraépítési hiba: {e}"
+
+
+_ready = set()
+_ready_lock = threading.Lock()
+
+
+def ensure_player_balances(fs_db):
+    """Első használatkor (ha még nincs _meta dokumentum) egyszer felépíti a folyószámlákat."""
+    key = id(fs_db)
+    if fs_db is None or key in _ready:
+        return
+    with _ready_lock:
+        if key in _ready:
+            return
+        if not fs_db.collection(FIRESTORE_PLAYER_BALANCES).document(META_DOC).get().exists:
+            rebuild_player_balances(fs_db)
+        _ready.add(key)
+
+
+def balance_history(doc):
+    """Havi pillanatképek egy folyószámla-dokumentumból: DataFrame[Hónap, Terhelés, Befizetés, Záró egyenleg]."""
+    months = (doc or {}).get("months") or {}
+    rows = [{"Hónap": m, "Terhelés (Ft)": float(v.get("charged") or 0), "Befizetés (Ft)": float(v.get("paid") or 0)}
+            for m, v in sorted(months.items())]
+    df = pd.DataFrame(rows, columns=["Hónap", "Terhelés (Ft)", "Befizetés (Ft)"])
+    df["Záró egyenleg (Ft)"] = (df["Befizetés (Ft)"] - df["Terhelés (Ft)"]).cumsum()
+    return df
+
+
+@st.cache_data(ttl=300)
+def get_player_balance_fs(_db, name):
+    """Egy játékos folyószámlája (dict: charged, paid, balance, months), vagy None."""
+    if _db is None or not name:
+        return None
+    try:
+        ensure_player_balances(_db)
+        snap = _db.collection(FIRESTORE_PLAYER_BALANCES).document(balance_doc_id(name)).get()
+        return snap.to_dict() if snap.exists else None
+    except Exception as e:
+        print(f"get_player_balance_fs hiba: {e}")
+        return None
+
+
+@st.cache_data(ttl=300)
+def get_player_balances_fs(_db):
+    """Az összes folyószámla: DataFrame[Név, Terhelés (Ft), Befizetés (Ft), Egyenleg (Ft)], a legnagyobb tartozással kezdve."""
+    columns = ["Név", "Terhelés (Ft)", "Befizetés (Ft)", "Egyenleg (Ft)"]
+    if _db is None:
+        return pd.DataFrame(columns=columns)
+    try:
+        ensure_player_balances(_db)
+        rows = [
+            (d.get("name", doc.id), float(d.get("charged") or 0), float(d.get("paid") or 0), float(d.get("balance") or 0))
+            for doc in _db.collection(FIRESTORE_PLAYER_BALANCES).stream() if doc.id != META_DOC
+            for d in (doc.to_dict(),)
+        ]
+    except Exception as e:
+        st.error(f"Hiba a folyószámlák betöltésekor: {e}")
+        rows = []
+    df = pd.DataFrame(rows, columns=columns)
+    return df.sort_values(["Egyenleg (Ft)", "Név"]).reset_index(drop=True)
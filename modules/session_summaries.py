@@ -0,0 +1,264 @@
+# Alkalmankénti összesítők (session_summaries) karbantartása és olvasása.
+# Dátumonként egy dokumentum (azonosító: ÉÉÉÉ-HH-NN): névenkénti yes/no
+# számlálók, élő/legacy rekordszám és az elmaradás jelzője. Minden jelenlét-író
+# útvonal (admin mentés, QR check-in és visszavonás, szinkron, szerkesztők,
+# checkin.html) a rekord megírása UTÁN, olvasás nélküli mezőtranszformációkkal
+# (Increment) frissíti, így az edzés előtti roham nem ütközik egy forró
+# dokumentum tranzakcióján, és a check-in sosem függ az összesítő írásától.
+# A származtatott mezőket (névsor, létszám, vendégszám) az olvasó számolja
+# (finalize_summary) — a kliens oldali checkin.html csak számlálót növel.
+# A check-in útvonal is használja: pandas/gspread itt sem importálható modulszinten.
+import threading
+from datetime import datetime
+
+import streamlit as st
+from google.cloud import firestore
+
+from modules.batch_writes import commit_in_chunks
+from modules.config import FIRESTORE_COLLECTION, FIRESTORE_CANCELLED, FIRESTORE_SESSION_SUMMARIES
+from modules.logger import log_event
+
+GUEST_SEPARATOR = " - "
+META_DOC = "_meta"
+
+
+def summary_date(value):
+    """Dátum-szöveg → 'ÉÉÉÉ-HH-NN' (a parse_date_str szabályai szerint), vagy None."""
+    if value is None:
+        return None
+    clean_str = str(value).strip()
+    if clean_str.lower() in ("nan", "none", ""):
+        return None
+    if clean_str.endswith("."):
+        clean_str = clean_str[:-1]
+    clean_str = clean_str.replace(". ", "-").replace(".", "-")
+    for candidate, fmt in ((clean_str.split(" ")[0], "%Y-%m-%d"), (clean_str, "%Y-%m-%d %H:%M:%S")):
+        try:
+            return datetime.strptime(candidate, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def record_contribution(d):
+    """Egy jelenléti rekord hatása az összesítőre: (dátum, név, státusz, legacy-e), vagy None.
+
+    Nem számít: névtelen, nem Yes/No státuszú, teszt módú vagy dátum nélküli rekord.
+    A dátum az alkalom dátuma, ennek hiányában a regisztrációé."""
+    name = str(d.get("name") or "").strip()
+    status = str(d.get("status") or "").strip()
+    mode = str(d.get("mode") or "valós").strip().lower()
+    if not name or status not in ("Yes", "No") or mode == "teszt":
+        return None
+    date = summary_date(d.get("event_date")) or summary_date(d.get("timestamp"))
+    if date is None:
+        return None
+    return date, name, status, mode == "legacy"
+
+
+def _empty_summary(date):
+    return {"date": date, "yes": {}, "no": {}, "live_records": 0, "legacy_records": 0, "cancelled": False}
+
+
+def finalize_summary(data):
+    """Tárolt összesítő → olvasói nézet: a yes/no számlálókból számolt névsorral, létszámmal, vendégszámmal.
+
+    Egy név akkor résztvevő, ha van rá pozitív "Yes" és nincs pozitív "No" számlálója
+    (a transzformációs írások miatt a 0-ra csökkent bejegyzések a dokumentumban maradnak)."""
+    data = dict(_empty_summary((data or {}).get("date")), **(data or {}))
+    yes, no = data["yes"] or {}, data["no"] or {}
+    attendees = sorted(n for n, c in yes.items() if (c or 0) > 0 and not (no.get(n) or 0) > 0)
+    data["attendees"] = attendees
+    data["count"] = len(attendees)
+    data["guest_count"] = sum(1 for n in attendees if GUEST_SEPARATOR in n)
+    data["live_records"] = max(0, int(data.get("live_records") or 0))
+    data["legacy_records"] = max(0, int(data.get("legacy_records") or 0))
+    return data
+
+
+def _tally(items):
+    """[(név, státusz, legacy-e, ±1)] → (yes, no, élő, legacy) nettó változások."""
+    yes, no, live, legacy = {}, {}, 0, 0
+    for name, status, is_legacy, sign in items:
+        counts = yes if status == "Yes" else no
+        counts[name] = counts.get(name, 0) + sign
+        if is_legacy:
+            legacy += sign
+        else:
+            live += sign
+    return yes, no, live, legacy
+
+
+def _group_deltas(added, removed):
+    groups = {}
+    for records, sign in ((added, 1), (removed, -1)):
+        for d in records:
+            contribution = record_contribution(d)
+            if contribution:
+                date, name, status, is_legacy = contribution
+                groups.setdefault(date, []).append((name, status, is_legacy, sign))
+    return groups
+
+
+def summary_ops(fs_db, added=(), removed=()):
+    """Az érintett összesítők frissítése olvasás nélküli műveletekként (commit_in_chunks formátumban).
+
+    Dátumonként egy "merge" írás, a számlálókon Increment transzformációval; egymással
+    és a rekordírásokkal sem ütköznek, ezért tranzakció nélkül, egyszerre sok íróval is biztonságosak."""
+    coll = fs_db.collection(FIRESTORE_SESSION_SUMMARIES)
+    ops = []
+    for date, items in _group_deltas(added, removed).items():
+        yes, no, live, legacy = _tally(items)
+        data = {"date": date, "updated_at": firestore.SERVER_TIMESTAMP}
+        for field, counts in (("yes", yes), ("no", no)):
+            changed = {name: firestore.Increment(delta) for name, delta in counts.items() if delta}
+            if changed:
+                data[field] = changed
+        for field, delta in (("live_records", live), ("legacy_records", legacy)):
+            if delta:
+                data[field] = firestore.Increment(delta)
+        ops.append(("merge", coll.document(date), data))
+    return ops
+
+
+def _mark_stale(fs_db, reason, error):
+    """Az összesítők eltérhetnek a rekordoktól: app_logs bejegyzés, jelző a _meta
+    dokumentumon (a következő újraépítés törli) és figyelmeztetés a felületen."""
+    log_event(fs_db, "ERROR", "Alkalom-összesítő frissítése elmaradt", {"reason": reason, "error": str(error)})
+    try:
+        fs_db.collection(FIRESTORE_SESSION_SUMMARIES).document(META_DOC).set(
+            {"stale": True, "stale_reason": reason, "stale_at": firestore.SERVER_TIMESTAMP}, merge=True
+        )
+    except Exception as e:
+        print(f"Összesítő eltérés-jelző írási hiba: {e}")
+    st.warning("⚠️ Az alkalom-összesítők frissítése nem sikerült, a létszámok eltérhetnek. "
+               "Egy adminnak le kell futtatnia az újraépítést (Diagnosztika → Összesítők újraépítése).")
+
+
+def apply_summary_deltas(fs_db, added=(), removed=(), ops=(), on_progress=None):
+    """A jelenléti írások (ops, commit_in_chunks formátumban), majd az érintett összesítők frissítése.
+
+    added / removed: a beírt, illetve törölt rekordok dict-jei (módosításnál a régi
+    változat a removed-ben, az új az added-ben). A rekordok önállóan, elsőként
+    íródnak; az összesítők csak utána, Increment transzformációkkal. Ha a rekordírás
+    egy már részben commitolt köteg után szakad meg, vagy az összesítő-írás hibára fut,
+    az összesítők eltérés-jelzőt kapnak (_mark_stale), és a Diagnosztika oldali
+    újraépítés állítja helyre őket; a rekordírás hibája továbbdobódik. Visszatérés: a commitok száma."""
+    ops = list(ops)
+    done = [0]
+
+    def _progress(n, total):
+        done[0] = n
+        if on_progress:
+            on_progress(n, total)
+
+    try:
+        commits = commit_in_chunks(fs_db, ops, on_progress=_progress) if ops else 0
+    except Exception as e:
+        if done[0]:
+            # a már commitolt kötegek összesítő-változása nem választható le a többiről
+            _mark_stale(fs_db, f"Részben mentett jelenléti írás ({done[0]}/{len(ops)} művelet)", e)
+        raise
+    deltas = summary_ops(fs_db, added, removed)
+    if deltas:
+        try:
+            commits += commit_in_chunks(fs_db, deltas)
+        except Exception as e:
+            _mark_stale(fs_db, "Az összesítő-írás hibára futott (a rekordok mentve)", e)
+    return commits
+
+
+def get_summaries_stale_fs(fs_db):
+    """Az összesítők eltérés-jelzője ({"stale_reason", "stale_at"}), vagy None, ha nincs jelezve."""
+    if fs_db is None:
+        return None
+    try:
+        snap = fs_db.collection(FIRESTORE_SESSION_SUMMARIES).document(META_DOC).get()
+    except Exception as e:
+        print(f"Összesítő eltérés-jelző olvasási hiba: {e}")
+        return None
+    meta = snap.to_dict() if snap.exists else None
+    return meta if meta and meta.get("stale") else None
+
+
+def set_session_cancelled(fs_db, date, cancelled=True):
+    """Az összesítő elmaradás-jelzőjének beállítása (a cancelled_sessions írásával együtt hívandó)."""
+    date = summary_date(date)
+    if date:
+        fs_db.collection(FIRESTORE_SESSION_SUMMARIES).document(date).set(
+            {"date": date, "cancelled": bool(cancelled), "updated_at": firestore.SERVER_TIMESTAMP}, merge=True
+        )
+
+
+def rebuild_session_summaries(fs_db):
+    """Újraépítő feladat: az összes összesítő újraszámolása a jelenléti rekordokból. (ok, üzenet)"""
+    try:
+        groups = _group_deltas((doc.to_dict() for doc in fs_db.collection(FIRESTORE_COLLECTION).stream()), ())
+        cancelled = {summary_date(doc.to_dict().get("date")) for doc in fs_db.collection(FIRESTORE_CANCELLED).stream()}
+        coll = fs_db.collection(FIRESTORE_SESSION_SUMMARIES)
+        summaries = {}
+        for date, items in groups.items():
+            yes, no, live, legacy = _tally(items)
+            summaries[date] = dict(_empty_summary(date), yes={n: c for n, c in yes.items() if c},
+                                   no={n: c for n, c in no.items() if c}, live_records=live, legacy_records=legacy)
+        for date in cancelled - {None}:
+            summaries.setdefault(date, _empty_summary(date))["cancelled"] = True
+        for data in summaries.values():
+            data["updated_at"] = firestore.SERVER_TIMESTAMP
+        ops = [("set", coll.document(date), data) for date, data in summaries.items()]
+        ops += [("delete", doc.reference, None) for doc in coll.stream()
+                if doc.id != META_DOC and doc.id not in summaries]
+        ops.append(("set", coll.document(META_DOC), {
+            "rebuilt_at": firestore.SERVER_TIMESTAMP, "sessions": len(summaries),
+        }))
+        commit_in_chunks(fs_db, ops)
+        _ready.add(id(fs_db))
+        return True, f"{len(summaries)} alkalom-összesítő újraépítve."
+    except Exception as e:
+        return False, f"Összesítő-újraépítési hiba: {e}"
+
+
+_ready = set()
+_ready_lock = threading.Lock()
+
+
+def ensure_session_summaries(fs_db):
+    """Első használatkor (ha még nincs _meta dokumentum) egyszer felépíti az összesítőket."""
+    key = id(fs_db)
+    if fs_db is None or key in _ready:
+        return
+    with _ready_lock:
+        if key in _ready:
+            return
+        if not fs_db.collection(FIRESTORE_SESSION_SUMMARIES).document(META_DOC).get().exists:
+            rebuild_session_summaries(fs_db)
+        _ready.add(key)
+
+
+@st.cache_data(ttl=60)
+def get_session_summary_fs(_db, date):
+    """Egy alkalom összesítője (finalize_summary nézet), vagy None, ha arra a napra nincs rekord."""
+    if _db is None:
+        return None
+    try:
+        ensure_session_summaries(_db)
+        snap = _db.collection(FIRESTORE_SESSION_SUMMARIES).document(date).get()
+        return finalize_summary(snap.to_dict()) if snap.exists else None
+    except Exception as e:
+        st.error(f"Hiba az alkalom-összesítő betöltésekor: {e}")
+        return None
+
+
+@st.cache_data(ttl=60)
+def get_session_summaries_fs(_db, start, end):
+    """{dátum: összesítő} a [start, end] ('ÉÉÉÉ-HH-NN') tartományra."""
+    if _db is None:
+        return {}
+    try:
+        ensure_session_summaries(_db)
+        docs = (_db.collection(FIRESTORE_SESSION_SUMMARIES)
+                .where("date", ">=", start).where("date", "<=", end).stream())
+        return {doc.id: finalize_summary(doc.to_dict()) for doc in docs}
+    except Exception as e:
+        st.error(f"Hiba az alkalom-összesítők betöltésekor: {e}")
+        return {}
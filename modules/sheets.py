@@ -0,0 +1,271 @@
+import streamlit as st
+import hashlib
+import threading
+from collections import Counter
+
+from modules.config import GSHEET_NAME, SHEET_TAIL_COLUMNS, SHEET_SAMPLE_ROWS
+
+
+def _is_stale_handle_error(e):
+    """Igaz, ha a hiba elavult táblázat/munkalap-handle-re utal (törölt, átnevezett lap stb.)."""
+    import gspread  # lazy: ide csak élő GSheet klienssel jutunk, addigra már betöltődött
+    if isinstance(e, (gspread.exceptions.WorksheetNotFound, gspread.exceptions.SpreadsheetNotFound)):
+        return True
+    if isinstance(e, gspread.exceptions.APIError):
+        return getattr(e, "code", None) in (400, 404)
+    return False
+
+
+class WorksheetRegistry:
+    """A táblázatot egyszer nyitja meg, a munkalap-handle-öket cím szerint cache-eli.
+
+    Így egy logikai művelet (olvasás, append, írás) csak a saját adathívásába kerül:
+    nincs minden alkalommal open() + worksheets() metaadat-lekérés. Hiányzó munkalapot
+    igény szerint létrehoz; hibánál eldobja a cache-t, és elavult handle esetén egyszer
+    újrapróbálja a műveletet."""
+
+    def __init__(self, gs_client, spreadsheet_name=GSHEET_NAME):
+        self.gs_client = gs_client
+        self.spreadsheet_name = spreadsheet_name
+        self.counters = Counter()
+        self._lock = threading.RLock()
+        self._spreadsheet = None
+        self._worksheets = None  # cím → Worksheet, a táblázatbeli sorrendben
+
+    def attach(self, gs_client):
+        """Új kliens (pl. lejárt cache_resource után) esetén a cache-t is eldobja."""
+        with self._lock:
+            if gs_client is not self.gs_client:
+                self.gs_client = gs_client
+                self._spreadsheet = None
+                self._worksheets = None
+
+    def refresh(self):
+        with self._lock:
+            self.counters["refresh"] += 1
+            self._spreadsheet = None
+            self._worksheets = None
+
+    def spreadsheet(self):
+        with self._lock:
+            if self._spreadsheet is None:
+                self.counters["open"] += 1
+                self._spreadsheet = self.gs_client.open(self.spreadsheet_name)
+            return self._spreadsheet
+
+    def _worksheet_map(self):
+        with self._lock:
+            if self._worksheets is None:
+                ss = self.spreadsheet()
+                self.counters["metadata"] += 1
+                self._worksheets = {ws.title: ws for ws in ss.worksheets()}
+            else:
+                self.counters["cache_hit"] += 1
+            return self._worksheets
+
+    def worksheet(self, title=None, aliases=(), create=None):
+        """Cím szerinti munkalap (title=None → az első, vagyis a jelenléti lap).
+
+        aliases: alternatív címek (pl. kis/nagybetűs változat).
+        create: {"rows": int, "cols": int, "header": [...]} — ha a lap hiányzik, létrehozza;
+                nélküle a hiányzó lap WorksheetNotFound hibát dob."""
+        with self._lock:
+            sheets = self._worksheet_map()
+            if title is None:
+                return next(iter(sheets.values()))
+            for t in (title, *aliases):
+                if t in sheets:
+                    return sheets[t]
+            if create is None:
+                import gspread
+                raise gspread.exceptions.WorksheetNotFound(title)
+            self.counters["create"] += 1
+            ws = self.spreadsheet().add_worksheet(title=title, rows=create.get("rows", 100), cols=create.get("cols", 5))
+            if create.get("header"):
+                ws.append_row(create["header"])
+            sheets[title] = ws
+            return ws
+
+    def call(self, fn, title=None, aliases=(), create=None):
+        """fn(worksheet) futtatása a cache-elt handle-lel; elavult handle esetén frissít és egyszer újrapróbál."""
+        try:
+            self.counters["data"] += 1
+            return fn(self.worksheet(title, aliases, create))
+        except Exception as e:
+            self.counters["error"] += 1
+            self.refresh()
+            if not _is_stale_handle_error(e):
+                raise
+            self.counters["data"] += 1
+            return fn(self.worksheet(title, aliases, create))
+
+
+def _normalize_row(row, width):
+    """Összehasonlításhoz: a width oszlopra vágott sor, záró üres cellák nélkül
+    (a values_batch_get ezeket nem adja vissza, a get_all_values viszont kitölti)."""
+    row = [str(c) for c in row[:width]]
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def _rows_checksum(rows, width):
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(repr(_normalize_row(row, width)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class IncrementalSheetReader:
+    """A (gyakorlatban csak bővülő) munkalap inkrementális olvasója.
+
+    Megjegyzi a már beolvasott sorokat, és a következő olvasáskor egyetlen
+    values_batch_get hívással csak az új sorokat (A{n}:F) kéri le, mellette
+    néhány mintasort (fejléc, utolsó ismert sor, SHEET_SAMPLE_ROWS körönként
+    eltolt pozíció). Ha a minták checksumja eltér a tárolttól (törlés,
+    átírás, rendezés), teljes újraolvasás következik."""
+
+    def __init__(self, registry, title=None, last_column=SHEET_TAIL_COLUMNS, sample_rows=SHEET_SAMPLE_ROWS):
+        self.registry = registry
+        self.title = title
+        self.last_column = last_column
+        self.width = ord(last_column.upper()) - ord("A") + 1
+        self.sample_rows = sample_rows
+        self._rows = None
+        self._round = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._rows = None
+
+    def _sample_positions(self, n):
+        """1-alapú sorszámok: fejléc + körönként eltolt, egyenletesen elosztott minták (n alatt)."""
+        if n <= 2:
+            return [1] if n >= 1 else []
+        step = max(1, (n - 2) // self.sample_rows)
+        offset = self._round % step
+        self._round += 1
+        return sorted({1, *range(2 + offset, n, step)})
+
+    def _full_read(self, ws):
+        self.registry.counters["full_read"] += 1
+        self._rows = ws.get_all_values()
+
+    def _tail_read(self, ws):
+        import gspread  # lazy: csak élő GSheet klienssel jutunk ide
+        rows = self._rows
+        n = len(rows)
+        positions = self._sample_positions(n)
+        ranges = [gspread.utils.absolute_range_name(ws.title, f"A{i}:{self.last_column}{i}") for i in positions]
+        # az utolsó ismert sortól olvasunk: az első visszakapott sor egyben ellenőrző minta is
+        ranges.append(gspread.utils.absolute_range_name(ws.title, f"A{n}:{self.last_column}"))
+        self.registry.counters["tail_read"] += 1
+        value_ranges = self.registry.spreadsheet().values_batch_get(ranges).get("valueRanges", [])
+        fetched = [vr.get("values", []) for vr in value_ranges]
+        samples = [vals[0] if vals else [] for vals in fetched[:-1]]
+        tail = fetched[-1] if fetched else []
+
+        expected = [rows[i - 1] for i in positions] + [rows[-1]]
+        actual = samples + [tail[0] if tail else []]
+        if _rows_checksum(expected, self.width) != _rows_checksum(actual, self.width):
+            self.registry.counters["checksum_mismatch"] += 1
+            self._full_read(ws)
+            return
+        row_width = max(self.width, len(rows[0]))
+        for row in tail[1:]:
+            rows.append(list(row) + [""] * (row_width - len(row)))
+
+    def read(self):
+        """Az összes sor (get_all_values-szal azonos alakban); a visszaadott lista másolat."""
+        def _read(ws):
+            if not self._rows:
+                self._full_read(ws)
+            else:
+                self._tail_read(ws)
+        with self._lock:
+            try:
+                self.registry.call(_read, title=self.title)
+            except Exception:
+                self._rows = None
+                raise
+            return [list(r) for r in self._rows]
+
+
+def _changed_row_blocks(current, rows, width):
+    """A rows azon összefüggő blokkjai [(kezdő 0-alapú index, sorok)], amelyek eltérnek a current-től."""
+    blocks = []
+    for i, row in enumerate(rows):
+        old = current[i] if i < len(current) else []
+        if _normalize_row(row, width) == _normalize_row(old, width):
+            continue
+        padded = list(row) + [""] * (width - len(row))
+        if blocks and blocks[-1][0] + len(blocks[-1][1]) == i:
+            blocks[-1][1].append(padded)
+        else:
+            blocks.append((i, [padded]))
+    return blocks
+
+
+def write_table(gs_client, rows, title=None, aliases=(), create=None, value_input_option="RAW"):
+    """A munkalap tartalmát rows-ra cseréli törlés (clear) nélkül.
+
+    Egy olvasással összeveti a jelenlegi értékekkel, és csak az eltérő sorblokkokat
+    küldi el egyetlen values batch_update hívásban. Alapból RAW, vagyis a Sheets
+    nem értelmezi át az értékeket, és a visszaolvasott érték azonos a beírttal. A
+    dátumot tartalmazó táblákhoz (számlák, historikus import) USER_ENTERED kell,
+    különben a dátumok szövegként kerülnek a lapra, és a lap formázása, rendezése
+    megváltozik. Ilyenkor az átformázott cellák a következő íráskor is eltérőnek
+    számíthatnak, és újraíródnak. A lap méretét resize-zal igazítja a táblához,
+    így a felesleges sorok eltűnnek, és a lap egy pillanatra sem üres.
+    Visszatérés: a módosított sorok száma."""
+    import gspread  # lazy: csak élő GSheet klienssel jutunk ide
+    registry = get_sheet_registry(gs_client)
+
+    def _write(ws):
+        current = ws.get_all_values()
+        width = max([len(r) for r in rows] + [len(r) for r in current[:1]] + [1])
+        blocks = _changed_row_blocks(current, rows, width)
+        n_rows = max(len(rows), 1)
+        # a friss olvasás (current) a mérvadó: a cache-elt handle row_count-ja elavult lehet,
+        # ha a lap közben kézzel vagy más folyamatból bővült
+        if len(current) > len(rows) or ws.row_count != n_rows or ws.col_count < width:
+            ws.resize(rows=n_rows, cols=max(ws.col_count, width))
+        if blocks:
+            last_col = gspread.utils.rowcol_to_a1(1, width).rstrip("0123456789")
+            ws.batch_update([
+                {"range": f"A{start + 1}:{last_col}{start + len(block)}", "values": block}
+                for start, block in blocks
+            ], value_input_option=value_input_option)
+        return sum(len(block) for _, block in blocks)
+
+    return registry.call(_write, title=title, aliases=aliases, create=create)
+
+
+@st.cache_resource
+def _worksheet_registry():
+    return WorksheetRegistry(None)
+
+
+def get_sheet_registry(gs_client):
+    """Folyamatszintű munkalap-nyilvántartás az adott GSheet klienshez."""
+    registry = _worksheet_registry()
+    registry.attach(gs_client)
+    return registry
+
+
+@st.cache_resource
+def _attendance_reader():
+    return IncrementalSheetReader(None)
+
+
+def get_attendance_reader(gs_client):
+    """Folyamatszintű inkrementális olvasó a jelenléti (első) munkalaphoz."""
+    reader = _attendance_reader()
+    reader.registry = get_sheet_registry(gs_client)
+    return reader
+
+
+# A jelenléti lapot író folyamaton belüli útvonalak (QR háttér-worker, kézi szinkron) ezen
+# sorakoznak fel: az indexalapú sortörlés és a hozzáfűzés így nem fut egymásba.
+attendance_sheet_lock = threading.Lock()
@@ -0,0 +1,175 @@
+import streamlit as st
+import random
+import threading
+import time
+from datetime import datetime, timedelta, time as dt_time
+
+from modules.config import (
+    FIRESTORE_COLLECTION, HUNGARY_TZ, QR_SYNC_INTERVAL_SEC, QR_SYNC_BATCH_SIZE,
+    QR_SYNC_MAX_RETRIES, SESSION_END_TIME, QR_SYNC_AFTER_SESSION_MIN,
+)
+from modules.attendance_sync import sheet_row_key
+from modules.sheets import attendance_sheet_lock, get_attendance_reader, get_sheet_registry
+
+
+def _with_retry(fn, attempts=QR_SYNC_MAX_RETRIES, base_delay=2.0):
+    """Meghívja fn-t; hiba esetén exponenciálisan növekvő (+ véletlen) várakozással újrapróbálja."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(base_delay * (2 ** attempt) + random.uniform(0, 1))
+
+
+def _next_post_session_run(now):
+    """A következő keddi edzés vége + QR_SYNC_AFTER_SESSION_MIN időpontja (now utáni)."""
+    hour, minute = SESSION_END_TIME
+    tuesday = now.date() + timedelta(days=(1 - now.weekday()) % 7)
+    for day in (tuesday, tuesday + timedelta(weeks=1)):
+        # localize napról napra: a téli/nyári időszámítás váltását is helyesen kezeli
+        candidate = HUNGARY_TZ.localize(datetime.combine(day, dt_time(hour, minute)))
+        candidate += timedelta(minutes=QR_SYNC_AFTER_SESSION_MIN)
+        if candidate > now:
+            return candidate
+    return candidate
+
+
+class QrSyncWorker:
+    """Háttérszál, amely a QR check-in rekordokat (synced_to_sheet=False) átviszi a Google Sheetbe.
+
+    Periodikusan (QR_SYNC_INTERVAL_SEC) és minden keddi edzés vége után röviddel fut,
+    illetve trigger()-rel azonnal is indítható. Egy kör QR_SYNC_BATCH_SIZE rekordonként
+    dolgozik: egy append_rows a Sheetbe, majd egyetlen WriteBatch a flagek átállítására.
+    Az append idempotens: előtte a lapon már szereplő (tartalom-kulcs szerint egyező) sorok
+    kimaradnak, így egy időtúllépés utáni újrapróbálás vagy egy elmaradt flag-átállítás
+    utáni következő kör sem fűzi be újra ugyanazt."""
+
+    def __init__(self):
+        self.fs_db = None
+        self.gs_client = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {
+            "running": False,
+            "last_run": None,
+            "last_ok": None,
+            "last_synced": 0,
+            "last_error": "",
+            "total_synced": 0,
+            "next_run": None,
+        }
+
+    def attach(self, fs_db, gs_client):
+        """Beállítja (vagy frissíti) a használt klienseket; None nem írja felül a meglévőt."""
+        self.fs_db = fs_db or self.fs_db
+        self.gs_client = gs_client or self.gs_client
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="qr-sheet-sync", daemon=True)
+            self._thread.start()
+
+    def trigger(self):
+        """Azonnali szinkron kérése (nem blokkol)."""
+        self._wake.set()
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
+
+    def _set_status(self, **kwargs):
+        with self._lock:
+            self._status.update(kwargs)
+
+    def _loop(self):
+        while True:
+            self.run_once()
+            now = datetime.now(HUNGARY_TZ)
+            next_run = min(now + timedelta(seconds=QR_SYNC_INTERVAL_SEC), _next_post_session_run(now))
+            self._set_status(next_run=next_run)
+            self._wake.wait(timeout=max(1.0, (next_run - now).total_seconds()))
+            self._wake.clear()
+
+    def run_once(self):
+        """Egy teljes szinkron kör: addig dolgoz fel batch-eket, amíg van szinkronizálatlan rekord."""
+        if not self.fs_db or not self.gs_client:
+            return 0
+        self._set_status(running=True)
+        synced = 0
+        try:
+            while True:
+                count = self._sync_batch()
+                synced += count
+                if count < QR_SYNC_BATCH_SIZE:
+                    break
+            if synced:
+                from modules.db import get_attendance_rows_gs
+                get_attendance_rows_gs.clear()
+            self._set_status(last_ok=True, last_error="")
+        except Exception as e:
+            self._set_status(last_ok=False, last_error=str(e))
+            print(f"QR szinkron hiba: {e}")
+        finally:
+            with self._lock:
+                self._status["running"] = False
+                self._status["last_run"] = datetime.now(HUNGARY_TZ)
+                self._status["last_synced"] = synced
+                self._status["total_synced"] += synced
+        return synced
+
+    def _sync_batch(self):
+        # a kézi szinkronnal (attendance_sync.apply_attendance_sync) egyszerre nem írunk a lapra
+        with attendance_sheet_lock:
+            return self._sync_batch_locked()
+
+    def _sync_batch_locked(self):
+        docs = _with_retry(lambda: list(
+            self.fs_db.collection(FIRESTORE_COLLECTION)
+            .where("synced_to_sheet", "==", False)
+            .limit(QR_SYNC_BATCH_SIZE)
+            .stream()
+        ))
+        if not docs:
+            return 0
+        rows = []
+        for doc in docs:
+            d = doc.to_dict()
+            rows.append([d.get("name", ""), d.get("status", "Yes"),
+                         d.get("timestamp", ""), d.get("event_date", ""), "", d.get("mode", "qr")])
+
+        def _append():
+            # a lap friss (inkrementális) olvasása minden próbálkozásnál: ha egy korábbi, hibát
+            # jelző append_rows valójában lefutott, a sorai már itt vannak és kimaradnak
+            on_sheet = {sheet_row_key(r) for r in get_attendance_reader(self.gs_client).read()}
+            missing = [row for row in rows if sheet_row_key(row) not in on_sheet]
+            if missing:
+                get_sheet_registry(self.gs_client).call(
+                    lambda ws: ws.append_rows(missing, value_input_option='USER_ENTERED'))
+        _with_retry(_append)
+
+        # A flag-átállítás külön próbálkozik újra: az append már megtörtént, azt nem ismételjük.
+        # A lekérdezés óta törölt rekordok kimaradnak (az update NotFound-dal bukna az egész batch-ben).
+        def _flag():
+            batch = self.fs_db.batch()
+            for snap in self.fs_db.get_all([doc.reference for doc in docs]):
+                if snap.exists:
+                    batch.update(snap.reference, {"synced_to_sheet": True})
+            batch.commit()
+        _with_retry(_flag)
+        return len(rows)
+
+
+@st.cache_resource
+def _qr_sync_worker():
+    return QrSyncWorker()
+
+
+def get_qr_sync_worker(fs_db, gs_client):
+    """Folyamatonként egyetlen QR szinkron worker; szükség esetén elindítja. Nem blokkol."""
+    worker = _qr_sync_worker()
+    worker.attach(fs_db, gs_client)
+    worker.start()
+    return worker
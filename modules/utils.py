@@ -1,32 +1,11 @@
 import streamlit as st
+import hashlib
+import io
 import os
 import pandas as pd
-import calendar
-from datetime import datetime, timedelta
+from datetime import datetime
 
-from modules.config import HUNGARY_TZ
-
-
-def generate_tuesday_dates(past_count=8, future_count=2):
-    tuesday_dates_list = []
-    today = datetime.now(HUNGARY_TZ).date()
-    days_since_tuesday = (today.weekday() - 1) % 7
-    last_tuesday = today - timedelta(days=days_since_tuesday)
-    for i in range(past_count):
-        tuesday_dates_list.insert(0, (last_tuesday - timedelta(weeks=i)).strftime("%Y-%m-%d"))
-    for i in range(1, future_count + 1):
-        tuesday_dates_list.append((last_tuesday + timedelta(weeks=i)).strftime("%Y-%m-%d"))
-    return tuesday_dates_list
-
-
-def get_tuesdays_in_month(year, month):
-    tuesdays = []
-    cal = calendar.monthcalendar(year, month)
-    for week in cal:
-        tuesday_day = week[calendar.TUESDAY]
-        if tuesday_day != 0:
-            tuesdays.append(datetime(year, month, tuesday_day).date())
-    return tuesdays
+from modules.dates import generate_tuesday_dates, get_tuesdays_in_month  # noqa: F401 (visszafelé kompatibilitás)
 
 
 def parse_date_str(date_str):
@@ -125,7 +104,8 @@ def build_total_attendance_fs(df_fs, year=None):
 
 
 def calculate_monthly_accounting_fs(fs_db, inv_dict):
-    from modules.db import get_attendance_rows_fs, get_cancelled_sessions_fs
+    from modules.attendance import get_normalized_attendance
+    from modules.db import get_cancelled_sessions_fs
     target_year = int(inv_dict["target_year"])
     target_month = int(inv_dict["target_month"])
     target_month_name = inv_dict["month_name"]
@@ -136,35 +116,21 @@ def calculate_monthly_accounting_fs(fs_db, inv_dict):
     if not session_dates:
         return False, f"Nincsenek érvényes edzésnapok {target_year}. {target_month_name} hónapban.", None, None, None, None
     cost_per_session = total_amount / len(session_dates)
-    df_fs = get_attendance_rows_fs(fs_db)
-    processed_att = []
-    if not df_fs.empty:
-        for _, row in df_fs.iterrows():
-            name = str(row["Név"]).strip() if pd.notna(row["Név"]) else ""
-            is_coming = str(row["Jön-e"]).strip() if pd.notna(row["Jön-e"]) else ""
-            if not name or not is_coming:
-                continue
-            mode_val = str(row["Mód"]).strip().lower() if pd.notna(row["Mód"]) else "valós"
-            if mode_val == "teszt":
-                continue
-            reg_val = str(row["Regisztráció Időpontja"]) if pd.notna(row["Regisztráció Időpontja"]) else ""
-            evt_val = str(row["Alkalom Dátuma"]) if pd.notna(row["Alkalom Dátuma"]) else ""
-            rel_date = parse_date_str(evt_val) or parse_date_str(reg_val)
-            if rel_date:
-                processed_att.append({"name": name, "is_coming": is_coming, "date": rel_date})
+    # a számlázás a nyers jelenléti rekordokból (a cache-elt normalizált táblából) számol,
+    # nem az alkalom-összesítőkből: azokat a nyilvános check-in oldal is növelheti
+    norm_df, _ = get_normalized_attendance(fs_db)
+    month_df = norm_df[norm_df["date"].isin(session_dates) & (norm_df["name"] != "") & (norm_df["mode"] != "teszt")]
+    yes_by_date, no_by_date = {}, {}
+    for name, status, rel_date in zip(month_df["name"], month_df["status"], month_df["date"]):
+        if status == "Yes":
+            yes_by_date.setdefault(rel_date, set()).add(name)
+        elif status == "No":
+            no_by_date.setdefault(rel_date, set()).add(name)
     elszamolas_data = []
     person_totals = {}
     person_counts = {}
     for s_date in session_dates:
-        yes_set = set()
-        no_set = set()
-        for rec in processed_att:
-            if rec["date"] == s_date:
-                if rec["is_coming"] == "Yes":
-                    yes_set.add(rec["name"])
-                elif rec["is_coming"] == "No":
-                    no_set.add(rec["name"])
-        final_attendees = yes_set - no_set
+        final_attendees = yes_by_date.get(s_date, set()) - no_by_date.get(s_date, set())
         attendee_count = len(final_attendees)
         cost_per_person = cost_per_session / attendee_count if attendee_count > 0 else 0
         elszamolas_data.append({
@@ -291,57 +257,59 @@ def generate_pdf_bytes(df_osszesito, month_name, year):
 
 
 def _get_smtp_connection():
-    import smtplib  # lazy: csak email küldéskor töltődik be
+    from modules.mailer import secrets_connection_factory  # lazy: csak email küldéskor töltődik be
     try:
-        sender = st.secrets["email"]["sender"]
-        password = st.secrets["email"]["password"]
-        server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
-        server.login(sender, password)
-        return server, sender
+        connect, sender = secrets_connection_factory()
+        return connect(), sender
     except Exception as e:
         raise Exception(f"SMTP kapcsolódási hiba: {e}")
 
 
-def send_personal_email(to_address, name, month_name, year, count, amount, guest_details=None):
+def build_personal_email(sender, to_address, name, month_name, year, count, amount, guest_details=None):
+    """A havi személyes elszámoló levél (MIME üzenet) — küldés nélkül, a tömeges küldő is ezt használja."""
     from email.mime.text import MIMEText
     from email.mime.multipart import MIMEMultipart
+    msg = MIMEMultipart("alternative")
+    msg["From"] = f"Röpi App 🏐 <{sender}>"
+    msg["To"] = to_address
+    msg["Subject"] = f"🏐 Röpi elszámolás — {year}. {month_name}"
+    keresztnev = name.split()[0]
+
+    has_guests = bool(guest_details and guest_details.get("guests"))
+    detail_rows = ""
+    if has_guests:
+        own_count = guest_details["own_count"]
+        own_cost = guest_details["own_cost"]
+        detail_rows += f"""<tr style="background:#f9f9f9;"><td style="padding:10px; color:#555;">👤 Saját részvétel</td><td style="padding:10px; text-align:right; color:#555;">{own_count} alkalom</td></tr>"""
+        detail_rows += f"""<tr style="background:#f9f9f9;"><td style="padding:10px; color:#555;">👤 Saját díj</td><td style="padding:10px; text-align:right; color:#555;">{own_cost:,.0f} Ft</td></tr>"""
+        for g in guest_details["guests"]:
+            detail_rows += f"""<tr style="background:#fff8e1;"><td style="padding:10px; color:#8a6d00;">🧑‍🤝‍🧑 Vendég: {g['name']}</td><td style="padding:10px; text-align:right; color:#8a6d00;">{g['count']} alkalom</td></tr>"""
+            detail_rows += f"""<tr style="background:#fff8e1;"><td style="padding:10px; color:#8a6d00;">💸 {g['name']} díja</td><td style="padding:10px; text-align:right; color:#8a6d00;">{g['cost']:,.0f} Ft</td></tr>"""
+
+    html_body = f"""<html><body style="font-family: Arial, sans-serif; color: #333; max-width: 520px; margin: auto;">
+      <div style="background: #f8f8f8; border-radius: 12px; padding: 28px;">
+        <h2 style="color: #4a90d9; margin-top:0;">🏐 Havi Röpi Elszámolás</h2>
+        <p>Szia <strong>{keresztnev}</strong>!</p>
+        <p>Elkészült a <strong>{year}. {month_name}</strong> havi elszámolás.</p>
+        <table style="width:100%; border-collapse: collapse; margin: 16px 0;">
+          <tr style="background:#4a90d9; color:white;"><th style="padding:12px; text-align:left;">Megnevezés</th><th style="padding:12px; text-align:right;">Részlet</th></tr>
+          {detail_rows}
+          <tr style="background:#eaf4ff;"><td style="padding:12px;"><strong>📅 Összes részvétel</strong></td><td style="padding:12px; text-align:right;"><strong>{count} alkalom</strong></td></tr>
+          <tr style="background:#fff;"><td style="padding:14px; font-size:1.1em;">💰 <strong>Fizetendő összeg</strong></td><td style="padding:14px; font-size:1.3em; text-align:right; color:#e74c3c;"><strong>{amount:,.0f} Ft</strong></td></tr>
+        </table>
+        {"<p style='color:#888; font-size:0.9em;'>ℹ️ A fizetendő összeg tartalmazza a vendégeid terembérleti díját is.</p>" if has_guests else ""}
+        <p>Kérlek utald el a fenti összeget a szokásos számlaszámra! 🙏</p>
+        <hr style="border:none; border-top:1px solid #ddd; margin:20px 0;">
+        <p style="font-size:0.8em; color:#aaa; margin:0;">Ez egy automatikus üzenet — Röpi App Pro 🏐</p>
+      </div></body></html>"""
+    msg.attach(MIMEText(html_body, "html", "utf-8"))
+    return msg
+
+
+def send_personal_email(to_address, name, month_name, year, count, amount, guest_details=None):
     try:
         server, sender = _get_smtp_connection()
-        msg = MIMEMultipart("alternative")
-        msg["From"] = f"Röpi App 🏐 <{sender}>"
-        msg["To"] = to_address
-        msg["Subject"] = f"🏐 Röpi elszámolás — {year}. {month_name}"
-        keresztnev = name.split()[0]
-
-        has_guests = bool(guest_details and guest_details.get("guests"))
-        detail_rows = ""
-        if has_guests:
-            own_count = guest_details["own_count"]
-            own_cost = guest_details["own_cost"]
-            detail_rows += f"""<tr style="background:#f9f9f9;"><td style="padding:10px; color:#555;">👤 Saját részvétel</td><td style="padding:10px; text-align:right; color:#555;">{own_count} alkalom</td></tr>"""
-            detail_rows += f"""<tr style="background:#f9f9f9;"><td style="padding:10px; color:#555;">👤 Saját díj</td><td style="padding:10px; text-align:right; color:#555;">{own_cost:,.0f} Ft</td></tr>"""
-            for g in guest_details["guests"]:
-                detail_rows += f"""<tr style="background:#fff8e1;"><td style="padding:10px; color:#8a6d00;">🧑‍🤝‍🧑 Vendég: {g['name']}</td><td style="padding:10px; text-align:right; color:#8a6d00;">{g['count']} alkalom</td></tr>"""
-                detail_rows += f"""<tr style="background:#fff8e1;"><td style="padding:10px; color:#8a6d00;">💸 {g['name']} díja</td><td style="padding:10px; text-align:right; color:#8a6d00;">{g['cost']:,.0f} Ft</td></tr>"""
-
-        html_body = f"""<html><body style="font-family: Arial, sans-serif; color: #333; max-width: 520px; margin: auto;">
-          <div style="background: #f8f8f8; border-radius: 12px; padding: 28px;">
-            <h2 style="color: #4a90d9; margin-top:0;">🏐 Havi Röpi Elszámolás</h2>
-            <p>Szia <strong>{keresztnev}</strong>!</p>
-            <p>Elkészült a <strong>{year}. {month_name}</strong> havi elszámolás.</p>
-            <table style="width:100%; border-collapse: collapse; margin: 16px 0;">
-              <tr style="background:#4a90d9; color:white;"><th style="padding:12px; text-align:left;">Megnevezés</th><th style="padding:12px; text-align:right;">Részlet</th></tr>
-              {detail_rows}
-              <tr style="background:#eaf4ff;"><td style="padding:12px;"><strong>📅 Összes részvétel</strong></td><td style="padding:12px; text-align:right;"><strong>{count} alkalom</strong></td></tr>
-              <tr style="background:#fff;"><td style="padding:14px; font-size:1.1em;">💰 <strong>Fizetendő összeg</strong></td><td style="padding:14px; font-size:1.3em; text-align:right; color:#e74c3c;"><strong>{amount:,.0f} Ft</strong></td></tr>
-            </table>
-            {"<p style='color:#888; font-size:0.9em;'>ℹ️ A fizetendő összeg tartalmazza a vendégeid terembérleti díját is.</p>" if has_guests else ""}
-            <p>Kérlek utald el a fenti összeget a szokásos számlaszámra! 🙏</p>
-            <hr style="border:none; border-top:1px solid #ddd; margin:20px 0;">
-            <p style="font-size:0.8em; color:#aaa; margin:0;">Ez egy automatikus üzenet — Röpi App Pro 🏐</p>
-          </div></body></html>"""
-        msg.attach(MIMEText(html_body, "html", "utf-8"))
-        server.send_message(msg)
+        server.send_message(build_personal_email(sender, to_address, name, month_name, year, count, amount, guest_details))
         server.quit()
         return True
     except Exception as e:
@@ -390,29 +358,59 @@ def send_admin_summary_email(month_name, year, df_osszesito, pdf_bytes):
         return False
 
 
-def parse_revolut_csv(uploaded_file):
+REVOLUT_SNIFF_BYTES = 4096
+
+
+def _sniff_revolut_delimiter(data):
+    """Elválasztó a fájl elejéből: vessző, ha a fejléc így legalább 3 oszlopot ad, különben pontosvessző."""
+    lines = data[:REVOLUT_SNIFF_BYTES].decode("utf-8", errors="ignore").lstrip("\ufeff").splitlines()
+    header = lines[0] if lines else ""
+    return "," if header.count(",") >= 2 else ";"
+
+
+def _read_statement_frame(data):
+    """Nyers kivonat-táblázat a fájl bájtjaiból: XLSX (zip fejléc) vagy CSV (kiszimatolt elválasztóval)."""
+    if data[:2] == b"PK":
+        return pd.read_excel(io.BytesIO(data))
+    sep = _sniff_revolut_delimiter(data)
     try:
-        uploaded_file.seek(0)
-        try:
-            df = pd.read_csv(uploaded_file, sep=",")
-            if len(df.columns) < 3:
-                uploaded_file.seek(0)
-                df = pd.read_csv(uploaded_file, sep=";")
-        except Exception:
-            uploaded_file.seek(0)
-            df = pd.read_csv(uploaded_file, sep=";")
+        return pd.read_csv(io.BytesIO(data), sep=sep)
+    except Exception:
+        return pd.read_csv(io.BytesIO(data), sep=";" if sep == "," else ",")
+
+
+def _find_column(columns, *needles):
+    return next((c for c in columns if any(n in c.lower() for n in needles)), None)
 
-        df.columns = [c.strip() for c in df.columns]
 
-        leiras_col = next((c for c in df.columns if "leírás" in c.lower() or "leiras" in c.lower() or "description" in c.lower()), None)
-        osszeg_col = next((c for c in df.columns if "összeg" in c.lower() or "osszeg" in c.lower() or "amount" in c.lower()), None)
-        state_col  = next((c for c in df.columns if "state" in c.lower()), None)
+def _transaction_fingerprints(df, cols):
+    """Tranzakció-ujjlenyomat a kivonat sorából (dátum, leírás, összeg, pénznem, egyenleg).
+
+    Két teljesen azonos sort a kivonaton belüli sorszámuk különböztet meg, így az
+    átfedő kivonatokból ugyanaz a tranzakció mindig ugyanazt az ujjlenyomatot kapja."""
+    raw = df[cols].astype(str).agg("|".join, axis=1)
+    occurrence = raw.groupby(raw).cumcount().astype(str)
+    return (raw + "#" + occurrence).map(lambda s: hashlib.sha1(s.encode("utf-8")).hexdigest())
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _parse_revolut_bytes(content_hash, _data):
+    # content_hash a cache-kulcs: ugyanaz a kivonat csak egyszer kerül feldolgozásra
+    try:
+        df = _read_statement_frame(_data)
+        df.columns = [str(c).strip() for c in df.columns]
+
+        leiras_col = _find_column(df.columns, "leírás", "leiras", "description")
+        osszeg_col = _find_column(df.columns, "összeg", "osszeg", "amount")
+        state_col  = _find_column(df.columns, "state", "állapot")
+        date_col   = (_find_column(df.columns, "completed", "befejez")
+                      or _find_column(df.columns, "started", "kezd", "date", "dátum"))
 
         if not leiras_col or not osszeg_col:
             return None, f"Nem találom az oszlopokat. Talált oszlopok: {list(df.columns)}"
 
         if state_col:
-            df = df[df[state_col].astype(str).str.upper() == "ELVÉGEZVE"].copy()
+            df = df[df[state_col].astype(str).str.upper().isin(["ELVÉGEZVE", "COMPLETED"])].copy()
 
         df["_amount"] = pd.to_numeric(df[osszeg_col].astype(str).str.replace(",", "."), errors="coerce")
 
@@ -430,13 +428,39 @@ def parse_revolut_csv(uploaded_file):
             return desc.strip()
 
         incoming["_name"] = incoming[leiras_col].apply(extract_name)
+        incoming["_date"] = (pd.to_datetime(incoming[date_col], errors="coerce").dt.strftime("%Y-%m-%d")
+                             if date_col else None)
+        extra_cols = [c for c in (_find_column(df.columns, "currency", "pénznem"),
+                                  _find_column(df.columns, "balance", "egyenleg")) if c]
+        fp_cols = [c for c in (date_col, leiras_col, osszeg_col) if c] + extra_cols
+        incoming["_fingerprint"] = _transaction_fingerprints(incoming, fp_cols) if not incoming.empty else []
 
-        return incoming[["_name", "_amount"]].reset_index(drop=True), None
+        return incoming[["_name", "_amount", "_date", "_fingerprint"]].reset_index(drop=True), None
 
     except Exception as e:
         return None, f"Hiba a fájl feldolgozásakor: {e}"
 
 
+def parse_revolut_statement(uploaded_file):
+    """Revolut kivonat (CSV vagy XLSX) → (DataFrame[_name, _amount, _date, _fingerprint], hiba).
+
+    A tartalom hash-e szerint cache-elve: ugyanaz a fájl csak egyszer kerül feldolgozásra."""
+    try:
+        uploaded_file.seek(0)
+        data = uploaded_file.read()
+    except Exception as e:
+        return None, f"Hiba a fájl feldolgozásakor: {e}"
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return _parse_revolut_bytes(hashlib.sha256(data).hexdigest(), data)
+
+
+def parse_revolut_csv(uploaded_file):
+    """Revolut kivonat → (DataFrame[_name, _amount], hiba) — a havi befizetés-ellenőrzéshez."""
+    df, err = parse_revolut_statement(uploaded_file)
+    return (df[["_name", "_amount"]] if df is not None else None), err
+
+
 def estimate_cost_for_player(session_count: int, year: int, avg_attendees: float | None = None) -> dict:
     """
     Becslés a játékos fizetendő összegéről egy adott évre.
@@ -0,0 +1,108 @@
+"""
+Benchmark: a ?checkin=1 útvonal importideje és első válaszideje (TTFB) két git verzió között.
+
+Használat (a repo gyökeréből):
+    python scratch/bench_checkin_route.py                 # baseline: HEAD~1, jelölt: munkakönyvtár
+    python scratch/bench_checkin_route.py --baseline e6a784f --runs 5
+
+Minden mérés friss Python folyamatban fut (hideg indulás):
+- importidő: `python -X importtime` kimenetéből a legfelső szintű importok kumulált ideje
+  az app első futása alatt;
+- TTFB: az első AppTest futás falióra-ideje (a script lefutásáig, amikor az első válasz elmegy).
+Hitelesítő adat nélkül a Firestore kliens None lesz — ez mindkét oldalon azonos, így a
+különbség tisztán a bootstrapé.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import io
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_RUNNER = r"""
+import time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=120)
+at.secrets["app"] = {"admin_emails": []}
+at.query_params["checkin"] = "1"
+t0 = time.perf_counter()
+at.run()
+print("TTFB_MS", (time.perf_counter() - t0) * 1000)
+"""
+
+_IMPORT_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _export_tree(ref, dest):
+    data = subprocess.run(["git", "archive", ref], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        tar.extractall(dest)
+
+
+def _measure_once(tree):
+    env = dict(os.environ, PYTHONPATH=tree)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _RUNNER],
+        cwd=tree, env=env, capture_output=True, text=True
+    )
+    ttfb = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("TTFB_MS"):
+            ttfb = float(line.split()[1])
+    # Csak az app futása közbeni importok (a streamlit.testing betöltése utániak) számítanak:
+    # ezeket a modules.* és a harmadik féltől származó, app által húzott csomagok adják.
+    lines = proc.stderr.splitlines()
+    start = next((i for i, l in enumerate(lines) if "streamlit.testing.v1" in l), 0)
+    import_us = 0
+    imported = set()
+    for line in lines[start + 1:]:
+        m = _IMPORT_RE.match(line)
+        if not m:
+            continue
+        imported.add(m.group(4))
+        if len(m.group(3)) == 1:
+            import_us += int(m.group(2))
+    if ttfb is None:
+        raise RuntimeError(f"A mérés nem futott le ({tree}):\n{proc.stderr[-2000:]}")
+    return import_us / 1000, ttfb, imported
+
+
+def _measure(tree, runs):
+    imports, ttfbs, heavy = [], [], set()
+    for _ in range(runs):
+        imp_ms, ttfb_ms, imported = _measure_once(tree)
+        imports.append(imp_ms)
+        ttfbs.append(ttfb_ms)
+        heavy |= {m for m in ("gspread", "pandas", "google.cloud.firestore", "modules.db", "modules.pages.admin")
+                  if m in imported}
+    return statistics.median(imports), statistics.median(ttfbs), sorted(heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default="HEAD~1", help="Összehasonlítási alap git ref (alapértelmezés: HEAD~1)")
+    parser.add_argument("--runs", type=int, default=3, help="Futások száma oldalanként (medián)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_tree = os.path.join(tmp, "baseline")
+        os.makedirs(base_tree)
+        _export_tree(args.baseline, base_tree)
+
+        results = {
+            f"előtte ({args.baseline})": _measure(base_tree, args.runs),
+            "utána (munkakönyvtár)": _measure(ROOT, args.runs),
+        }
+
+    print(f"{'Verzió':<28}{'Import (ms)':>14}{'TTFB (ms)':>12}  Betöltött nehéz modulok")
+    for label, (imp_ms, ttfb_ms, heavy) in results.items():
+        print(f"{label:<28}{imp_ms:>14.0f}{ttfb_ms:>12.0f}  {', '.join(heavy) or '—'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Benchmark és ellenőrzés: a havi elszámoló emailek küldése helyi SMTP-pótlék ellen.
+
+Használat (a repo gyökeréből):
+    python scratch/bench_mailer.py                        # 25 címzett, 0.4 s kapcsolódás, 0.05 s/levél
+    python scratch/bench_mailer.py --recipients 40 --fail-every 7
+    python scratch/bench_mailer.py --skip-legacy --drop-every 6 --drop-before-every 5
+
+A pótlék egy szálas, sima (TLS nélküli) SMTP szerver a localhoston: AUTH PLAIN-t fogad,
+a bejelentkezést --login-delay ideig, a DATA-t --data-delay ideig "dolgozza fel" (a valódi
+TLS kézfogás + login, illetve a szerver oldali feldolgozás helyett). --fail-every N esetén
+minden N-edik DATA 451-gyel (átmeneti hiba) tér vissza. --drop-every N esetén minden N-edik
+DATA után a szerver kézbesít, majd válasz nélkül bontja a kapcsolatot (ismeretlen kimenetel);
+--drop-before-every N esetén minden N-edik MAIL parancsnál bont (biztonságosan újrapróbálható).
+Két változat fut:
+- régi: címzettenként új kapcsolat + login + quit, utána 0.3 s várakozás (a korábbi oldal ciklusa);
+- új: MailDispatcher (kapcsolat-újrahasznosítás, párhuzamos küldés, újrapróbálás).
+A végén ellenőrzi, hogy minden címzett pontosan egyszer kapta meg a levelet.
+"""
+import argparse
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter
+from email import message_from_bytes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.mailer import MailDispatcher, smtp_connection_factory  # noqa: E402
+from modules.utils import build_personal_email  # noqa: E402
+
+
+class StandInSMTP(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, login_delay, data_delay, fail_every, drop_every=0, drop_before_every=0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.login_delay, self.data_delay, self.fail_every = login_delay, data_delay, fail_every
+        self.drop_every, self.drop_before_every = drop_every, drop_before_every
+        self.lock = threading.Lock()
+        self.delivered = Counter()
+        self.stats = Counter()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        srv = self.server
+        with srv.lock:
+            srv.stats["connections"] += 1
+        self._reply("220 stand-in ESMTP")
+        rcpts = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode().strip()
+            verb = cmd.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250-stand-in")
+                self._reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                time.sleep(srv.login_delay)
+                with srv.lock:
+                    srv.stats["logins"] += 1
+                self._reply("235 2.7.0 Accepted")
+            elif verb == "MAIL":
+                with srv.lock:
+                    srv.stats["mail"] += 1
+                    drop = srv.drop_before_every and srv.stats["mail"] % srv.drop_before_every == 0
+                if drop:
+                    return
+                rcpts = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                rcpts.append(cmd.split(":", 1)[1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                chunks = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line in (b".\r\n", b""):
+                        break
+                    chunks.append(data_line)
+                time.sleep(srv.data_delay)
+                with srv.lock:
+                    srv.stats["data"] += 1
+                    fail = srv.fail_every and srv.stats["data"] % srv.fail_every == 0
+                    drop = srv.drop_every and srv.stats["data"] % srv.drop_every == 0
+                    if not fail:
+                        for r in rcpts:
+                            srv.delivered[r] += 1
+                if drop and not fail:
+                    return
+                if fail:
+                    self._reply("451 4.3.0 Temporary failure")
+                else:
+                    message_from_bytes(b"".join(chunks))
+                    self._reply("250 OK queued")
+            elif verb == "RSET":
+                rcpts = []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+def _messages(n):
+    return [
+        (i, build_personal_email("ropi@example.com", f"tag{i}@example.com", f"Tag{i} Teszt",
+                                 "március", 2026, count=4, amount=8000.0))
+        for i in range(n)
+    ]
+
+
+def run_legacy(connect, messages):
+    """A korábbi oldal-ciklus: címzettenként kapcsolódás + login + küldés + quit, majd 0.3 s várakozás."""
+    ok = 0
+    for _, msg in messages:
+        try:
+            server = connect()
+            server.send_message(msg)
+            server.quit()
+            ok += 1
+        except Exception:
+            pass
+        time.sleep(0.3)
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--recipients", type=int, default=25)
+    ap.add_argument("--login-delay", type=float, default=0.4)
+    ap.add_argument("--data-delay", type=float, default=0.05)
+    ap.add_argument("--fail-every", type=int, default=0)
+    ap.add_argument("--drop-every", type=int, default=0)
+    ap.add_argument("--drop-before-every", type=int, default=0)
+    ap.add_argument("--skip-legacy", action="store_true")
+    args = ap.parse_args()
+
+    server = StandInSMTP(args.login_delay, args.data_delay, args.fail_every,
+                         args.drop_every, args.drop_before_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    connect = smtp_connection_factory("ropi@example.com", "x", host=host, port=port, use_ssl=False, timeout=10)
+
+    if not args.skip_legacy:
+        t0 = time.perf_counter()
+        ok = run_legacy(connect, _messages(args.recipients))
+        print(f"régi:  {ok}/{args.recipients} elküldve, {time.perf_counter() - t0:6.2f} s, "
+              f"{server.stats['logins']} login")
+        server.delivered.clear()
+        server.stats.clear()
+
+    t0 = time.perf_counter()
+    results = []
+    with MailDispatcher(connect, backoff_sec=0.2) as dispatcher:
+        for result in dispatcher.dispatch(_messages(args.recipients)):
+            results.append(result)
+    elapsed = time.perf_counter() - t0
+    sent = sum(r.ok for r in results)
+    print(f"új:    {sent}/{args.recipients} elküldve, {elapsed:6.2f} s, {server.stats['logins']} login, "
+          f"számlálók: {dispatcher.counters}")
+
+    expected = {f"tag{i}@example.com" for i in range(args.recipients)}
+    failed = {r.recipient for r in results if r.status == "failed"}
+    unknown = {r.recipient for r in results if r.status == "unknown"}
+    assert expected - failed - unknown <= set(server.delivered) <= expected - failed, "hiányzó vagy idegen címzett"
+    assert all(c == 1 for c in server.delivered.values()), "duplikált kézbesítés"
+    print(f"ellenőrzés: minden sikeres címzett pontosan egy levelet kapott ({len(unknown)} ismeretlen, újraküldés nélkül)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
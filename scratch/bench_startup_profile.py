@@ -0,0 +1,163 @@
+"""
+Indulási profil (`python -X importtime`) oldalanként, regressziós összevetéssel.
+
+Használat (a repo gyökeréből):
+    python scratch/bench_startup_profile.py            # mérés + összevetés a mentett alappal
+    python scratch/bench_startup_profile.py --update   # az alap (startup_profile_baseline.json) frissítése
+
+Minden oldal friss Python folyamatban, hidegen indul (AppTest, hitelesítés nélkül):
+- import (ms): a legfelső szintű importok kumulált ideje az első futás alatt;
+- első futás / újrafutás (ms): az első és a második `at.run()` falióra-ideje;
+- nehéz modulok: mely nagy függőségek töltődtek be az oldalhoz.
+
+Regressziónak számít (kilépési kód 1), ha egy oldal olyan nehéz modult tölt be, amely
+az alapban nem szerepelt, vagy ha az importidő a tűréshatárnál többel nő.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_profile_baseline.json")
+
+HEAVY_MODULES = ("gspread", "google.cloud.firestore", "pandas", "altair", "modules.db", "modules.utils")
+
+# oldal címke → (query paraméterek, menüpont)
+PAGES = {
+    "checkin": ({"checkin": "1"}, None),
+    "qr": ({}, "📲 Check-in QR"),
+    "overview": ({}, "Alkalmak Áttekintése"),
+    "database": ({}, "Adatbázis"),
+    "admin": ({}, "Admin Regisztráció"),
+}
+
+_RUNNER = r"""
+import sys, time, json
+import streamlit
+
+
+class _Guest:
+    # AppTest alatt nincs OAuth: vendég (nem bejelentkezett) látogatót szimulálunk
+    is_logged_in = False
+    email = None
+    name = None
+
+
+streamlit.user = _Guest()
+from streamlit.testing.v1 import AppTest
+
+query, page = json.loads(sys.argv[1])
+at = AppTest.from_file("app.py", default_timeout=120)
+at.secrets["app"] = {"admin_emails": []}
+for k, v in query.items():
+    at.query_params[k] = v
+if page:
+    at.session_state["menu_page"] = page
+t0 = time.perf_counter()
+at.run()
+first = (time.perf_counter() - t0) * 1000
+t0 = time.perf_counter()
+at.run()
+rerun = (time.perf_counter() - t0) * 1000
+if at.exception:
+    raise SystemExit(f"Kivétel: {at.exception[0].value}")
+print("RESULT", first, rerun)
+"""
+
+_IMPORT_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _measure_once(query, page):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _RUNNER, json.dumps([query, page])],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    result = next((l.split() for l in proc.stdout.splitlines() if l.startswith("RESULT")), None)
+    if result is None:
+        raise RuntimeError(f"A mérés nem futott le ({page or query}):\n{proc.stderr[-2000:]}")
+    lines = proc.stderr.splitlines()
+    # Csak az AppTest betöltése utáni (tehát az app által kiváltott) importok számítanak
+    start = next((i for i, l in enumerate(lines) if "streamlit.testing.v1" in l), 0)
+    import_us = 0
+    imported = set()
+    for line in lines[start + 1:]:
+        m = _IMPORT_RE.match(line)
+        if not m:
+            continue
+        imported.add(m.group(4))
+        if len(m.group(3)) == 1:
+            import_us += int(m.group(2))
+    heavy = sorted(m for m in HEAVY_MODULES if m in imported)
+    return import_us / 1000, float(result[1]), float(result[2]), heavy
+
+
+def measure(runs):
+    profile = {}
+    for label, (query, page) in PAGES.items():
+        samples = [_measure_once(query, page) for _ in range(runs)]
+        profile[label] = {
+            "import_ms": round(statistics.median(s[0] for s in samples), 1),
+            "first_run_ms": round(statistics.median(s[1] for s in samples), 1),
+            "rerun_ms": round(statistics.median(s[2] for s in samples), 1),
+            "heavy_modules": samples[0][3],
+        }
+    return profile
+
+
+def compare(profile, baseline, tolerance):
+    regressions = []
+    for label, cur in profile.items():
+        base = baseline.get(label)
+        if not base:
+            continue
+        new_heavy = set(cur["heavy_modules"]) - set(base["heavy_modules"])
+        if new_heavy:
+            regressions.append(f"{label}: új nehéz modul(ok): {', '.join(sorted(new_heavy))}")
+        if cur["import_ms"] > base["import_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: importidő {base['import_ms']:.0f} → {cur['import_ms']:.0f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Futások száma oldalanként (medián)")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Megengedett importidő-növekedés aránya")
+    parser.add_argument("--update", action="store_true", help="Az alap felülírása a mostani méréssel")
+    args = parser.parse_args()
+
+    profile = measure(args.runs)
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"{'Oldal':<10}{'Import (ms)':>13}{'Alap':>8}{'1. futás':>10}{'Újrafutás':>11}  Nehéz modulok")
+    for label, cur in profile.items():
+        base_ms = baseline.get(label, {}).get("import_ms")
+        base_txt = f"{base_ms:.0f}" if base_ms is not None else "—"
+        print(f"{label:<10}{cur['import_ms']:>13.0f}{base_txt:>8}{cur['first_run_ms']:>10.0f}"
+              f"{cur['rerun_ms']:>11.0f}  {', '.join(cur['heavy_modules']) or '—'}")
+
+    if args.update:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(profile, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Alap frissítve: {BASELINE_FILE}")
+        return
+
+    regressions = compare(profile, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ Indulási regresszió:")
+        for r in regressions:
+            print(f"  - {r}")
+        sys.exit(1)
+    print("\n✅ Nincs indulási regresszió.")
+
+
+if __name__ == "__main__":
+    main()